@@ -0,0 +1,432 @@
+"""
+GravityMaze - Benchmarks de física, geração e renderização
+
+Mede as partes do jogo que pesam por frame ou por nível e grava os resultados em JSON,
+para comparar entre commits e detetar regressões.
+
+    python benchmarks/run_benchmarks.py                      # corre tudo
+    python benchmarks/run_benchmarks.py --quick --only maze_generate ball_update
+    python benchmarks/run_benchmarks.py --compare antes.json depois.json --threshold 0.15
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from datetime import datetime, timedelta
+
+# Sem janela nem som: os benchmarks correm em máquinas de CI sem display
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import pygame
+import game
+
+RESULTS_DIR = os.path.join(REPO_DIR, 'benchmarks', 'results')
+DIFFICULTIES = ('easy', 'normal', 'hard')
+WINDOW_SIZES = ((640, 360), (1280, 720), (1920, 1080), (2560, 1440))
+
+
+def measure(fn, repeat=5, number=None, min_block_time=0.02):
+    """Tempo por chamada (ms) de fn: mínimo, mediana e média de `repeat` blocos de `number` chamadas.
+
+    Sem `number`, escolhe-o (como timeit.autorange) para cada bloco durar pelo menos min_block_time.
+    O mínimo é o valor mais estável para comparar commits; a mediana mostra o caso típico."""
+    if number is None:
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                fn()
+            if time.perf_counter() - start >= min_block_time:
+                break
+            number *= 2
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        samples.append((time.perf_counter() - start) * 1000 / number)
+    return {
+        'min_ms': min(samples),
+        'median_ms': statistics.median(samples),
+        'mean_ms': statistics.fmean(samples),
+        'repeat': repeat,
+        'number': number,
+    }
+
+
+def generate_maze(level, difficulty, game_mode='normal', seed=0):
+    mine_percentage = game.GAME_MODES[game_mode].get('mine_percentage', 0.15)
+    return game.MazeGenerator.generate(level, game.DEFAULT_WIDTH, game.DEFAULT_HEIGHT,
+                                       game_mode, mine_percentage, difficulty, seed)
+
+
+# =============================================================================
+# BENCHMARKS
+# =============================================================================
+
+def bench_maze_generate(quick):
+    """MazeGenerator.generate por dificuldade e nível (1-50)"""
+    levels = (1, 10, 25, 50) if quick else range(1, 51)
+    cases = []
+    for difficulty in DIFFICULTIES:
+        for level in levels:
+            result = measure(lambda: generate_maze(level, difficulty), repeat=3 if quick else 7)
+            cases.append({'params': {'difficulty': difficulty, 'level': level}, **result})
+    return cases
+
+
+def bench_grid_to_walls(quick):
+    """MazeGenerator.grid_to_walls para vários tamanhos de célula"""
+    cases = []
+    for cell_size in (100, 80, 60, 40):
+        generator = game.MazeGenerator(1160, 540, cell_size, random.Random(0))
+        generator.generate_maze_recursive(0, 0)
+        generator.ensure_fully_connected()
+        result = measure(generator.grid_to_walls, repeat=5)
+        cases.append({'params': {'cell_size': cell_size, 'cells': generator.rows * generator.cols}, **result})
+    return cases
+
+
+def bench_mine_placement(quick):
+    """MazeGenerator.place_mines_everywhere (modo minefield) em grelhas de vários tamanhos"""
+    cases = []
+    sizes = (20, 100, 300) if quick else (20, 100, 300, 1000)
+    for size in sizes:
+        # Só a colocação de minas é medida: a grelha (todas as paredes) basta
+        generator = game.MazeGenerator(size * 10, size * 10, 10, random.Random(0))
+        result = measure(lambda: generator.place_mines_everywhere(0.15), repeat=3 if quick else 5)
+        cases.append({'params': {'cells': size * size}, **result})
+    return cases
+
+
+def bench_ball_update(quick):
+    """Ball.update por sub-step em função do número de paredes (lista completa vs WallIndex)"""
+    physics_steps = 4
+    dt_step = 1.0 / game.FPS / physics_steps
+    friction = game.FRICTION ** (1 / physics_steps)
+    cases = []
+    for difficulty, level in (('easy', 1), ('normal', 1), ('hard', 1), ('hard', 50)):
+        walls = generate_maze(level, difficulty)[0]
+        for broadphase in (False, True):
+            wall_index = game.WallIndex(walls) if broadphase else None
+            ball = game.Ball(game.MAZE_MARGIN + 60, game.MAZE_MARGIN_TOP + 60)
+
+            def substep():
+                ball.update(0.4, 0.3, dt_step, walls, friction, wall_index)
+
+            result = measure(substep, repeat=5)
+            cases.append({'params': {'walls': len(walls), 'difficulty': difficulty, 'level': level,
+                                     'broadphase': broadphase}, **result})
+    return cases
+
+
+def bench_mine_check(quick):
+    """Verificação de minas por sub-step (Simulation.find_mine_hit, sem colisão)"""
+    cases = []
+    for difficulty, level in (('easy', 1), ('normal', 10), ('hard', 50)):
+        sim = game.Simulation('minefield', difficulty, seed=0)
+        sim.start_game()
+        sim.level = level
+        sim.init_level()
+        # Bola num ponto sem minas: o ciclo percorre a lista toda
+        sim.ball.x, sim.ball.y = -1000, -1000
+        result = measure(lambda: sim.find_mine_hit(sim.ball), repeat=5)
+        cases.append({'params': {'mines': len(sim.mines), 'difficulty': difficulty, 'level': level}, **result})
+    return cases
+
+
+def bench_simulation_step(quick):
+    """Simulation.step completo (4 sub-steps) com input constante"""
+    cases = []
+    for game_mode in ('normal', 'minefield'):
+        for num_players in (1, 2):
+            sim = game.Simulation(game_mode, 'normal', num_players, seed=0)
+            sim.start_game()
+
+            def frame():
+                # Recomeçar se a bola chegar ao fim / perder as vidas durante a medição
+                if sim.state != "PLAYING":
+                    sim.start_game()
+                sim.step(1.0 / game.FPS, (0.2, 0.1), (0.1, 0.2))
+
+            result = measure(frame, repeat=5)
+            cases.append({'params': {'game_mode': game_mode, 'players': num_players}, **result})
+    return cases
+
+
+def create_offscreen_game(workdir):
+    """Game completo com driver de vídeo dummy, numa pasta temporária (config.json / base de dados)"""
+    os.chdir(workdir)
+    instance = game.Game()
+    instance.game_mode = 'minefield'
+    instance.start_game(0)
+    return instance
+
+
+class CountingSurface(pygame.Surface):
+    """Surface do mundo que conta os blits (para draw_calls_per_frame)"""
+    blits = 0
+
+    def blit(self, *args, **kwargs):
+        CountingSurface.blits += 1
+        return super().blit(*args, **kwargs)
+
+
+def count_draw_calls(fn):
+    """Chamadas de desenho (pygame.draw.* e blits para a surface do mundo) feitas por fn()"""
+    counter = [0]
+    originals = {}
+    for name in ('circle', 'line', 'lines', 'polygon', 'rect'):
+        original = getattr(pygame.draw, name)
+        originals[name] = original
+
+        def counted(*args, original=original, **kwargs):
+            counter[0] += 1
+            return original(*args, **kwargs)
+        setattr(pygame.draw, name, counted)
+    CountingSurface.blits = 0
+    try:
+        fn()
+    finally:
+        for name, original in originals.items():
+            setattr(pygame.draw, name, original)
+    return counter[0] + CountingSurface.blits
+
+
+def bench_draw_playing(quick, instance):
+    """Game.draw_playing para a surface do mundo (offscreen), com as chamadas de desenho por frame"""
+    world_surface = instance.world_surface
+    instance.world_surface = CountingSurface(world_surface.get_size())
+    instance.keyboard_accel_x, instance.keyboard_accel_y = 0.4, 0.3  # Seta de direção (não o círculo parado)
+    instance.keyboard2_accel_x, instance.keyboard2_accel_y = -0.3, 0.5
+    cases = []
+    try:
+        for num_players in (1, 2):
+            instance.num_players = num_players
+            instance.start_game(0)
+            instance.draw_playing()  # Caches (sprites, camada do nível) já preenchidas
+            draw_calls = count_draw_calls(instance.draw_playing)
+            result = measure(instance.draw_playing, repeat=5)
+            cases.append({'params': {'players': num_players, 'walls': len(instance.walls),
+                                     'mines': len(instance.mines)},
+                          'draw_calls_per_frame': draw_calls, **result})
+    finally:
+        instance.world_surface = world_surface
+        instance.keyboard_accel_x = instance.keyboard_accel_y = 0
+        instance.keyboard2_accel_x = instance.keyboard2_accel_y = 0
+    instance.num_players = 1
+    instance.start_game(0)
+    return cases
+
+
+def bench_render_world_to_screen(quick, instance):
+    """Game.render_world_to_screen (escala + blit) para vários tamanhos de janela"""
+    instance.draw_playing()
+    cases = []
+    for width, height in WINDOW_SIZES:
+        instance.window_width, instance.window_height = width, height
+        instance.screen = pygame.Surface((width, height))
+        result = measure(instance.render_world_to_screen, repeat=5)
+        cases.append({'params': {'width': width, 'height': height}, **result})
+    return cases
+
+
+def bench_get_top_scores(quick):
+    """Database.get_top_scores em tabelas de vários tamanhos"""
+    sizes = (1000, 10000, 100000) if quick else (1000, 10000, 100000, 1000000)
+    modes = list(game.GAME_MODES)
+    cases = []
+    with tempfile.TemporaryDirectory(prefix='gravitymaze-bench-db-') as tmp:
+        for size in sizes:
+            db = game.Database(os.path.join(tmp, f'bench_{size}.db'))
+            rng = random.Random(size)
+            first_date = datetime(2024, 1, 1)
+
+            def chunks():
+                for start in range(0, size, 50000):
+                    yield [(f'player{rng.randrange(size // 10 + 1)}', rng.randint(1, 50),
+                            rng.uniform(5, 300), rng.randint(10, 50000),
+                            (first_date + timedelta(seconds=i)).strftime('%Y-%m-%d %H:%M:%S'),
+                            modes[i % len(modes)])
+                           for i in range(start, min(size, start + 50000))]
+
+            db.import_leaderboard_rows(chunks())
+            for game_mode in (None, 'minefield'):
+                result = measure(lambda: db.get_top_scores(10, game_mode), repeat=5)
+                cases.append({'params': {'rows': size, 'game_mode': game_mode or 'all'}, **result})
+            db.close()
+    return cases
+
+
+def bench_sound_bank(quick):
+    """Carregar os efeitos sonoros todos (com as variantes de volume): sintetizados vs cache em disco"""
+    if not pygame.mixer.get_init():
+        pygame.mixer.init(frequency=22050, size=-16, channels=2, buffer=512)
+    cases = []
+    with tempfile.TemporaryDirectory(prefix='gravitymaze-bench-sounds-') as tmp:
+        game.SoundBank(tmp).get('level_complete')  # Aquecer o NumPy fora das medições
+        for source, cache_dir in (('synth', None), ('disk_cache', tmp)):
+            def load_all():
+                bank = game.SoundBank(cache_dir)
+                for name, gain in bank.variants():
+                    bank.get(name, gain)
+
+            load_all()
+            result = measure(load_all, repeat=5)
+            cases.append({'params': {'source': source, 'sounds': len(game.SoundBank().variants())}, **result})
+    return cases
+
+
+def bench_music_chunk(quick):
+    """ChiptuneSequencer.render: custo de um bloco de música (tem de ser muito menor que a sua duração)"""
+    import numpy as np
+    cases = []
+    for sample_rate in (22050, 44100):
+        sequencer = game.ChiptuneSequencer(sample_rate)
+        out = np.zeros((game.MUSIC_CHUNK_FRAMES, 2), dtype=np.int16)
+        for bpm in (game.MUSIC_BPM, game.MUSIC_BPM * (1 + game.MUSIC_TEMPO_BOOST)):
+            result = measure(lambda: sequencer.render(out, bpm), repeat=5)
+            cases.append({'params': {'sample_rate': sample_rate, 'bpm': bpm,
+                                     'chunk_ms': game.MUSIC_CHUNK_FRAMES * 1000 / sample_rate}, **result})
+    return cases
+
+
+BENCHMARKS = {
+    'maze_generate': bench_maze_generate,
+    'grid_to_walls': bench_grid_to_walls,
+    'mine_placement': bench_mine_placement,
+    'ball_update': bench_ball_update,
+    'mine_check': bench_mine_check,
+    'simulation_step': bench_simulation_step,
+    'draw_playing': bench_draw_playing,
+    'render_world_to_screen': bench_render_world_to_screen,
+    'get_top_scores': bench_get_top_scores,
+    'sound_bank': bench_sound_bank,
+    'music_chunk': bench_music_chunk,
+}
+
+# Benchmarks que precisam de uma instância de Game (pygame + fontes + surfaces)
+NEEDS_GAME = ('draw_playing', 'render_world_to_screen')
+
+
+# =============================================================================
+# RESULTADOS
+# =============================================================================
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(names, quick):
+    cwd = os.getcwd()
+    workdir = tempfile.TemporaryDirectory(prefix='gravitymaze-bench-')
+    instance = None
+    results = {}
+    try:
+        for name in names:
+            print(f"- {name} ...", end=' ', flush=True)
+            start = time.perf_counter()
+            if name in NEEDS_GAME:
+                if instance is None:
+                    instance = create_offscreen_game(workdir.name)
+                cases = BENCHMARKS[name](quick, instance)
+            else:
+                cases = BENCHMARKS[name](quick)
+            results[name] = {'description': BENCHMARKS[name].__doc__, 'cases': cases}
+            print(f"{len(cases)} casos em {time.perf_counter() - start:.1f}s")
+    finally:
+        if instance is not None:
+            instance.db.close()
+        os.chdir(cwd)
+        workdir.cleanup()
+
+    return {
+        'meta': {
+            'commit': git_revision(),
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'quick': quick,
+            'python': platform.python_version(),
+            'pygame': pygame.version.ver,
+            'platform': platform.platform(),
+            'processor': platform.processor() or platform.machine(),
+        },
+        'results': results,
+    }
+
+
+def case_key(name, case):
+    return name + ' ' + ' '.join(f"{key}={value}" for key, value in sorted(case['params'].items()))
+
+
+def compare_results(old_path, new_path, threshold):
+    """Comparar os tempos mínimos (min_ms, o valor mais estável) de dois ficheiros JSON; devolve o
+    número de regressões acima do limite"""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+
+    old_cases = {case_key(name, case): case for name, data in old['results'].items() for case in data['cases']}
+    regressions = 0
+    print(f"{old['meta'].get('commit')} -> {new['meta'].get('commit')} (limite {threshold:.0%})")
+    for name, data in new['results'].items():
+        for case in data['cases']:
+            key = case_key(name, case)
+            if key not in old_cases:
+                continue
+            before = old_cases[key]['min_ms']
+            after = case['min_ms']
+            change = (after - before) / before if before > 0 else 0.0
+            marker = ''
+            if change > threshold:
+                marker = '  <-- REGRESSÃO'
+                regressions += 1
+            elif change < -threshold:
+                marker = '  (mais rápido)'
+            print(f"{key:70s} {before:10.4f} -> {after:10.4f} ms  {change:+7.1%}{marker}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks do GravityMaze")
+    parser.add_argument('--only', nargs='+', choices=sorted(BENCHMARKS), help='Correr só estes benchmarks')
+    parser.add_argument('--quick', action='store_true', help='Menos casos e repetições (smoke test)')
+    parser.add_argument('--output', help='Ficheiro JSON (por omissão benchmarks/results/<data>-<commit>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('ANTES', 'DEPOIS'), help='Comparar dois resultados')
+    parser.add_argument('--threshold', type=float, default=0.20, help='Variação considerada regressão')
+    args = parser.parse_args()
+
+    if args.compare:
+        regressions = compare_results(args.compare[0], args.compare[1], args.threshold)
+        sys.exit(1 if regressions else 0)
+
+    names = args.only or list(BENCHMARKS)
+    data = run_benchmarks(names, args.quick)
+
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime('%Y%m%d-%H%M%S')
+        output = os.path.join(RESULTS_DIR, f"{stamp}-{data['meta']['commit'] or 'local'}.json")
+    with open(output, 'w') as f:
+        json.dump(data, f, indent=2)
+    print(f"Resultados: {output}")
+
+
+if __name__ == "__main__":
+    main()
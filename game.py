@@ -4,18 +4,32 @@ Autoria: João Oliveira 1240369 / João Santos 1240368
 Data: 19/11/2025
 """
 
+import time
+STARTUP_TIME = time.perf_counter()  # Início do arranque (tempo até ao primeiro frame)
+
 import pygame
 import serial
 import serial.tools.list_ports
 import sys
 import math
 import random
-import time
 import sqlite3
 import json
 import os
+import csv
+import zipfile
+import argparse
+import socket
+import urllib.parse
+from http.server import HTTPServer, BaseHTTPRequestHandler
 from datetime import datetime
 import threading
+import multiprocessing
+import hashlib
+import mmap
+import zlib
+from concurrent.futures import ThreadPoolExecutor  # ProcessPoolExecutor importado só onde é usado
+from collections import deque, OrderedDict
 import numpy as np
 
 # Configurações do jogo
@@ -30,6 +44,88 @@ MAZE_MARGIN_TOP = 120
 # Arquivo de configurações
 CONFIG_FILE = "config.json"
 
+# Base de dados local
+DB_FILE = "gravitymaze.db"
+
+# Leaderboard: linhas visíveis, tamanho de cada página lida da base de dados e
+# máximo de linhas mantidas em memória enquanto se faz scroll
+LEADERBOARD_VISIBLE_ROWS = 10
+LEADERBOARD_PAGE_SIZE = 25
+LEADERBOARD_MAX_ROWS = 200
+
+# Importações com mais linhas do que isto reconstroem os índices de ranking no fim
+BULK_IMPORT_REBUILD_ROWS = 50000
+
+# Sincronização de leaderboards entre quiosques (ativa quando 'sync_url' está definido)
+SYNC_CACHE_FILE = "leaderboard_cache.json"
+SYNC_BATCH_SIZE = 500
+SYNC_INTERVAL = 10  # segundos entre ciclos de sincronização
+SYNC_TOP_LIMIT = 100
+SYNC_PORT = 8765
+
+# Cache de labirintos (LRU em memória, opcionalmente também em disco)
+MAZE_CACHE_SIZE = 64
+MAZE_CACHE_VERSION = 5  # Incrementar quando mudar o formato / a geração dos labirintos
+MAZE_SELECT_CANDIDATES = 32  # Labirintos candidatos no modo "banda de dificuldade"
+
+# Profiler de frames (F3 = overlay, F4 = gravar trace Chrome)
+PROFILER_WINDOW = 300  # frames usados nos percentis
+PROFILER_GRAPH_FRAMES = 120
+PROFILER_TRACE_MAX_EVENTS = 500000
+
+# Cache de surfaces (sprites, camada estática do nível, texto): LRU com orçamento de memória
+SURFACE_CACHE_MB = 32
+
+# Hit-testing dos elementos clicáveis de cada ecrã (grelha de zonas em coordenadas do mundo)
+HIT_GRID_BUCKET = 64
+
+# Ecrãs estáticos (menus): só redesenhados quando algo muda; sem nada para fazer o loop fica
+# bloqueado em pygame.event.wait
+IDLE_MAX_WAIT_MS = 1000
+
+# Bot (testes de longa duração / carga): controlador PD que segue o campo de distâncias
+BOT_KP = 0.08  # g por pixel de erro
+BOT_KD = 0.004  # g por pixel/s de velocidade
+
+# Áudio: canais reservados por classe de efeito; volume das colisões pela velocidade do impacto
+SOUND_CHANNEL_POOLS = {'impacts': 2, 'events': 3, 'music': 1}
+SOUND_VOLUME_VARIANTS = (0.25, 0.5, 0.75, 1.0)
+SOUND_IMPACT_MIN_SPEED = 15  # px/s; abaixo disto é a bola encostada/a deslizar na parede (sem som)
+SOUND_IMPACT_FULL_SPEED = 300  # px/s para o volume máximo
+SOUND_SYNTH_VERSION = 1  # Mudar quando as funções *_wave mudam (invalida os .pcm em cache)
+SOUND_CACHE_MAGIC = b'GMSB'  # Cabeçalho dos .pcm em cache: magic + número de frames (4 bytes)
+
+# Música (chiptune sintetizado por blocos para um anel de Sounds reutilizados)
+MUSIC_BPM = 132
+MUSIC_STEPS_PER_BEAT = 4  # Semicolcheias
+MUSIC_CHUNK_FRAMES = 4096  # Amostras por bloco (~93 ms a 44.1 kHz): trabalho fixo por bloco
+MUSIC_RING_CHUNKS = 3  # Um a tocar, um na fila do canal, um a ser escrito
+MUSIC_VOLUME = 0.35  # Relativo ao volume do jogo
+MUSIC_URGENT_TIME = 30  # Segundos restantes a partir dos quais a música acelera (timer a descer)
+MUSIC_TEMPO_BOOST = 0.5  # Aceleração máxima (+50%) com o tempo a acabar
+
+# Replays (ficheiros .gmr: inputs por passo de física + eventos)
+REPLAY_DIR = "replays"
+REPLAY_SCORES_DIR = os.path.join(REPLAY_DIR, "scores")  # Replays de pontuações guardadas (nunca apagados)
+REPLAY_MAGIC = b'GMRP'
+REPLAY_VERSION = 2  # 2: stream de registos comprimido com zlib (a versão 1 continua a ser lida)
+REPLAY_COMPRESSION_LEVEL = 6
+REPLAY_READ_CHUNK = 64 * 1024  # Bytes lidos do mmap / descomprimidos de cada vez ao reproduzir
+REPLAY_MAX_RECORD = 64  # Tamanho máximo de um registo (etiqueta + 5 varints)
+REPLAY_MAX_TIME = 4 * 3600  # Jogo mais longo aceite ao re-simular (segundos)
+REPLAY_KEEP = 500  # Máximo de ficheiros em replays/ (os mais antigos são apagados)
+REPLAY_INPUT_SCALE = 100  # inputs gravados em centésimas de g (a resolução do acelerómetro)
+REPLAY_TAG_INPUT = 1
+REPLAY_TAG_ACTION = 2
+REPLAY_TAG_EVENT = 3
+REPLAY_TAG_END = 4
+REPLAY_ACTION_RESTART_LEVEL = 1
+REPLAY_ACTION_NEXT_LEVEL = 2
+REPLAY_ACTION_FORCE_FINISH = 3
+REPLAY_EVENT_MINE_HIT = 1
+REPLAY_EVENT_LEVEL_COMPLETE = 2
+REPLAY_EVENT_GAME_OVER = 3
+
 # Traduções
 TRANSLATIONS = {
     'pt': {
@@ -126,6 +222,9 @@ TRANSLATIONS = {
         'difficulty_hard': 'Difícil',
         'hud_instructions': 'ESC: Pausar | R: Reiniciar',
         'stm32_detected': 'STM32 Detectados',
+        'jump_to_me': 'Ir para mim',
+        'scope_local': 'Local',
+        'scope_global': 'Global',
     },
     'en': {
         'title': 'GravityMaze',
@@ -221,13 +320,52 @@ TRANSLATIONS = {
         'difficulty_hard': 'Hard',
         'hud_instructions': 'ESC: Pause | R: Restart',
         'stm32_detected': 'STM32 Detected',
+        'jump_to_me': 'Find me',
+        'scope_local': 'Local',
+        'scope_global': 'Global',
     }
 }
 
 # Função helper para tradução
+# Traduções compiladas no arranque: uma tupla por idioma indexada pelo ID (inteiro) da mensagem,
+# com as chaves em falta já resolvidas (português e, por fim, a própria chave)
+MESSAGE_KEYS = tuple(dict.fromkeys(key for table in TRANSLATIONS.values() for key in table))
+MESSAGE_IDS = {key: message_id for message_id, key in enumerate(MESSAGE_KEYS)}
+MESSAGE_TABLES = {
+    lang: tuple(table.get(key, TRANSLATIONS['pt'].get(key, key)) for key in MESSAGE_KEYS)
+    for lang, table in TRANSLATIONS.items()
+}
+
 def t(key, lang='pt'):
     """Traduzir uma chave para o idioma especificado"""
-    return TRANSLATIONS.get(lang, TRANSLATIONS['pt']).get(key, key)
+    message_id = MESSAGE_IDS.get(key)
+    if message_id is None:
+        return key
+    return MESSAGE_TABLES.get(lang, MESSAGE_TABLES['pt'])[message_id]
+
+# Texto de cada botão (atributo do Game -> IDs das mensagens, pela ordem dos botões); aplicado
+# por Game.apply_language só quando os botões são criados ou o idioma muda, não em cada frame
+BUTTON_LABELS = {
+    name: tuple(MESSAGE_IDS[key] for key in keys) for name, keys in {
+        'main_menu_buttons': ('play', 'settings', 'leaderboard', 'exit'),
+        'settings_buttons': ('back',),
+        'pause_menu_buttons': ('resume', 'restart', 'menu'),
+        'win_menu_buttons': ('next_level', 'menu'),
+        'leaderboard_filter_buttons': ('all_modes', 'normal_mode', 'minefield_mode', 'timeattack_mode',
+                                       'elimination_mode'),
+        'leaderboard_buttons': ('back',),
+        'leaderboard_jump_button': ('jump_to_me',),
+        'mode_select_back_button': ('back',),
+        'player_select_buttons': ('single_player', 'multi_player', 'back'),
+        'gameover_buttons': ('try_again', 'menu'),
+        'mp_win_buttons': ('play_again', 'menu'),
+        'name_input_buttons': ('save', 'discard'),
+        'difficulty_buttons': ('difficulty_easy', 'difficulty_normal', 'difficulty_hard', 'back'),
+        'stm32_setup_buttons': ('beep_1', 'beep_2', 'continue', 'back'),
+        'controls_back_button': ('back',),
+        'player_profile_back_button': ('back',),
+    }.items()
+}
 
 # Cores
 BLACK = (0, 0, 0)
@@ -246,8 +384,28 @@ ORANGE = (255, 100, 0)
 # Configurações da bola
 BALL_RADIUS = 10
 BALL_COLOR = RED
+BALL2_COLOR = GREEN
 FRICTION = 0.98
 
+# Atlas de sprites (bolas, corações, indicador de direção) pré-desenhados numa só surface
+SPRITE_ATLAS_WIDTH = 1024
+SPRITE_ATLAS_COLORKEY = (255, 0, 255)  # Fundo transparente do atlas (cor que nenhum sprite usa)
+ARROW_ANGLE_STEP = 6  # graus entre frames da seta de direção
+INDICATOR_SIZE = 40
+INDICATOR_COLORS = (BLUE, RED, GREEN)  # Um jogador / jogador 1 / jogador 2
+HEART_SIZE = 30
+HEART_PULSE = 0.3  # Escala máxima do pulso ao perder uma vida (+/-30%)
+
+# Física em passo fixo (necessário para os replays serem determinísticos)
+PHYSICS_SUBSTEPS = 4  # passos de física por frame a FPS
+PHYSICS_DT = 1.0 / (FPS * PHYSICS_SUBSTEPS)
+PHYSICS_FRICTION = FRICTION ** (1 / PHYSICS_SUBSTEPS)  # Atrito por passo (igual ao atrito por frame)
+MAX_STEP_TIME = 0.25  # segundos de jogo no máximo por frame (evita saltos após bloqueios)
+
+# Broadphase das colisões (paredes agrupadas por zonas do ecrã)
+WALL_INDEX_BUCKET = 32  # px
+WALL_INDEX_MARGIN = BALL_RADIUS * 4  # cobre o raio da bola e os empurrões de várias colisões no mesmo passo
+
 # Aceleração gravitacional real em pixels/s² (9.8 m/s² convertido)
 # 1g = 9.8 m/s² -> assumindo que 1m = 100 pixels no jogo
 REAL_GRAVITY = 980  # pixels/s²
@@ -260,110 +418,370 @@ WALL_THICKNESS = 10
 # Sound Generation Functions
 # =============================================================================
 
-def generate_8bit_sound(frequency, duration, sample_rate=22050):
-    """Generate a simple 8-bit style sound wave"""
-    t = np.linspace(0, duration, int(sample_rate * duration))
-    wave = np.sin(2 * np.pi * frequency * t)
-    # Convert to 8-bit style by quantizing
-    wave = np.round(wave * 127) / 127
-    # Convert to 16-bit for pygame
-    wave = np.int16(wave * 32767)
-    # Stereo
+def quantize_8bit(wave, gain=1.0):
+    """Float em [-1, 1] -> int16 com o som "8-bit" (127 níveis)"""
+    wave = np.clip(np.round(wave * 127) / 127, -1, 1)
+    return np.int16(wave * 32767 * gain)
+
+def stereo_sound(wave):
     stereo_wave = np.repeat(wave.reshape(-1, 1), 2, axis=1)
     return pygame.sndarray.make_sound(stereo_wave)
 
-def generate_level_complete_sound():
-    """Generate upward arpeggio for level complete - C major chord"""
-    sample_rate = 22050
-    duration = 0.1
-    notes = [523, 659, 784, 1047]  # C5, E5, G5, C6
-
-    sounds = []
-    for freq in notes:
-        t = np.linspace(0, duration, int(sample_rate * duration))
-        wave = np.sin(2 * np.pi * freq * t)
-        # Apply envelope for smooth sound
-        envelope = np.exp(-3 * t / duration)
-        wave = wave * envelope
-        # 8-bit style
-        wave = np.round(wave * 127) / 127
-        wave = np.int16(wave * 32767)
-        sounds.append(wave)
-
-    # Concatenate all notes
-    full_wave = np.concatenate(sounds)
-    stereo_wave = np.repeat(full_wave.reshape(-1, 1), 2, axis=1)
-    return pygame.sndarray.make_sound(stereo_wave)
+def generate_8bit_sound(frequency, duration, sample_rate=22050):
+    """Generate a simple 8-bit style sound wave"""
+    t = np.linspace(0, duration, int(sample_rate * duration))
+    return stereo_sound(quantize_8bit(np.sin(2 * np.pi * frequency * t)))
 
-def generate_mine_hit_sound():
-    """Generate explosion sound for mine hit"""
-    sample_rate = 22050
-    duration = 0.3
+def level_complete_wave(sample_rate=22050, notes=(523, 659, 784, 1047), duration=0.1):
+    """Upward arpeggio for level complete - C major chord (C5, E5, G5, C6)"""
+    t = np.linspace(0, duration, int(sample_rate * duration))
+    # Apply envelope for smooth sound
+    envelope = np.exp(-3 * t / duration)
+    return np.concatenate([quantize_8bit(np.sin(2 * np.pi * freq * t) * envelope) for freq in notes])
 
+def mine_hit_wave(sample_rate=22050, duration=0.3, seed=0):
+    """Explosion sound for mine hit"""
     t = np.linspace(0, duration, int(sample_rate * duration))
     # Start with high frequency noise, drop to low rumble
     freq = 800 * np.exp(-8 * t / duration) + 60
     wave = np.sin(2 * np.pi * freq * t)
-    # Add noise for explosion effect
-    noise = np.random.uniform(-0.3, 0.3, len(t))
+    # Add noise for explosion effect (seed fixa: o mesmo som em todas as execuções / na cache)
+    noise = np.random.default_rng(seed).uniform(-0.3, 0.3, len(t))
     wave = wave * 0.7 + noise * 0.3
     # Apply envelope
     envelope = np.exp(-4 * t / duration)
-    wave = wave * envelope
-    # 8-bit style
-    wave = np.round(wave * 127) / 127
-    wave = np.int16(wave * 32767)
-
-    stereo_wave = np.repeat(wave.reshape(-1, 1), 2, axis=1)
-    return pygame.sndarray.make_sound(stereo_wave)
-
-def generate_game_over_sound():
-    """Generate dramatic descending arpeggio for game over"""
-    sample_rate = 22050
-    duration = 0.25
-    # Dramatic descending minor chord progression
-    notes = [523, 392, 349, 294, 262, 220]  # C5, G4, F4, D4, C4, A3 (descending arpeggio)
-
-    sounds = []
-    for i, freq in enumerate(notes):
-        t = np.linspace(0, duration, int(sample_rate * duration))
-        # Sine wave with slight vibrato for dramatic effect
-        vibrato = 1 + 0.02 * np.sin(2 * np.pi * 5 * t)
-        wave = np.sin(2 * np.pi * freq * vibrato * t)
-        # Strong decay envelope for dramatic effect
-        envelope = np.exp(-3 * t / duration)
-        wave = wave * envelope
-        # 8-bit style
-        wave = np.round(wave * 127) / 127
-        wave = np.int16(wave * 32767)
-        sounds.append(wave)
-
-    # Concatenate all notes
-    full_wave = np.concatenate(sounds)
-    stereo_wave = np.repeat(full_wave.reshape(-1, 1), 2, axis=1)
-    return pygame.sndarray.make_sound(stereo_wave)
-
-def generate_wall_collision_sound():
-    """Generate short impact sound for wall collisions"""
-    sample_rate = 22050
-    duration = 0.08  # Very short impact
+    return quantize_8bit(wave * envelope)
 
+def game_over_wave(sample_rate=22050, notes=(523, 392, 349, 294, 262, 220), duration=0.25):
+    """Dramatic descending arpeggio for game over (C5, G4, F4, D4, C4, A3)"""
+    t = np.linspace(0, duration, int(sample_rate * duration))
+    # Sine wave with slight vibrato for dramatic effect
+    vibrato = 1 + 0.02 * np.sin(2 * np.pi * 5 * t)
+    # Strong decay envelope for dramatic effect
+    envelope = np.exp(-3 * t / duration)
+    return np.concatenate([quantize_8bit(np.sin(2 * np.pi * freq * vibrato * t) * envelope) for freq in notes])
+
+def wall_collision_wave(sample_rate=22050, duration=0.08, seed=0):
+    """Short impact sound for wall collisions"""
     t = np.linspace(0, duration, int(sample_rate * duration))
     # Mix of frequencies for impact effect
     wave = (np.sin(2 * np.pi * 200 * t) +
             0.5 * np.sin(2 * np.pi * 150 * t) +
-            0.3 * np.random.randn(len(t)))  # Add noise for impact
+            0.3 * np.random.default_rng(seed).standard_normal(len(t)))  # Add noise for impact
 
     # Sharp attack, quick decay
     envelope = np.exp(-30 * t / duration)
-    wave = wave * envelope
+    return quantize_8bit(wave * envelope, gain=0.3)  # Lower volume (30%)
 
-    # 8-bit style and normalize
-    wave = np.round(wave * 127) / 127
-    wave = np.int16(wave * 32767 * 0.3)  # Lower volume (30%)
+def generate_level_complete_sound():
+    return stereo_sound(level_complete_wave())
 
-    stereo_wave = np.repeat(wave.reshape(-1, 1), 2, axis=1)
-    return pygame.sndarray.make_sound(stereo_wave)
+def generate_mine_hit_sound():
+    return stereo_sound(mine_hit_wave())
+
+def generate_game_over_sound():
+    return stereo_sound(game_over_wave())
+
+def generate_wall_collision_sound():
+    return stereo_sound(wall_collision_wave())
+
+# Efeitos sonoros: função que gera a onda mono int16 (+ parâmetros), volume relativo, pool de
+# canais do AudioEngine, intervalo mínimo entre repetições do mesmo jogador e variantes de volume
+SOUND_EFFECTS = {
+    'level_complete': {'synth': level_complete_wave, 'pool': 'events'},
+    'mine_hit': {'synth': mine_hit_wave, 'params': {'seed': 0}, 'pool': 'events'},
+    'game_over': {'synth': game_over_wave, 'pool': 'events'},
+    'wall_collision': {
+        'synth': wall_collision_wave,
+        'params': {'seed': 0},
+        'volume': 0.3,  # Wall collision is quieter
+        'pool': 'impacts',
+        'rate_limit': 0.1,
+        'variants': SOUND_VOLUME_VARIANTS,
+    },
+}
+
+
+class SoundBank:
+    """Efeitos sonoros gerados só quando são tocados pela primeira vez.
+
+    O PCM já no formato do mixer fica em cache_dir/<hash dos parâmetros>.pcm; nas execuções
+    seguintes o ficheiro é mapeado em memória em vez de ser sintetizado outra vez. O ficheiro
+    começa com o número de frames, para um .pcm truncado ou corrompido ser gerado de novo.
+    Cada variante de volume (gain) é um som à parte, com o ganho aplicado às amostras."""
+
+    def __init__(self, cache_dir=None, volume=1.0, effects=SOUND_EFFECTS):
+        self.cache_dir = cache_dir
+        self.volume = volume
+        self.effects = effects
+        self.sounds = {}  # (nome, gain) -> Sound
+        self.failed = set()
+        if cache_dir:
+            try:
+                os.makedirs(cache_dir, exist_ok=True)
+            except OSError:
+                self.cache_dir = None
+
+    def get(self, name, gain=1.0):
+        """Sound do efeito (None se o mixer não estiver disponível ou a geração falhar)"""
+        key = (name, gain)
+        sound = self.sounds.get(key)
+        if sound is None and key not in self.failed:
+            try:
+                sound = self.load(name, gain)
+            except Exception as e:
+                print(f"Warning: Could not generate sound '{name}': {e}")
+                self.failed.add(key)
+                return None
+            if sound is not None:
+                sound.set_volume(self.volume * self.effects[name].get('volume', 1.0))
+                self.sounds[key] = sound
+        return sound
+
+    def variants(self):
+        """Todos os (nome, gain) que o jogo pode pedir (para os preparar antes de jogar)"""
+        return [(name, gain) for name, effect in self.effects.items()
+                for gain in effect.get('variants', (1.0,))]
+
+    def set_volume(self, volume):
+        self.volume = volume
+        for (name, _), sound in self.sounds.items():
+            sound.set_volume(volume * self.effects[name].get('volume', 1.0))
+
+    def cache_path(self, name, gain, mixer_format):
+        effect = self.effects[name]
+        key = json.dumps([SOUND_SYNTH_VERSION, name, effect['synth'].__name__,
+                          sorted(effect.get('params', {}).items()), gain, mixer_format])
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.pcm')
+
+    def load(self, name, gain):
+        mixer_format = pygame.mixer.get_init()  # (frequência, bits, canais)
+        if mixer_format is None:
+            return None
+        frequency, size, channels = mixer_format
+        if size != -16:
+            # Outro formato de amostras: o pygame converte, mas não vale a pena guardar em cache
+            return pygame.sndarray.make_sound(self.render(name, gain, frequency, channels))
+        path = self.cache_path(name, gain, mixer_format) if self.cache_dir else None
+        header_size = len(SOUND_CACHE_MAGIC) + 4
+        if path:
+            try:
+                with open(path, 'rb') as f:
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                try:
+                    frames = int.from_bytes(data[len(SOUND_CACHE_MAGIC):header_size], 'little')
+                    if data[:len(SOUND_CACHE_MAGIC)] == SOUND_CACHE_MAGIC and \
+                            len(data) == header_size + frames * channels * 2:
+                        with memoryview(data) as view, view[header_size:] as pcm:
+                            return pygame.mixer.Sound(buffer=pcm)
+                finally:
+                    data.close()
+            except (OSError, ValueError):
+                pass  # Ainda não está em cache (ou ficheiro vazio / ilegível)
+
+        samples = self.render(name, gain, frequency, channels)
+        pcm = samples.tobytes()
+        if path:
+            try:
+                # Escrever para um ficheiro temporário e renomear: nunca fica um .pcm incompleto
+                with open(path + '.tmp', 'wb') as f:
+                    f.write(SOUND_CACHE_MAGIC + len(samples).to_bytes(4, 'little'))
+                    f.write(pcm)
+                os.replace(path + '.tmp', path)
+            except OSError as e:
+                print(f"Warning: Could not cache sound '{name}': {e}")
+        return pygame.mixer.Sound(buffer=pcm)
+
+    def render(self, name, gain, frequency, channels):
+        """Amostras int16 do efeito, intercaladas por canal (o formato do mixer do jogo)"""
+        effect = self.effects[name]
+        wave = effect['synth'](sample_rate=frequency, **effect.get('params', {}))
+        if gain != 1.0:
+            wave = np.int16(wave * gain)
+        return np.repeat(wave.reshape(-1, 1), channels, axis=1)
+
+
+class AudioEngine:
+    """Efeitos do jogo em canais reservados por classe (pools de SOUND_CHANNEL_POOLS).
+
+    As colisões de um jogador nunca roubam o canal de uma explosão nem as do outro jogador;
+    o limite de repetições (rate_limit) é por efeito e por jogador; o volume das colisões
+    escolhe uma das variantes pré-geradas pela velocidade do impacto. play() não faz
+    trabalho NumPy desde que as variantes tenham sido preparadas (preload)."""
+
+    def __init__(self, bank, pools=SOUND_CHANNEL_POOLS):
+        self.bank = bank
+        self.pools = {}
+        self.last_play = {}  # (efeito, jogador) -> time.perf_counter() do último play
+        if pygame.mixer.get_init():
+            reserved = sum(pools.values())
+            # Canais reservados não são usados por Sound.play(); deixar alguns livres para o resto
+            pygame.mixer.set_num_channels(max(pygame.mixer.get_num_channels(), reserved + 4))
+            pygame.mixer.set_reserved(reserved)
+            first = 0
+            for pool, size in pools.items():
+                self.pools[pool] = [pygame.mixer.Channel(i) for i in range(first, first + size)]
+                first += size
+
+    def preload(self, name, gain=1.0):
+        self.bank.get(name, gain)
+
+    def play(self, name, player=0, intensity=1.0):
+        """Tocar um efeito; intensity (0-1) escolhe a variante de volume. Devolve o canal ou None"""
+        if self.bank.volume <= 0:
+            return None
+        effect = self.bank.effects[name]
+        rate_limit = effect.get('rate_limit')
+        if rate_limit:
+            now = time.perf_counter()
+            if now - self.last_play.get((name, player), -rate_limit) < rate_limit:
+                return None
+            self.last_play[(name, player)] = now
+
+        variants = effect.get('variants')
+        if variants:
+            gain = variants[max(0, min(len(variants) - 1, math.ceil(intensity * len(variants)) - 1))]
+        else:
+            gain = 1.0
+        sound = self.bank.get(name, gain)
+        if sound is None:
+            return None
+
+        channels = self.pools.get(effect.get('pool'))
+        if not channels:
+            return sound.play()
+        # Canal livre do pool, a começar pelo "do jogador"; se estão todos ocupados, o do jogador
+        start = player % len(channels)
+        channel = channels[start]
+        for i in range(len(channels)):
+            candidate = channels[(start + i) % len(channels)]
+            if not candidate.get_busy():
+                channel = candidate
+                break
+        channel.play(sound)
+        return channel
+
+# Música de fundo: 4 compassos de 16 passos (notas MIDI, 0 = pausa) em lá menor
+MUSIC_LEAD = (
+    69, 0, 72, 0, 76, 0, 72, 0, 69, 0, 76, 0, 74, 0, 72, 0,
+    67, 0, 71, 0, 74, 0, 71, 0, 67, 0, 74, 0, 72, 0, 71, 0,
+    65, 0, 69, 0, 72, 0, 69, 0, 65, 0, 72, 0, 71, 0, 69, 0,
+    64, 0, 68, 0, 71, 0, 76, 0, 74, 0, 71, 0, 68, 0, 64, 0,
+)
+MUSIC_BASS = tuple(note for root in (45, 43, 41, 40) for note in (root, 0, root + 12, 0) * 4)
+MUSIC_DRUMS = (1, 0, 1, 0, 2, 0, 1, 0, 1, 0, 1, 0, 2, 0, 1, 1) * 4  # 1 = hi-hat, 2 = tarola
+
+
+class ChiptuneSequencer:
+    """Sintetiza a música em blocos de tamanho fixo: onda quadrada (melodia), triangular (baixo)
+    e ruído (bateria).
+
+    As fases dos osciladores e a posição na música continuam de um bloco para o outro, por isso
+    mudar o andamento entre blocos não provoca cliques."""
+
+    def __init__(self, sample_rate, lead=MUSIC_LEAD, bass=MUSIC_BASS, drums=MUSIC_DRUMS, seed=0):
+        self.sample_rate = sample_rate
+        self.length = len(lead)
+        self.lead_freq = self.note_frequencies(lead)
+        self.bass_freq = self.note_frequencies(bass)
+        self.drums = np.array(drums)
+        self.noise = np.random.default_rng(seed).uniform(-1, 1, sample_rate // 4)
+        self.position = 0.0  # Passo atual (fracionário)
+        self.lead_phase = 0.0
+        self.bass_phase = 0.0
+        self.sample_count = 0
+
+    @staticmethod
+    def note_frequencies(notes):
+        notes = np.array(notes, dtype=np.float64)
+        return np.where(notes > 0, 440.0 * 2 ** ((notes - 69) / 12), 0.0)
+
+    def render(self, out, bpm):
+        """Escrever o próximo bloco em out (int16, (amostras, canais)) com o andamento bpm"""
+        frames = len(out)
+        ramp = np.arange(frames, dtype=np.float64)
+        step_per_sample = bpm * MUSIC_STEPS_PER_BEAT / 60 / self.sample_rate
+        position = self.position + ramp * step_per_sample
+        step = position.astype(np.int64)
+        within = position - step  # 0..1 dentro do passo (envelopes)
+        step %= self.length
+
+        # Melodia: quadrada com decaimento em cada nota
+        freq = self.lead_freq[step]
+        phase = self.lead_phase + np.cumsum(freq) / self.sample_rate
+        wave = np.where(phase % 1.0 < 0.5, 0.22, -0.22) * np.exp(-2.5 * within) * (freq > 0)
+
+        # Baixo: triangular
+        freq = self.bass_freq[step]
+        bass_phase = self.bass_phase + np.cumsum(freq) / self.sample_rate
+        wave += (4 * np.abs(bass_phase % 1.0 - 0.5) - 1) * 0.3 * np.exp(-1.5 * within) * (freq > 0)
+
+        # Bateria: ruído com decaimento curto (hi-hat) ou longo (tarola)
+        drum = self.drums[step]
+        noise = self.noise[(self.sample_count + ramp.astype(np.int64)) % len(self.noise)]
+        wave += noise * np.where(drum == 2, 0.25 * np.exp(-10 * within),
+                                 np.where(drum == 1, 0.1 * np.exp(-30 * within), 0.0))
+
+        self.position = (self.position + frames * step_per_sample) % self.length
+        self.lead_phase = phase[-1] % 1.0
+        self.bass_phase = bass_phase[-1] % 1.0
+        self.sample_count = (self.sample_count + frames) % len(self.noise)
+        mono = (np.clip(wave, -1, 1) * 32767).astype(np.int16)
+        out[:] = mono[:, None] if out.ndim == 2 else mono
+
+
+class MusicPlayer:
+    """Música em streaming num canal reservado, com memória constante.
+
+    Um anel de MUSIC_RING_CHUNKS Sounds é criado uma vez; cada bloco novo é escrito
+    diretamente nas amostras do Sound livre (sndarray.samples) e posto na fila do canal
+    quando o anterior começa a tocar. update() é chamado em cada frame e só sintetiza
+    quando a fila esvazia (um bloco de cada vez)."""
+
+    def __init__(self, channel, volume=1.0):
+        self.channel = channel
+        self.volume = volume
+        self.sequencer = None
+        self.ring = []
+        self.next_slot = 0
+        self.playing = False
+
+    def start_ring(self):
+        frequency, size, channels = pygame.mixer.get_init()
+        self.sequencer = ChiptuneSequencer(frequency)
+        silence = np.zeros((MUSIC_CHUNK_FRAMES, channels), dtype=np.int16)
+        for _ in range(MUSIC_RING_CHUNKS):
+            sound = pygame.sndarray.make_sound(silence)
+            sound.set_volume(self.volume * MUSIC_VOLUME)
+            self.ring.append((sound, pygame.sndarray.samples(sound)))
+
+    def render_next(self, bpm):
+        sound, samples = self.ring[self.next_slot]
+        self.sequencer.render(samples, bpm)
+        self.next_slot = (self.next_slot + 1) % len(self.ring)
+        return sound
+
+    def update(self, active, bpm=MUSIC_BPM):
+        """Tocar (active) ou parar; com o canal a tocar, manter sempre um bloco na fila"""
+        if self.channel is None or self.volume <= 0 or not active:
+            if self.playing:
+                self.channel.stop()
+                self.playing = False
+            return
+        if not self.ring:
+            self.start_ring()
+        if not self.playing or not self.channel.get_busy():
+            # Início (ou a fila esvaziou por um frame muito longo): recomeçar com dois blocos
+            self.channel.play(self.render_next(bpm))
+            self.channel.queue(self.render_next(bpm))
+            self.playing = True
+        elif self.channel.get_queue() is None:
+            self.channel.queue(self.render_next(bpm))
+
+    def set_volume(self, volume):
+        self.volume = volume
+        for sound, _ in self.ring:
+            sound.set_volume(volume * MUSIC_VOLUME)
 
 # =============================================================================
 # MODOS DE JOGO
@@ -499,7 +917,18 @@ class Config:
             'invert_y': True,
             'swap_xy': False,
             'language': 'pt',
-            'game_volume': 0.7
+            'game_volume': 0.7,
+            'sync_url': '',  # ex: http://192.168.1.10:8765 (vazio = sem sincronização)
+            'kiosk_id': '',  # vazio = nome da máquina
+            'show_profiler': False,  # Overlay de tempos por fase (F3)
+            'maze_cache_dir': '',  # Pasta para guardar labirintos gerados (vazio = só em memória)
+            'sound_cache_dir': 'sound_cache',  # Efeitos sonoros já sintetizados (vazio = gerar sempre)
+            'music': True,  # Música chiptune durante o jogo
+            'surface_cache_mb': SURFACE_CACHE_MB,  # Memória máxima das surfaces em cache (sprites, texto, níveis)
+            'daily_challenge': False,  # Labirintos do dia: todos os quiosques jogam os mesmos níveis
+            'maze_difficulty_band': [],  # ex: [2.0, 3.5] = só labirintos com essa dificuldade (vazio = qualquer)
+            'record_replays': True,  # Gravar cada jogo em replays/ (verificação de pontuações, ver jogos)
+            'replay_keep': REPLAY_KEEP  # Máximo de replays guardados (os mais antigos são apagados; 0 = sem limite)
         }
         self.config = self.load()
 
@@ -532,8 +961,9 @@ class Config:
 
 class Database:
     """Gestão da base de dados SQLite para leaderboard"""
-    def __init__(self):
-        self.conn = sqlite3.connect('gravitymaze.db')
+    def __init__(self, db_path=DB_FILE, check_same_thread=True):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(db_path, check_same_thread=check_same_thread)
         self.create_table()
 
     def create_table(self):
@@ -558,6 +988,25 @@ class Database:
             cursor.execute("ALTER TABLE leaderboard ADD COLUMN game_mode TEXT DEFAULT 'normal'")
             self.conn.commit()
 
+        # Replay de cada pontuação e resultado da verificação (NULL = por verificar, 1 = ok, 0 = falhou)
+        for column, column_type in (('replay', 'TEXT'), ('verified', 'INTEGER')):
+            try:
+                cursor.execute(f"SELECT {column} FROM leaderboard LIMIT 1")
+            except sqlite3.OperationalError:
+                cursor.execute(f"ALTER TABLE leaderboard ADD COLUMN {column} {column_type}")
+                self.conn.commit()
+
+        # Deduplicação na importação: uma entrada é identificada por (jogador, data, modo)
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_leaderboard_dedupe
+            ON leaderboard (player_name, date, game_mode)
+        ''')
+
+        # Índices de ranking e contadores por nível
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table' AND name = 'leaderboard_level_counts'")
+        counts_exist = cursor.fetchone() is not None
+        self.create_rank_structures(cursor, rebuild_counts=not counts_exist)
+
         # Create player_stats table for player profiles
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS player_stats (
@@ -575,13 +1024,72 @@ class Database:
         ''')
         self.conn.commit()
 
-    def add_score(self, player_name, level, time_taken, score, game_mode='normal'):
+    def create_rank_structures(self, cursor, rebuild_counts=False):
+        """Criar índices de ranking e contadores por (modo, nível) mantidos por triggers"""
+        # Índices para ordenação/paginação da leaderboard (keyset) e pesquisa por jogador
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_leaderboard_rank
+            ON leaderboard (level DESC, score DESC, time ASC, id ASC)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_leaderboard_mode_rank
+            ON leaderboard (game_mode, level DESC, score DESC, time ASC, id ASC)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_leaderboard_player
+            ON leaderboard (player_name, level DESC, score DESC, time ASC, id ASC)
+        ''')
+
+        # Contadores por (modo, nível) - evitam contar todas as entradas de níveis
+        # superiores ao calcular a posição de uma pontuação
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS leaderboard_level_counts (
+                game_mode TEXT NOT NULL,
+                level INTEGER NOT NULL,
+                n INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (game_mode, level)
+            )
+        ''')
+        if rebuild_counts:
+            cursor.execute("DELETE FROM leaderboard_level_counts")
+            cursor.execute('''
+                INSERT INTO leaderboard_level_counts (game_mode, level, n)
+                SELECT IFNULL(game_mode, 'normal'), level, COUNT(*)
+                FROM leaderboard
+                GROUP BY IFNULL(game_mode, 'normal'), level
+            ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_leaderboard_count_insert
+            AFTER INSERT ON leaderboard
+            BEGIN
+                INSERT INTO leaderboard_level_counts (game_mode, level, n)
+                VALUES (IFNULL(NEW.game_mode, 'normal'), NEW.level, 1)
+                ON CONFLICT (game_mode, level) DO UPDATE SET n = n + 1;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_leaderboard_count_delete
+            AFTER DELETE ON leaderboard
+            BEGIN
+                UPDATE leaderboard_level_counts SET n = n - 1
+                WHERE game_mode = IFNULL(OLD.game_mode, 'normal') AND level = OLD.level;
+            END
+        ''')
+
+    def drop_rank_structures(self, cursor):
+        """Remover índices de ranking e triggers (importações grandes reconstroem-nos no fim)"""
+        for index in ('idx_leaderboard_rank', 'idx_leaderboard_mode_rank', 'idx_leaderboard_player'):
+            cursor.execute(f"DROP INDEX IF EXISTS {index}")
+        for trigger in ('trg_leaderboard_count_insert', 'trg_leaderboard_count_delete'):
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+
+    def add_score(self, player_name, level, time_taken, score, game_mode='normal', replay=None):
         cursor = self.conn.cursor()
         date = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         cursor.execute('''
-            INSERT INTO leaderboard (player_name, level, time, score, date, game_mode)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (player_name, level, time_taken, score, date, game_mode))
+            INSERT INTO leaderboard (player_name, level, time, score, date, game_mode, replay)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (player_name, level, time_taken, score, date, game_mode, replay))
 
         # Update player stats
         self.update_player_stats(player_name, level, time_taken, score, game_mode)
@@ -659,9 +1167,568 @@ class Database:
             ''', (limit,))
         return cursor.fetchall()
 
+    @staticmethod
+    def score_key(row):
+        """Chave de ordenação (level, score, time, id) de uma linha devolvida por get_scores_page"""
+        return (row[1], row[3], row[2], row[6])
+
+    def get_scores_page(self, limit=10, game_mode=None, after=None, before=None):
+        """Obter uma página da leaderboard por keyset pagination.
+
+        after/before são chaves devolvidas por score_key: a página começa logo a seguir
+        (ou termina logo antes) dessa entrada, sem OFFSET. Cada linha é
+        (player_name, level, time, score, date, game_mode, id)."""
+        cursor = self.conn.cursor()
+        conditions = []
+        params = []
+        if game_mode:
+            conditions.append('game_mode = ?')
+            params.append(game_mode)
+
+        if after is not None:
+            level, score, time_taken, row_id = after
+            conditions.append('''(level < ? OR (level = ? AND (score < ? OR (score = ? AND
+                                (time > ? OR (time = ? AND id > ?))))))''')
+            params.extend([level, level, score, score, time_taken, time_taken, row_id])
+            order = 'level DESC, score DESC, time ASC, id ASC'
+        elif before is not None:
+            level, score, time_taken, row_id = before
+            conditions.append('''(level > ? OR (level = ? AND (score > ? OR (score = ? AND
+                                (time < ? OR (time = ? AND id < ?))))))''')
+            params.extend([level, level, score, score, time_taken, time_taken, row_id])
+            # Percorrer o índice ao contrário e inverter no fim
+            order = 'level ASC, score ASC, time DESC, id DESC'
+        else:
+            order = 'level DESC, score DESC, time ASC, id ASC'
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        cursor.execute(f'''
+            SELECT player_name, level, time, score, date, game_mode, id
+            FROM leaderboard
+            {where}
+            ORDER BY {order}
+            LIMIT ?
+        ''', (*params, limit))
+        rows = cursor.fetchall()
+        if before is not None:
+            rows.reverse()
+        return rows
+
+    def get_rank(self, key, game_mode=None):
+        """Posição (1 = primeiro) da entrada com a chave dada.
+
+        Os níveis superiores vêm dos contadores leaderboard_level_counts; dentro do
+        mesmo nível a contagem é feita só sobre o índice de ordenação."""
+        level, score, time_taken, row_id = key
+        cursor = self.conn.cursor()
+        mode_filter = 'game_mode = ? AND ' if game_mode else ''
+        mode_params = (game_mode,) if game_mode else ()
+
+        cursor.execute(f'''
+            SELECT IFNULL(SUM(n), 0) FROM leaderboard_level_counts
+            WHERE {mode_filter}level > ?
+        ''', (*mode_params, level))
+        better = cursor.fetchone()[0]
+
+        cursor.execute(f'''
+            SELECT
+                (SELECT COUNT(*) FROM leaderboard
+                 WHERE {mode_filter}level = ? AND score > ?) +
+                (SELECT COUNT(*) FROM leaderboard
+                 WHERE {mode_filter}level = ? AND score = ? AND time < ?) +
+                (SELECT COUNT(*) FROM leaderboard
+                 WHERE {mode_filter}level = ? AND score = ? AND time = ? AND id < ?)
+        ''', (*mode_params, level, score,
+              *mode_params, level, score, time_taken,
+              *mode_params, level, score, time_taken, row_id))
+        better += cursor.fetchone()[0]
+        return better + 1
+
+    def get_player_best(self, player_name, game_mode=None):
+        """Melhor entrada de um jogador (mesmo formato que get_scores_page) ou None"""
+        cursor = self.conn.cursor()
+        if game_mode:
+            cursor.execute('''
+                SELECT player_name, level, time, score, date, game_mode, id
+                FROM leaderboard
+                WHERE player_name = ? AND game_mode = ?
+                ORDER BY level DESC, score DESC, time ASC, id ASC
+                LIMIT 1
+            ''', (player_name, game_mode))
+        else:
+            cursor.execute('''
+                SELECT player_name, level, time, score, date, game_mode, id
+                FROM leaderboard
+                WHERE player_name = ?
+                ORDER BY level DESC, score DESC, time ASC, id ASC
+                LIMIT 1
+            ''', (player_name,))
+        return cursor.fetchone()
+
+    def get_scores_around(self, player_name, game_mode=None, rows_before=4, rows_after=5):
+        """Janela da leaderboard centrada na melhor entrada do jogador.
+
+        Devolve (linhas, posição da primeira linha) ou None se o jogador não tiver entradas."""
+        best = self.get_player_best(player_name, game_mode)
+        if best is None:
+            return None
+        key = self.score_key(best)
+        rank = self.get_rank(key, game_mode)
+        previous_rows = self.get_scores_page(rows_before, game_mode, before=key)
+        next_rows = self.get_scores_page(rows_after, game_mode, after=key)
+        return previous_rows + [best] + next_rows, rank - len(previous_rows)
+
+    def iter_table_rows(self, table, chunk_size=50000):
+        """Percorrer uma tabela exportável em blocos, sem a carregar toda em memória"""
+        columns = EXPORT_COLUMNS[table]
+        cursor = self.conn.cursor()
+        order = 'id' if table == 'leaderboard' else 'player_name'
+        select_list = ', '.join("IFNULL(game_mode, 'normal')" if column == 'game_mode' else column
+                                for column in columns)
+        cursor.execute(f"SELECT {select_list} FROM {table} ORDER BY {order}")
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+
+    def import_leaderboard_rows(self, chunks):
+        """Importar blocos de linhas da leaderboard ignorando duplicados (jogador, data, modo).
+
+        As linhas são carregadas com executemany numa tabela temporária e copiadas para a
+        leaderboard numa única transação, agrupadas pela chave de deduplicação (o que
+        remove duplicados do próprio ficheiro e insere por ordem do índice). Em
+        importações grandes os índices de ranking e contadores são reconstruídos de uma
+        vez no fim, em vez de atualizados linha a linha. Devolve (linhas lidas, linhas inseridas)."""
+        cursor = self.conn.cursor()
+        self.conn.commit()
+        for pragma in ("synchronous = OFF", "cache_size = -65536", "temp_store = MEMORY", "threads = 4"):
+            cursor.execute(f"PRAGMA {pragma}")
+        cursor.execute("DROP TABLE IF EXISTS temp.leaderboard_import")
+        cursor.execute('''
+            CREATE TEMP TABLE leaderboard_import (
+                player_name TEXT, level INTEGER, time REAL, score INTEGER, date TEXT, game_mode TEXT
+            )
+        ''')
+        total_read = 0
+        try:
+            cursor.execute("BEGIN")
+            for rows in chunks:
+                cursor.executemany("INSERT INTO leaderboard_import VALUES (?, ?, ?, ?, ?, ?)", rows)
+                total_read += len(rows)
+
+            existing = self.conn.execute("SELECT COUNT(*) FROM leaderboard").fetchone()[0]
+            rebuild = total_read > max(BULK_IMPORT_REBUILD_ROWS, existing // 4)
+            if rebuild:
+                self.drop_rank_structures(cursor)
+
+            cursor.execute('''
+                INSERT INTO leaderboard (player_name, level, time, score, date, game_mode)
+                SELECT s.player_name, s.level, s.time, s.score, s.date, s.game_mode
+                FROM leaderboard_import s
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM leaderboard l
+                    WHERE l.player_name = s.player_name AND l.date = s.date AND l.game_mode = s.game_mode
+                )
+                GROUP BY s.player_name, s.date, s.game_mode
+            ''')
+            inserted = cursor.rowcount
+
+            if rebuild:
+                self.create_rank_structures(cursor, rebuild_counts=True)
+            cursor.execute("COMMIT")
+        finally:
+            if self.conn.in_transaction:
+                self.conn.rollback()
+            cursor.execute("DROP TABLE IF EXISTS temp.leaderboard_import")
+            for pragma in ("synchronous = FULL", "cache_size = -2000", "temp_store = DEFAULT", "threads = 0"):
+                cursor.execute(f"PRAGMA {pragma}")
+        return total_read, inserted
+
+    def import_player_stats_rows(self, chunks, merge='max'):
+        """Importar estatísticas de jogadores.
+
+        merge='max' mantém o maior valor de cada coluna (reimportar o mesmo ficheiro não
+        altera nada); merge='sum' soma os valores (consolidar quiosques diferentes).
+        Devolve (linhas lidas, jogadores novos)."""
+        value_columns = EXPORT_COLUMNS['player_stats'][1:]
+        if merge == 'sum':
+            updates = ', '.join(f"{col} = {col} + excluded.{col}" for col in value_columns)
+        else:
+            updates = ', '.join(f"{col} = MAX({col}, excluded.{col})" for col in value_columns)
+        placeholders = ', '.join('?' * len(EXPORT_COLUMNS['player_stats']))
+
+        cursor = self.conn.cursor()
+        total_read = 0
+        self.conn.commit()
+        before_count = self.conn.execute("SELECT COUNT(*) FROM player_stats").fetchone()[0]
+        try:
+            for rows in chunks:
+                cursor.execute("BEGIN")
+                cursor.executemany(f'''
+                    INSERT INTO player_stats ({', '.join(EXPORT_COLUMNS['player_stats'])})
+                    VALUES ({placeholders})
+                    ON CONFLICT (player_name) DO UPDATE SET {updates}
+                ''', rows)
+                cursor.execute("COMMIT")
+                total_read += len(rows)
+        finally:
+            if self.conn.in_transaction:
+                self.conn.rollback()
+        after_count = self.conn.execute("SELECT COUNT(*) FROM player_stats").fetchone()[0]
+        return total_read, after_count - before_count
+
+    def get_replay_paths(self):
+        """Caminhos dos replays referenciados por pontuações da leaderboard"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT replay FROM leaderboard WHERE replay IS NOT NULL")
+        return [row[0] for row in cursor.fetchall()]
+
+    def get_scores_to_verify(self, include_verified=False):
+        """Pontuações com replay: (id, jogador, nível, tempo, pontuação, modo, replay)"""
+        cursor = self.conn.cursor()
+        where = "replay IS NOT NULL" if include_verified else "replay IS NOT NULL AND verified IS NULL"
+        cursor.execute(f'''
+            SELECT id, player_name, level, time, score, IFNULL(game_mode, 'normal'), replay
+            FROM leaderboard
+            WHERE {where}
+            ORDER BY id
+        ''')
+        return cursor.fetchall()
+
+    def count_scores_without_replay(self):
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT COUNT(*) FROM leaderboard WHERE replay IS NULL")
+        return cursor.fetchone()[0]
+
+    def set_verified(self, results):
+        """Guardar o resultado da verificação: [(id, ok), ...]; ok None (replay em falta ou
+        não verificável) deixa a pontuação por verificar (NULL), nunca como falhada"""
+        cursor = self.conn.cursor()
+        cursor.executemany("UPDATE leaderboard SET verified = ? WHERE id = ?",
+                           [(None if ok is None else int(bool(ok)), score_id) for score_id, ok in results])
+        self.conn.commit()
+
     def close(self):
         self.conn.close()
 
+# =============================================================================
+# EXPORTAÇÃO / IMPORTAÇÃO DA BASE DE DADOS
+# =============================================================================
+
+# Colunas exportadas por tabela (o id da leaderboard é local a cada quiosque)
+EXPORT_COLUMNS = {
+    'leaderboard': ('player_name', 'level', 'time', 'score', 'date', 'game_mode'),
+    'player_stats': ('player_name', 'total_playtime',
+                     'levels_normal', 'levels_minefield', 'levels_timeattack', 'levels_elimination',
+                     'points_normal', 'points_minefield', 'points_timeattack', 'points_elimination'),
+}
+
+# Conversores de tipo para formatos de texto (CSV)
+EXPORT_COLUMN_TYPES = {
+    'leaderboard': (str, int, float, int, str, str),
+    'player_stats': (str, float, int, int, int, int, int, int, int, int),
+}
+
+EXPORT_FORMATS = ('csv', 'jsonl', 'columnar')
+
+
+def detect_export_format(path):
+    """Deduzir o formato pela extensão do ficheiro"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if extension in ('.npz', '.gmcol'):
+        return 'columnar'
+    raise ValueError(f"Formato desconhecido para '{path}' (use --format)")
+
+
+def export_table(db, table, path, fmt=None, chunk_size=50000):
+    """Exportar uma tabela para CSV, JSONL ou formato colunar. Devolve o número de linhas.
+
+    O formato colunar é um zip com um ficheiro .npy por coluna e por bloco de linhas
+    (row group), escrito em streaming como os row groups do Parquet."""
+    fmt = fmt or detect_export_format(path)
+    columns = EXPORT_COLUMNS[table]
+    count = 0
+
+    if fmt == 'csv':
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(columns)
+            for rows in db.iter_table_rows(table, chunk_size):
+                writer.writerows(rows)
+                count += len(rows)
+    elif fmt == 'jsonl':
+        with open(path, 'w', encoding='utf-8') as f:
+            for rows in db.iter_table_rows(table, chunk_size):
+                f.writelines(json.dumps(dict(zip(columns, row)), ensure_ascii=False) + '\n' for row in rows)
+                count += len(rows)
+    elif fmt == 'columnar':
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr('schema.json', json.dumps({'table': table, 'columns': columns}))
+            for group, rows in enumerate(db.iter_table_rows(table, chunk_size)):
+                for col_index, column in enumerate(columns):
+                    values = [row[col_index] for row in rows]
+                    if EXPORT_COLUMN_TYPES[table][col_index] is str:
+                        values = ['' if value is None else value for value in values]
+                    array = np.array(values, dtype=EXPORT_COLUMN_TYPES[table][col_index])
+                    with zf.open(f'rg{group:05d}/{column}.npy', 'w', force_zip64=True) as member:
+                        np.lib.format.write_array(member, array, allow_pickle=False)
+                count += len(rows)
+    else:
+        raise ValueError(f"Formato desconhecido: {fmt}")
+    return count
+
+
+def read_export_chunks(table, path, fmt=None, chunk_size=50000):
+    """Ler um ficheiro exportado em blocos de tuplos prontos para executemany"""
+    fmt = fmt or detect_export_format(path)
+    columns = EXPORT_COLUMNS[table]
+    converters = EXPORT_COLUMN_TYPES[table]
+
+    if fmt == 'csv':
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.reader(f)
+            header = next(reader)
+            positions = [header.index(column) for column in columns]
+            chunk = []
+            for record in reader:
+                chunk.append(tuple(convert(record[pos]) for convert, pos in zip(converters, positions)))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+    elif fmt == 'jsonl':
+        with open(path, encoding='utf-8') as f:
+            chunk = []
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                chunk.append(tuple(record[column] for column in columns))
+                if len(chunk) >= chunk_size:
+                    yield chunk
+                    chunk = []
+            if chunk:
+                yield chunk
+    elif fmt == 'columnar':
+        with zipfile.ZipFile(path) as zf:
+            groups = sorted({name.split('/')[0] for name in zf.namelist() if name.startswith('rg')})
+            for group in groups:
+                arrays = []
+                for column in columns:
+                    with zf.open(f'{group}/{column}.npy') as member:
+                        arrays.append(np.lib.format.read_array(member, allow_pickle=False).tolist())
+                yield list(zip(*arrays))
+    else:
+        raise ValueError(f"Formato desconhecido: {fmt}")
+
+
+def import_table(db, table, path, fmt=None, chunk_size=50000, stats_merge='max'):
+    """Importar um ficheiro exportado para a tabela. Devolve (linhas lidas, linhas novas)."""
+    chunks = read_export_chunks(table, path, fmt, chunk_size)
+    if table == 'leaderboard':
+        return db.import_leaderboard_rows(chunks)
+    return db.import_player_stats_rows(chunks, stats_merge)
+
+# =============================================================================
+# SINCRONIZAÇÃO ENTRE QUIOSQUES
+# =============================================================================
+
+class LeaderboardSyncServer(HTTPServer):
+    """Serviço HTTP/JSON que agrega as pontuações de vários quiosques numa base de dados.
+
+    POST /scores   {"kiosk": id, "rows": [[id, player_name, level, time, score, date, game_mode], ...]}
+    GET  /top      ?limit=N&mode=M - top global (linhas no formato de get_scores_page)"""
+
+    def __init__(self, db_path, host='0.0.0.0', port=SYNC_PORT):
+        super().__init__((host, port), LeaderboardSyncHandler)
+        # Servidor de uma só thread: a ligação é usada apenas pela thread de serve_forever
+        self.db = Database(db_path, check_same_thread=False)
+
+    def receive_scores(self, kiosk_id, rows):
+        """Guardar um lote de um quiosque; devolve o último id confirmado desse lote.
+
+        O progresso de cada quiosque fica do lado do cliente (sync_state): um lote repetido
+        depois de uma falha é ignorado pela chave de deduplicação."""
+        if not rows:
+            return 0
+        self.db.import_leaderboard_rows([[tuple(row[1:7]) for row in rows]])
+        return max(row[0] for row in rows)
+
+    def server_close(self):
+        super().server_close()
+        self.db.close()
+
+
+class LeaderboardSyncHandler(BaseHTTPRequestHandler):
+    """Pedidos HTTP do LeaderboardSyncServer"""
+
+    def send_json(self, data, status=200):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urllib.parse.urlparse(self.path)
+        query = urllib.parse.parse_qs(url.query)
+        if url.path == '/top':
+            limit = min(int(query.get('limit', [SYNC_TOP_LIMIT])[0]), 1000)
+            mode = query.get('mode', [None])[0] or None
+            self.send_json({'rows': self.server.db.get_scores_page(limit, mode)})
+        else:
+            self.send_json({'error': 'not found'}, 404)
+
+    def do_POST(self):
+        if self.path != '/scores':
+            self.send_json({'error': 'not found'}, 404)
+            return
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+            payload = json.loads(self.rfile.read(length))
+            acked = self.server.receive_scores(str(payload['kiosk']), payload['rows'])
+        except (ValueError, KeyError, TypeError, IndexError) as e:
+            self.send_json({'error': str(e)}, 400)
+            return
+        self.send_json({'acked': acked})
+
+    def log_message(self, format, *args):
+        pass
+
+
+class LeaderboardSyncClient:
+    """Envia as pontuações locais para o servidor e mantém em cache o top global.
+
+    Corre numa thread própria: os envios são feitos por id crescente (retomados a partir
+    do último id confirmado) e repetidos com backoff enquanto o servidor não responde.
+    O jogo só lê a cache em memória, por isso o ecrã da leaderboard nunca espera pela rede."""
+
+    def __init__(self, url, kiosk_id=None, db_path=DB_FILE, cache_file=SYNC_CACHE_FILE,
+                 interval=SYNC_INTERVAL, batch_size=SYNC_BATCH_SIZE, timeout=3):
+        self.url = url.rstrip('/')
+        self.kiosk_id = kiosk_id or socket.gethostname()
+        self.db_path = db_path
+        self.cache_file = cache_file
+        self.interval = interval
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.lock = threading.Lock()
+        self.wake_event = threading.Event()
+        self.running = False
+        self.thread = None
+        self.online = False
+        self.global_top = self.load_cache()
+
+    def load_cache(self):
+        """Top global da última sessão (disponível antes de haver rede)"""
+        try:
+            with open(self.cache_file, 'r') as f:
+                return {key: [tuple(row) for row in rows] for key, rows in json.load(f).items()}
+        except (OSError, ValueError):
+            return {}
+
+    def save_cache(self, top):
+        try:
+            with open(self.cache_file, 'w') as f:
+                json.dump(top, f)
+        except OSError as e:
+            print(f"Erro ao guardar cache da leaderboard global: {e}")
+
+    def get_global_top(self, game_mode=None):
+        """Top global em cache para um modo (None = todos); nunca bloqueia"""
+        with self.lock:
+            return list(self.global_top.get(game_mode or 'all', []))
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.sync_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wake_event.set()
+
+    def request_sync(self):
+        """Acordar a thread (por exemplo, depois de guardar uma pontuação)"""
+        self.wake_event.set()
+
+    def request_json(self, path, payload=None):
+        import urllib.request  # Import lento: só quando há sincronização
+        data = json.dumps(payload).encode('utf-8') if payload is not None else None
+        request = urllib.request.Request(self.url + path, data=data,
+                                         headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    def open_db(self):
+        """Ligação própria da thread de sincronização (com a tabela do progresso dos envios)"""
+        db = Database(self.db_path)
+        db.conn.execute('''
+            CREATE TABLE IF NOT EXISTS sync_state (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        ''')
+        db.conn.commit()
+        return db
+
+    def sync_loop(self):
+        db = self.open_db()
+        backoff = 1
+        try:
+            while self.running:
+                try:
+                    self.sync_once(db)
+                    self.online = True
+                    backoff = 1
+                    wait = self.interval
+                except (OSError, ValueError, sqlite3.Error, KeyError, TypeError, IndexError) as e:
+                    # Rede em baixo, base de dados bloqueada (o jogo a guardar uma pontuação) ou
+                    # resposta inválida do servidor: tentar outra vez com backoff
+                    if self.online:
+                        print(f"Sincronização da leaderboard falhou: {e}")
+                    self.online = False
+                    wait = backoff
+                    backoff = min(backoff * 2, 60)
+                self.wake_event.wait(wait)
+                self.wake_event.clear()
+        finally:
+            db.close()
+
+    def sync_once(self, db):
+        """Um ciclo: enviar pontuações pendentes em lotes e atualizar o top global"""
+        row = db.conn.execute("SELECT value FROM sync_state WHERE key = 'last_uploaded_id'").fetchone()
+        last_id = row[0] if row else 0
+
+        while self.running:
+            pending = db.conn.execute('''
+                SELECT id, player_name, level, time, score, date, IFNULL(game_mode, 'normal')
+                FROM leaderboard WHERE id > ? ORDER BY id LIMIT ?
+            ''', (last_id, self.batch_size)).fetchall()
+            if not pending:
+                break
+            last_id = self.request_json('/scores', {'kiosk': self.kiosk_id, 'rows': pending})['acked']
+            db.conn.execute('''
+                INSERT INTO sync_state (key, value) VALUES ('last_uploaded_id', ?)
+                ON CONFLICT (key) DO UPDATE SET value = excluded.value
+            ''', (last_id,))
+            db.conn.commit()
+
+        top = {}
+        for mode in (None, *GAME_MODES):
+            query = urllib.parse.urlencode({'limit': SYNC_TOP_LIMIT, 'mode': mode or ''})
+            top[mode or 'all'] = [tuple(row) for row in self.request_json(f"/top?{query}")['rows']]
+        with self.lock:
+            self.global_top = top
+        self.save_cache(top)
+
 class Button:
     """Botão estilo Minecraft minimalista"""
     def __init__(self, x, y, width, height, text, color=GRAY):
@@ -815,7 +1882,6 @@ class TextInput:
         self.max_length = max_length
         self.active = True
         self.cursor_visible = True
-        self.cursor_timer = 0
 
     def draw(self, screen, font):
         # Draw input box
@@ -827,13 +1893,9 @@ class TextInput:
         text_rect = text_surface.get_rect(midleft=(self.rect.x + 10, self.rect.centery))
         screen.blit(text_surface, text_rect)
 
-        # Draw cursor (blinking)
+        # Draw cursor (blinking, 2x por segundo: o ecrã não é redesenhado em todos os frames)
         if self.active:
-            self.cursor_timer += 1
-            if self.cursor_timer > 30:
-                self.cursor_visible = not self.cursor_visible
-                self.cursor_timer = 0
-
+            self.cursor_visible = int(time.perf_counter() * 2) % 2 == 0
             if self.cursor_visible:
                 cursor_x = text_rect.right + 2
                 cursor_y1 = self.rect.centery - 10
@@ -851,6 +1913,37 @@ class TextInput:
                     self.text += event.unicode
         return None
 
+class HitGrid:
+    """Elementos clicáveis de um ecrã por zonas de HIT_GRID_BUCKET px: find(x, y) só testa os
+    rects da zona do ponto e devolve o primeiro (pela ordem original) que o contém"""
+
+    def __init__(self, rects, bucket=HIT_GRID_BUCKET):
+        self.bucket = bucket
+        self.buckets = {}
+        for index, rect in enumerate(rects):
+            for row in range(rect.top // bucket, (rect.bottom - 1) // bucket + 1):
+                for col in range(rect.left // bucket, (rect.right - 1) // bucket + 1):
+                    self.buckets.setdefault((row, col), []).append((index, rect))
+
+    def find(self, x, y):
+        for index, rect in self.buckets.get((int(y // self.bucket), int(x // self.bucket)), ()):
+            if rect.collidepoint(x, y):
+                return index
+        return None
+
+class PointerEvent:
+    """Evento do rato já convertido: pos em coordenadas do mundo (o que os handlers usam) e
+    screen_pos na janela. Substitui o evento do pygame sem copiar o __dict__ de cada um"""
+    __slots__ = ('type', 'pos', 'screen_pos', 'button', 'buttons', 'rel')
+
+    def __init__(self, event, world_pos):
+        self.type = event.type
+        self.screen_pos = event.pos
+        self.pos = world_pos
+        self.button = getattr(event, 'button', 0)
+        self.buttons = getattr(event, 'buttons', (0, 0, 0))
+        self.rel = getattr(event, 'rel', (0, 0))
+
 class Ball:
     def __init__(self, x, y, sensitivity=1.0, world_width=DEFAULT_WIDTH, world_height=DEFAULT_HEIGHT, color=BALL_COLOR):
         self.x = x
@@ -863,8 +1956,9 @@ class Ball:
         self.world_height = world_height
         self.color = color
         self.base_friction = FRICTION # Store original friction
+        self.impact_speed = 0  # Velocidade (px/s) contra a parede na última colisão (volume do som)
 
-    def update(self, ax, ay, dt, walls, friction_factor=None):
+    def update(self, ax, ay, dt, walls, friction_factor=None, wall_index=None):
         if friction_factor is None:
             friction_factor = self.base_friction
 
@@ -901,37 +1995,41 @@ class Ball:
         new_y = self.y + self.vy * dt
 
         # Verificar colisões com paredes usando detecção circular
+        # (com wall_index, só as paredes perto da nova posição, pela mesma ordem)
+        if wall_index is not None:
+            walls = wall_index.near(new_x, new_y)
         collision_occurred = False
+        impact_speed = 0
         for wall in walls:
-            if self.check_collision_circle(new_x, new_y, wall):
-                # Encontrar o ponto mais próximo da parede
-                closest_x = max(wall[0], min(new_x, wall[0] + wall[2]))
-                closest_y = max(wall[1], min(new_y, wall[1] + wall[3]))
-
-                # Calcular distância
-                dx = new_x - closest_x
-                dy = new_y - closest_y
-                distance = math.sqrt(dx*dx + dy*dy)
-
-                if distance < self.radius:
-                    # Normalizar e empurrar para fora
-                    if distance > 0:
-                        nx = dx / distance
-                        ny = dy / distance
-                    else:
-                        nx = 1
-                        ny = 0
+            # Ponto mais próximo da parede (o teste de check_collision_circle, feito aqui uma só vez)
+            closest_x = max(wall[0], min(new_x, wall[0] + wall[2]))
+            closest_y = max(wall[1], min(new_y, wall[1] + wall[3]))
 
-                    # Reposicionar bola
-                    new_x = closest_x + nx * self.radius
-                    new_y = closest_y + ny * self.radius
+            # Calcular distância
+            dx = new_x - closest_x
+            dy = new_y - closest_y
+            distance = math.sqrt(dx*dx + dy*dy)
+
+            if distance < self.radius:
+                # Normalizar e empurrar para fora
+                if distance > 0:
+                    nx = dx / distance
+                    ny = dy / distance
+                else:
+                    nx = 1
+                    ny = 0
+
+                # Reposicionar bola
+                new_x = closest_x + nx * self.radius
+                new_y = closest_y + ny * self.radius
 
-                    # Calcular velocidade refletida (atrito reduzido)
-                    dot = self.vx * nx + self.vy * ny
-                    self.vx = (self.vx - 2 * dot * nx) * 0.9
-                    self.vy = (self.vy - 2 * dot * ny) * 0.9
+                # Calcular velocidade refletida (atrito reduzido)
+                dot = self.vx * nx + self.vy * ny
+                self.vx = (self.vx - 2 * dot * nx) * 0.9
+                self.vy = (self.vy - 2 * dot * ny) * 0.9
 
-                    collision_occurred = True
+                collision_occurred = True
+                impact_speed = max(impact_speed, abs(dot))
 
         # Limites da janela
         if new_x - self.radius < 0:
@@ -949,6 +2047,8 @@ class Ball:
 
         self.x = new_x
         self.y = new_y
+        if collision_occurred:
+            self.impact_speed = impact_speed
 
         return collision_occurred
 
@@ -965,16 +2065,37 @@ class Ball:
 
         return distance < self.radius
 
-    def draw(self, screen):
-        # Sombra
-        shadow_color = (int(self.color[0] * 0.4), int(self.color[1] * 0.4), int(self.color[2] * 0.4))
-        pygame.draw.circle(screen, shadow_color, (int(self.x) + 3, int(self.y) + 3), self.radius)
-        # Bola principal
-        pygame.draw.circle(screen, self.color, (int(self.x), int(self.y)), self.radius)
-        # Highlight
-        # Make highlight also use the ball's color
-        highlight_color = (min(255, int(self.color[0] * 1.5)), min(255, int(self.color[1] * 1.5)), min(255, int(self.color[2] * 1.5)))
-        pygame.draw.circle(screen, highlight_color, (int(self.x) - 3, int(self.y) - 3), self.radius // 3)
+    def draw(self, screen, sprites):
+        """Bola (sombra, corpo e highlight) com um blit do SpriteAtlas"""
+        sprites.blit(screen, ('ball', self.color), int(self.x), int(self.y))
+
+class WallIndex:
+    """Broadphase das colisões: para cada zona de WALL_INDEX_BUCKET px, as paredes a menos de
+    WALL_INDEX_MARGIN px dela, pela ordem da lista original.
+
+    Ball.update só percorre as paredes da zona da nova posição; como a margem cobre o raio da
+    bola e os empurrões das colisões, o resultado é igual ao de percorrer a lista toda."""
+
+    def __init__(self, walls, bucket=WALL_INDEX_BUCKET, margin=WALL_INDEX_MARGIN):
+        self.bucket = bucket
+        max_x = max((wall[0] + wall[2] for wall in walls), default=0) + margin
+        max_y = max((wall[1] + wall[3] for wall in walls), default=0) + margin
+        self.cols = int(max_x // bucket) + 1
+        self.rows = int(max_y // bucket) + 1
+        self.buckets = [[] for _ in range(self.rows * self.cols)]
+        for wall in walls:
+            col0 = max(0, int((wall[0] - margin) // bucket))
+            col1 = min(self.cols - 1, int((wall[0] + wall[2] + margin) // bucket))
+            row0 = max(0, int((wall[1] - margin) // bucket))
+            row1 = min(self.rows - 1, int((wall[1] + wall[3] + margin) // bucket))
+            for row in range(row0, row1 + 1):
+                for col in range(col0, col1 + 1):
+                    self.buckets[row * self.cols + col].append(wall)
+
+    def near(self, x, y):
+        col = min(max(int(x // self.bucket), 0), self.cols - 1)
+        row = min(max(int(y // self.bucket), 0), self.rows - 1)
+        return self.buckets[row * self.cols + col]
 
 class Mine:
     def __init__(self, x, y, size=3):
@@ -983,38 +2104,59 @@ class Mine:
         self.size = size
         self.animation_time = random.randint(0, 60) # Start animation at a random time
 
-    def draw(self, screen):
+    def draw(self, screen, cache):
+        """Blit do sprite da mina (um por tamanho e fase do piscar, guardado na SurfaceCache)"""
         self.animation_time = (self.animation_time + 1) % 60
-        
+        blinking = self.animation_time < 20
+        sprite = cache.get(('mine', self.size, blinking), Mine.render_sprite, self.size, blinking)
+        half = sprite.get_width() // 2
+        screen.blit(sprite, (int(self.x) - half, int(self.y) - half))
+
+    @staticmethod
+    def render_sprite(size, blinking):
+        half = int(size * 1.5) + 2
+        surface = pygame.Surface((half * 2, half * 2), pygame.SRCALPHA)
+
         # Cor base da mina
         mine_color = (40, 40, 40)
         
         # Desenhar corpo da mina
-        pygame.draw.circle(screen, mine_color, (int(self.x), int(self.y)), self.size)
+        pygame.draw.circle(surface, mine_color, (half, half), size)
         
         # Desenhar espinhos
         for i in range(8):
             angle = math.pi * 2 * i / 8
-            start_pos = (self.x + self.size * 0.8 * math.cos(angle), self.y + self.size * 0.8 * math.sin(angle))
-            end_pos = (self.x + self.size * 1.5 * math.cos(angle), self.y + self.size * 1.5 * math.sin(angle))
-            pygame.draw.line(screen, mine_color, start_pos, end_pos, 2)
+            start_pos = (half + size * 0.8 * math.cos(angle), half + size * 0.8 * math.sin(angle))
+            end_pos = (half + size * 1.5 * math.cos(angle), half + size * 1.5 * math.sin(angle))
+            pygame.draw.line(surface, mine_color, start_pos, end_pos, 2)
             
         # Animação de piscar para perigo
-        if self.animation_time < 20:
+        if blinking:
             # Piscar um ponto vermelho no centro
-            blink_color = RED
-            pygame.draw.circle(screen, blink_color, (int(self.x), int(self.y)), self.size // 3)
+            pygame.draw.circle(surface, RED, (half, half), size // 3)
+        return surface
 
     def get_rect(self):
         return pygame.Rect(self.x - self.size, self.y - self.size, self.size * 2, self.size * 2)
 
+def neighbourhood_max(grid, fill):
+    """Máximo da vizinhança 3x3 de cada célula (com bool: dilatação); fora da grelha vale fill"""
+    padded = np.pad(grid, 1, constant_values=fill)
+    rows, cols = grid.shape
+    result = grid.copy()
+    for dr in range(3):
+        for dc in range(3):
+            np.maximum(result, padded[dr:dr + rows, dc:dc + cols], out=result)
+    return result
+
 class MazeGenerator:
     """Gerador de labirintos usando Recursive Backtracking (DFS)"""
 
-    def __init__(self, width, height, cell_size):
+    def __init__(self, width, height, cell_size, rng=None):
         self.width = width
         self.height = height
         self.cell_size = cell_size
+        self.rng = rng or random.Random()  # Gerador próprio: o mesmo seed dá o mesmo labirinto
         self.cols = width // cell_size
         self.rows = height // cell_size
 
@@ -1071,7 +2213,7 @@ class MazeGenerator:
         self.grid[row][col]['visited'] = True
 
         neighbors = self.get_neighbors(row, col)
-        random.shuffle(neighbors)
+        self.rng.shuffle(neighbors)
 
         for next_row, next_col, direction in neighbors:
             if not self.grid[next_row][next_col]['visited']:
@@ -1132,11 +2274,97 @@ class MazeGenerator:
                         deadends.append((r, c))
         return deadends
 
+    def open_sides(self):
+        """Lados sem parede de cada célula, como array (rows, cols, 4) [top, right, bottom, left]"""
+        walls = np.array([[cell['walls'] for cell in row] for row in self.grid], dtype=bool)
+        return ~walls
+
+    def distance_field(self, goal_cell=None):
+        """Distância em células, pelo labirinto, de cada célula até à célula do objetivo.
+
+        BFS por frentes: cada iteração expande a frente inteira com NumPy e cada célula só
+        entra numa frente, por isso o custo é linear no número de células. -1 = inalcançável."""
+        rows, cols = self.rows, self.cols
+        goal_row, goal_col = goal_cell or (rows - 1, cols - 1)
+        open_sides = self.open_sides().reshape(-1, 4)
+        distance = np.full(rows * cols, -1, dtype=np.int32)
+        frontier = np.array([goal_row * cols + goal_col])
+        distance[frontier] = 0
+
+        # Deslocamento do índice da célula vizinha em cada direção [top, right, bottom, left]
+        offsets = (-cols, 1, cols, -1)
+        depth = 0
+        while frontier.size:
+            depth += 1
+            neighbours = np.concatenate([frontier[open_sides[frontier, side]] + offsets[side]
+                                         for side in range(4)])
+            frontier = np.unique(neighbours[distance[neighbours] < 0])
+            distance[frontier] = depth
+        return distance.reshape(rows, cols)
+
+    def solution_path(self, distance, open_sides=None):
+        """Células (row, col) do caminho mais curto da célula inicial até ao objetivo,
+        a descer o campo de distâncias"""
+        if open_sides is None:
+            open_sides = self.open_sides()
+        steps = ((-1, 0), (0, 1), (1, 0), (0, -1))  # [top, right, bottom, left]
+        row, col = 0, 0
+        path = [(row, col)]
+        while distance[row, col] > 0:
+            for side, (dr, dc) in enumerate(steps):
+                if open_sides[row, col, side] and distance[row + dr, col + dc] == distance[row, col] - 1:
+                    break
+            row += dr
+            col += dc
+            path.append((row, col))
+        return path
+
+    def compute_metrics(self, distance, mine_cells=()):
+        """Métricas de dificuldade: comprimento da solução, dead-ends, bifurcações, curvas e minas
+        junto ao caminho, mais um índice 'difficulty' (≈1 para um caminho direto ao objetivo).
+
+        O caminho da solução é percorrido uma vez a descer o campo de distâncias; o resto é
+        calculado com NumPy sobre a grelha de lados abertos."""
+        open_sides = self.open_sides()
+        exits = open_sides.sum(axis=2)
+        path = np.array(self.solution_path(distance, open_sides))
+        path_rows, path_cols = path.T
+
+        # Curvas: mudanças de direção entre passos consecutivos
+        moves = np.diff(path, axis=0)
+        turns = int(np.any(moves[1:] != moves[:-1], axis=1).sum())
+
+        # Escolhas em cada célula intermédia do caminho (saídas menos aquela por onde se entrou)
+        choices = exits[path_rows[1:-1], path_cols[1:-1]] - 1
+        junctions = int((choices > 1).sum())
+        branching = float(choices.mean()) if choices.size else 1.0
+
+        # Minas no caminho ou numa célula vizinha
+        near_path = np.zeros((self.rows, self.cols), dtype=bool)
+        near_path[path_rows, path_cols] = True
+        near_path[1:] |= near_path[:-1].copy()
+        near_path[:-1] |= near_path[1:].copy()
+        near_path[:, 1:] |= near_path[:, :-1].copy()
+        near_path[:, :-1] |= near_path[:, 1:].copy()
+        exposure = sum(1 for r, c in mine_cells if near_path[r, c])
+
+        length = len(path) - 1
+        shortest = max(1, self.rows + self.cols - 2)
+        return {
+            'solution_length': length,
+            'deadends': len(self.detect_deadends()),
+            'junctions': junctions,
+            'branching_factor': round(branching, 3),
+            'turns': turns,
+            'mine_exposure': exposure,
+            'difficulty': round((length + turns + 2 * junctions + 4 * exposure) / shortest, 3),
+        }
+
     def place_mines_in_deadends(self):
         """Colocar minas em 50% dos dead-ends"""
         deadends = self.detect_deadends()
         mine_count = max(1, len(deadends) // 2)  # 50% dos dead-ends
-        mine_positions = random.sample(deadends, min(mine_count, len(deadends)))
+        mine_positions = self.rng.sample(deadends, min(mine_count, len(deadends)))
 
         # Converter posições de grid para coordenadas de pixel (centro da célula)
         mines = []
@@ -1146,49 +2374,61 @@ class MazeGenerator:
             mines.append(Mine(center_x, center_y))
         return mines
 
-    def place_mines_everywhere(self, percentage=0.15):
-        """Colocar minas em células aleatórias (para modo minefield), garantindo espaçamento."""
+    def place_mines_everywhere(self, percentage=0.15, excluded_cells=()):
+        """Colocar minas em células aleatórias (para modo minefield), garantindo espaçamento.
+
+        Seleção em rondas com NumPy: cada célula candidata tem uma prioridade aleatória e, em
+        cada ronda, ficam com mina as que têm a maior prioridade da sua vizinhança 3x3; essas
+        células e as vizinhas (ocupação dilatada) deixam de ser candidatas. São poucas rondas
+        sobre a grelha inteira, por isso o custo cresce linearmente com o número de células.
+        excluded_cells (ex: o caminho da solução) nunca recebem minas."""
         total_cells = self.rows * self.cols
         mine_count = max(1, int(total_cells * percentage))
 
-        # Criar lista de todas as posições possíveis para minas
-        available_positions = []
-        for r in range(self.rows):
-            for c in range(self.cols):
-                # Excluir a célula inicial e final
-                if not (r == 0 and c == 0) and not (r == self.rows - 1 and c == self.cols - 1):
-                    available_positions.append((r, c))
-
-        random.shuffle(available_positions)
+        # Excluir a célula inicial e final
+        candidates = np.ones((self.rows, self.cols), dtype=bool)
+        candidates[0, 0] = False
+        candidates[-1, -1] = False
+        for r, c in excluded_cells:
+            candidates[r, c] = False
+
+        # Prioridades distintas (permutação), a partir do gerador do labirinto
+        np_rng = np.random.default_rng(self.rng.getrandbits(64))
+        priority = np_rng.permutation(total_cells).reshape(self.rows, self.cols)
+
+        chosen = np.zeros_like(candidates)
+        remaining = mine_count
+        while remaining > 0 and candidates.any():
+            candidate_priority = np.where(candidates, priority, -1)
+            picked = candidates & (candidate_priority == neighbourhood_max(candidate_priority, -1))
+            picked_count = int(picked.sum())
+            if picked_count > remaining:
+                # Última ronda: só as de maior prioridade
+                threshold = np.sort(priority[picked])[picked_count - remaining]
+                picked &= priority >= threshold
+            chosen |= picked
+            remaining -= int(picked.sum())
+            candidates &= ~neighbourhood_max(picked, False)
 
         mines = []
-        occupied_cells = set()
-
-        for r, c in available_positions:
-            if len(mines) >= mine_count:
-                break
-
-            # Verificar se a célula ou suas vizinhas já estão ocupadas
-            is_valid_position = True
-            for dr in range(-1, 2):
-                for dc in range(-1, 2):
-                    if (r + dr, c + dc) in occupied_cells:
-                        is_valid_position = False
-                        break
-                if not is_valid_position:
-                    break
-            
-            if is_valid_position:
-                center_x = c * self.cell_size + self.cell_size // 2
-                center_y = r * self.cell_size + self.cell_size // 2
-                mines.append(Mine(center_x, center_y))
-                occupied_cells.add((r,c))
-
+        for r, c in zip(*np.nonzero(chosen)):
+            center_x = int(c) * self.cell_size + self.cell_size // 2
+            center_y = int(r) * self.cell_size + self.cell_size // 2
+            mines.append(Mine(center_x, center_y))
         return mines
 
     @staticmethod
-    def generate(level, world_width, world_height, game_mode='normal', mine_percentage=0.15, difficulty='normal'):
-        """Gerar labirinto baseado no nível e dificuldade"""
+    def generate(level, world_width, world_height, game_mode='normal', mine_percentage=0.15, difficulty='normal', seed=None):
+        """Gerar labirinto baseado no nível e dificuldade (seed=None = aleatório)"""
+        layout = MazeGenerator.generate_layout(level, world_width, world_height, game_mode,
+                                               mine_percentage, difficulty, seed)
+        mines = [Mine(x, y, size) for x, y, size in layout['mines']]
+        return layout['walls'], mines, layout['goal'], layout['cell_size']
+
+    @staticmethod
+    def generate_layout(level, world_width, world_height, game_mode='normal', mine_percentage=0.15, difficulty='normal', seed=None):
+        """Gerar um nível completo no formato guardado pela MazeCache: paredes, minas (x, y, tamanho),
+        objetivo, tamanho da célula e campo de distâncias até ao objetivo (em células)"""
         # Ajustar tamanho das células baseado no nível e dificuldade
         # Easy = maior, Hard = menor
         base_cell_size = 80
@@ -1209,7 +2449,7 @@ class MazeGenerator:
         maze_width = (maze_width_available // cell_size) * cell_size
         maze_height = (maze_height_available // cell_size) * cell_size
         
-        generator = MazeGenerator(maze_width, maze_height, cell_size)
+        generator = MazeGenerator(maze_width, maze_height, cell_size, random.Random(seed))
 
         # CORREÇÃO: Começar sempre do canto superior esquerdo (0, 0)
         # Isto garante que o algoritmo visite todas as células conectadas
@@ -1235,15 +2475,22 @@ class MazeGenerator:
         elif difficulty == 'hard':
             adjusted_percentage *= 1.4
             
+        # Campo de distâncias e caminho da solução (o labirinto é perfeito: o caminho é único,
+        # por isso uma mina no caminho não teria alternativa)
+        distance = generator.distance_field()
+        solution = generator.solution_path(distance)
+
         mines = []
         if game_mode == 'minefield':
-            # Minas espalhadas aleatoriamente
-            mines = generator.place_mines_everywhere(adjusted_percentage)
+            # Minas espalhadas aleatoriamente, fora do caminho da solução
+            mines = generator.place_mines_everywhere(adjusted_percentage, solution)
         elif game_mode == 'normal':
             # Sem minas no modo normal
             mines = []
         # Outros modos também podem ter minas se necessário
 
+        mine_cells = [(int(mine.y // cell_size), int(mine.x // cell_size)) for mine in mines]
+
         # Aplicar offset da margem às minas
         for mine in mines:
             mine.x += MAZE_MARGIN
@@ -1255,50 +2502,1903 @@ class MazeGenerator:
         goal_x = MAZE_MARGIN + maze_width - (cell_size // 2)
         goal_y = MAZE_MARGIN_TOP + maze_height - (cell_size // 2)
 
-        return walls_with_margin, mines, (goal_x, goal_y), cell_size
+        return {
+            'walls': walls_with_margin,
+            'mines': [(mine.x, mine.y, mine.size) for mine in mines],
+            'goal': (goal_x, goal_y),
+            'cell_size': cell_size,
+            'distance': distance,
+            'open_sides': (generator.open_sides() << np.arange(4, dtype=np.uint8)).sum(axis=2, dtype=np.uint8),
+            'metrics': generator.compute_metrics(distance, mine_cells),
+        }
 
-class Game:
-    def __init__(self):
-        pygame.init()
-        pygame.mixer.init(frequency=22050, size=-16, channels=2, buffer=512)
+    @staticmethod
+    def generate_in_band(level, world_width, world_height, game_mode='normal', mine_percentage=0.15,
+                         difficulty='normal', seed=None, band=(0, float('inf')),
+                         candidates=MAZE_SELECT_CANDIDATES, executor=None):
+        """Gerar vários labirintos candidatos e escolher o primeiro com metrics['difficulty'] em band.
+
+        Os candidatos são gerados por lotes no executor (pool de processos), se houver, e
+        avaliados por ordem, por isso a escolha é a mesma com qualquer número de processos.
+        Se nenhum cair na banda, devolve o mais próximo."""
+        if seed is None:
+            seed = random.getrandbits(64)
+        # O primeiro candidato é o labirinto normal desta seed
+        seeds = [seed] + [level_seed(seed, i, difficulty, 'band') for i in range(1, candidates)]
+        args = (level, world_width, world_height, game_mode, mine_percentage, difficulty)
+        batch_size = (os.cpu_count() or 1) if executor else 1
+        low, high = band
+
+        best, best_gap = None, None
+        for start in range(0, len(seeds), batch_size):
+            batch = seeds[start:start + batch_size]
+            if executor:
+                # Um iterável por argumento (os mesmos args para todos os candidatos do lote)
+                layouts = executor.map(MazeGenerator.generate_layout, *([arg] * len(batch) for arg in args), batch)
+            else:
+                layouts = (MazeGenerator.generate_layout(*args, candidate_seed) for candidate_seed in batch)
+            for layout in layouts:
+                value = layout['metrics']['difficulty']
+                if low <= value <= high:
+                    return layout
+                gap = low - value if value < low else value - high
+                if best is None or gap < best_gap:
+                    best, best_gap = layout, gap
+        return best
+
+def level_seed(session_seed, level, difficulty, game_mode):
+    """Seed de um nível: a mesma sessão, nível, dificuldade e modo dão sempre o mesmo labirinto"""
+    digest = hashlib.sha256(f"{session_seed}:{level}:{difficulty}:{game_mode}".encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'little')
+
+def daily_seed(day=None):
+    """Seed da sessão do desafio diário (igual em todos os quiosques no mesmo dia)"""
+    day = day or datetime.now().date()
+    return int(day.strftime('%Y%m%d'))
+
+class MazeCache:
+    """Cache LRU de labirintos já gerados (layouts de MazeGenerator.generate_layout).
+
+    Reiniciar um nível, tentar de novo após game over ou jogar o desafio diário reutiliza o
+    labirinto sem o gerar outra vez. Com disk_dir, cada labirinto é também guardado em .npz."""
+
+    def __init__(self, max_entries=MAZE_CACHE_SIZE, disk_dir=None, executor=None):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir
+        self.executor = executor  # Pool de processos para gerar candidatos (banda de dificuldade)
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()  # Usada também pela thread de pré-geração de níveis
+        self.hits = 0
+        self.misses = 0
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def get(self, level, world_width, world_height, game_mode, mine_percentage, difficulty, seed, band=None):
+        """Layout de um nível; com band = (mín, máx), escolhe entre vários candidatos (generate_in_band)"""
+        key = (MAZE_CACHE_VERSION, seed, level, world_width, world_height, game_mode, mine_percentage, difficulty,
+               band)
+        with self.lock:
+            layout = self.entries.get(key)
+            if layout is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return layout
+
+        # Gerar / ler do disco fora do lock
+        layout = self.load(key) if self.disk_dir else None
+        if layout is None:
+            if band:
+                layout = MazeGenerator.generate_in_band(
+                    level, world_width, world_height, game_mode, mine_percentage, difficulty, seed,
+                    band, executor=self.executor)
+            else:
+                layout = MazeGenerator.generate_layout(
+                    level, world_width, world_height, game_mode, mine_percentage, difficulty, seed)
+            if self.disk_dir:
+                self.save(key, layout)
+            self.misses += 1
+        else:
+            self.hits += 1
 
-        # Set window icon BEFORE set_mode to avoid SetProp errors
-        try:
-            # Prefer PNG for Pygame compatibility
-            icon_path = "icon.png"
-            if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
-                icon_path = os.path.join(sys._MEIPASS, 'icon.png')
-            
-            # Fallback to ICO if PNG not found
-            if not os.path.exists(icon_path):
-                icon_path = "icon.ico"
-                if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
-                    icon_path = os.path.join(sys._MEIPASS, 'icon.ico')
+        with self.lock:
+            self.entries[key] = layout
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return layout
 
-            if os.path.exists(icon_path):
-                icon_surface = pygame.image.load(icon_path)
-                # Scale to 32x32 to prevent potential memory errors with large icons
-                icon_surface = pygame.transform.scale(icon_surface, (32, 32))
-                pygame.display.set_icon(icon_surface)
+    def disk_path(self, key):
+        return os.path.join(self.disk_dir, hashlib.sha1(repr(key).encode('utf-8')).hexdigest() + '.npz')
+
+    def load(self, key):
+        try:
+            with np.load(self.disk_path(key)) as data:
+                return {
+                    'walls': [tuple(wall) for wall in data['walls'].tolist()],
+                    'mines': [tuple(mine) for mine in data['mines'].tolist()],
+                    'goal': tuple(data['goal'].tolist()),
+                    'cell_size': int(data['cell_size']),
+                    'distance': data['distance'],
+                    'open_sides': data['open_sides'],
+                    'metrics': json.loads(str(data['metrics'])),
+                }
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def save(self, key, layout):
+        path = self.disk_path(key)
+        try:
+            # Escrever para um ficheiro temporário e renomear (nunca deixa um .npz a meio)
+            with open(path + '.tmp', 'wb') as f:
+                np.savez(f,
+                         walls=np.array(layout['walls'], dtype=np.int32).reshape(-1, 4),
+                         mines=np.array(layout['mines'], dtype=np.float64).reshape(-1, 3),
+                         goal=np.array(layout['goal'], dtype=np.int32),
+                         cell_size=np.int32(layout['cell_size']),
+                         distance=layout['distance'],
+                         open_sides=layout['open_sides'],
+                         metrics=np.array(json.dumps(layout['metrics'])))
+            os.replace(path + '.tmp', path)
+        except OSError as e:
+            print(f"Erro ao guardar labirinto em cache: {e}")
+
+class LevelPreloader:
+    """Prepara o próximo nível numa thread de fundo enquanto o atual está a ser jogado.
+
+    prepare(params) corre na thread; take(params) devolve o resultado pronto (ou espera pelo
+    que já está a ser preparado, em vez de gerar o mesmo nível duas vezes)."""
+
+    def __init__(self, prepare):
+        self.prepare = prepare
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='level-preload')
+        self.pending_params = None
+        self.pending_future = None
+
+    def request(self, params):
+        if params == self.pending_params:
+            return
+        if self.pending_future:
+            self.pending_future.cancel()
+        self.pending_params = params
+        self.pending_future = self.executor.submit(self.prepare, params)
+
+    def take(self, params):
+        if params != self.pending_params:
+            return None
+        future = self.pending_future
+        self.pending_params = None
+        self.pending_future = None
+        try:
+            return future.result()
         except Exception as e:
-            print(f"Warning: Could not set window icon: {e}")
+            print(f"Erro ao pré-gerar nível: {e}")
+            return None
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+class SurfaceCache:
+    """Cache LRU de surfaces (sprites, camada estática do nível, texto) com orçamento de memória.
+
+    get(key, build, *args) devolve a surface em cache ou cria-a com build(*args); cada entrada
+    conta os bytes dos seus pixels e as menos usadas saem quando o total passa do orçamento."""
+
+    def __init__(self, budget_bytes):
+        self.budget = budget_bytes
+        self.entries = OrderedDict()  # key -> (surface, bytes)
+        self.pinned = {}  # key -> (surface, bytes): contam para o orçamento mas nunca saem
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, build, *args):
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+        self.misses += 1
+        surface = build(*args)
+        self.put(key, surface)
+        return surface
+
+    def put(self, key, surface):
+        self.discard(key)
+        size = surface.get_pitch() * surface.get_height()
+        if size > self.budget:
+            return  # Maior que o orçamento inteiro: usada mas não guardada
+        self.entries[key] = (surface, size)
+        self.used += size
+        self.evict()
+
+    def pin(self, key, surface):
+        """Surface sempre em memória (ex.: o atlas de sprites, desenhado por áreas)"""
+        self.discard(key)
+        size = surface.get_pitch() * surface.get_height()
+        self.pinned[key] = (surface, size)
+        self.used += size
+        self.evict()
+
+    def evict(self):
+        while self.used > self.budget and self.entries:
+            _, (_, evicted_size) = self.entries.popitem(last=False)
+            self.used -= evicted_size
+            self.evictions += 1
+
+    def discard(self, key):
+        entry = self.entries.pop(key, None) or self.pinned.pop(key, None)
+        if entry is not None:
+            self.used -= entry[1]
+
+    def text(self, font, text, color):
+        """Texto renderizado (antialias) em cache: HUD e legendas repetidas não voltam a ser rasterizadas"""
+        return self.get(('text', font, text, color), font.render, text, True, color)
+
+    def usage(self):
+        """Linha do overlay do profiler: memória usada / orçamento, entradas e taxa de acertos"""
+        lookups = self.hits + self.misses
+        hit_rate = 100 * self.hits / lookups if lookups else 0
+        return (f"surfaces {self.used / 2**20:5.1f}/{self.budget / 2**20:.0f} MB  "
+                f"{len(self.entries) + len(self.pinned)} ent  {hit_rate:3.0f}% hit  {self.evictions} evict")
+
+class SpriteAtlas:
+    """Sprites pré-desenhados numa só surface, empacotados por prateleiras (mais altos primeiro).
+
+    Cada sprite é recortado à sua área visível e guarda o deslocamento do seu ponto de
+    referência (o centro da surface original): blit(target, key, x, y) desenha-o com esse
+    ponto em (x, y) com um único blit. Os sprites não têm antialiasing, por isso o atlas usa
+    colorkey em vez de alpha por pixel (blits ~40% mais rápidos)."""
+
+    def __init__(self, sprites, width=SPRITE_ATLAS_WIDTH):
+        trimmed = []
+        for key, sprite in sprites.items():
+            bounds = sprite.get_bounding_rect()
+            anchor = (sprite.get_width() // 2 - bounds.x, sprite.get_height() // 2 - bounds.y)
+            trimmed.append((key, sprite, bounds, anchor))
+        trimmed.sort(key=lambda item: item[2].height, reverse=True)
+
+        placed = []
+        x = y = shelf_height = 0
+        for key, sprite, bounds, anchor in trimmed:
+            if x + bounds.width > width:
+                x, y = 0, y + shelf_height
+                shelf_height = 0
+            placed.append((key, sprite, bounds, anchor, x, y))
+            x += bounds.width
+            shelf_height = max(shelf_height, bounds.height)
+
+        self.surface = pygame.Surface((width, max(1, y + shelf_height)))
+        self.surface.fill(SPRITE_ATLAS_COLORKEY)
+        self.surface.set_colorkey(SPRITE_ATLAS_COLORKEY)
+        self.frames = {}
+        for key, sprite, bounds, anchor, x, y in placed:
+            self.surface.blit(sprite, (x, y), bounds)
+            self.frames[key] = (pygame.Rect(x, y, bounds.width, bounds.height), anchor[0], anchor[1])
+
+    def blit(self, target, key, x, y):
+        area, anchor_x, anchor_y = self.frames[key]
+        target.blit(self.surface, (x - anchor_x, y - anchor_y), area)
+
+def render_ball_sprite(color, radius=BALL_RADIUS):
+    """Bola com sombra e highlight (referência: centro da bola)"""
+    half = radius + 4
+    surface = pygame.Surface((half * 2, half * 2), pygame.SRCALPHA)
+    # Sombra
+    shadow_color = (int(color[0] * 0.4), int(color[1] * 0.4), int(color[2] * 0.4))
+    pygame.draw.circle(surface, shadow_color, (half + 3, half + 3), radius)
+    # Bola principal
+    pygame.draw.circle(surface, color, (half, half), radius)
+    # Highlight
+    # Make highlight also use the ball's color
+    highlight_color = (min(255, int(color[0] * 1.5)), min(255, int(color[1] * 1.5)), min(255, int(color[2] * 1.5)))
+    pygame.draw.circle(surface, highlight_color, (half - 3, half - 3), radius // 3)
+    return surface
+
+def render_arrow_sprite(color, angle, size=INDICATOR_SIZE):
+    """Seta do indicador de direção a apontar para angle (rad); None = parado (círculo)"""
+    half = size + 4
+    surface = pygame.Surface((half * 2, half * 2), pygame.SRCALPHA)
+    if angle is None:
+        pygame.draw.circle(surface, color, (half, half), size // 2)
+        pygame.draw.circle(surface, WHITE, (half, half), size // 2, 3)
+        return surface
+
+    arrow_length = size
+    arrow_width = size // 2
+
+    tip_x = half + arrow_length * math.cos(angle)
+    tip_y = half + arrow_length * math.sin(angle)
+
+    base_angle1 = angle + math.pi * 0.75
+    base_angle2 = angle - math.pi * 0.75
+
+    base1_x = half + arrow_width * math.cos(base_angle1)
+    base1_y = half + arrow_width * math.sin(base_angle1)
+
+    base2_x = half + arrow_width * math.cos(base_angle2)
+    base2_y = half + arrow_width * math.sin(base_angle2)
+
+    points = [(tip_x, tip_y), (base1_x, base1_y), (base2_x, base2_y)]
+    pygame.draw.polygon(surface, color, points)
+    pygame.draw.polygon(surface, WHITE, points, 3)
+    return surface
+
+def render_heart_sprite(size, left_color, right_color=None):
+    """Coração (referência: o centro usado por draw_hearts); com right_color, dividido ao meio
+    entre os dois jogadores (esquerda = jogador 1, direita = jogador 2)"""
+    half = size
+    x = y_pos = half
+    surface = pygame.Surface((half * 2, half * 2), pygame.SRCALPHA)
+
+    # Shapes logic
+    left_circle_pos = (int(x - size//4), int(y_pos - size//4))
+    right_circle_pos = (int(x + size//4), int(y_pos - size//4))
+
+    # Triangle points
+    # Tip is at (x, y_pos + size//2)
+    # Top Left is (x - size//2, y_pos - size//6)
+    # Top Right is (x + size//2, y_pos - size//6)
+    # Top Center is (x, y_pos - size//6)
+    triangle_tip = (x, y_pos + size//2)
+    triangle_top_left = (x - size//2, y_pos - size//6)
+    triangle_top_right = (x + size//2, y_pos - size//6)
+    triangle_top_center = (x, y_pos - size//6)
+
+    if right_color is not None:
+        # --- Multiplayer: Split Heart ---
+        # 1. Left Half (Player 1)
+        surface.set_clip(pygame.Rect(0, 0, x, half * 2))
+        pygame.draw.circle(surface, left_color, left_circle_pos, size//3)
+        pygame.draw.polygon(surface, left_color, [triangle_tip, triangle_top_left, triangle_top_center])
+
+        # 2. Right Half (Player 2)
+        surface.set_clip(pygame.Rect(x, 0, half * 2 - x, half * 2))
+        pygame.draw.circle(surface, right_color, right_circle_pos, size//3)
+        pygame.draw.polygon(surface, right_color, [triangle_tip, triangle_top_right, triangle_top_center])
+        surface.set_clip(None)
+
+        # Thin black line in the middle to separate (extends higher up to split the circles)
+        pygame.draw.line(surface, BLACK, (x, y_pos - size//2), triangle_tip, 2)
+    else:
+        # --- Single Player: Full Heart ---
+        pygame.draw.circle(surface, left_color, left_circle_pos, size//3)
+        pygame.draw.circle(surface, left_color, right_circle_pos, size//3)
+        pygame.draw.polygon(surface, left_color, [triangle_tip, triangle_top_left, triangle_top_right])
+    return surface
+
+def render_sprite_atlas():
+    """Todos os sprites do jogo: bolas, corações (todos os tamanhos do pulso) e indicador de
+    direção (ARROW_ANGLE_STEP graus entre frames)"""
+    sprites = {}
+    for color in (BALL_COLOR, BALL2_COLOR):
+        sprites['ball', color] = render_ball_sprite(color)
+    for color in INDICATOR_COLORS:
+        sprites['indicator', color, None] = render_arrow_sprite(color, None)
+        for step in range(360 // ARROW_ANGLE_STEP):
+            sprites['indicator', color, step] = render_arrow_sprite(color, math.radians(step * ARROW_ANGLE_STEP))
+    for size in range(int(HEART_SIZE * (1 - HEART_PULSE)) - 1, int(HEART_SIZE * (1 + HEART_PULSE)) + 1):
+        for color in (RED, DARK_GRAY):
+            sprites['heart', size, color, None] = render_heart_sprite(size, color)
+            for color_p2 in (GREEN, DARK_GRAY):
+                sprites['heart', size, color, color_p2] = render_heart_sprite(size, color, color_p2)
+    return SpriteAtlas(sprites)
+
+class FrameProfiler:
+    """Tempos de cada fase do frame (perf_counter_ns) com percentis móveis e trace opcional.
+
+    As fases podem ser aninhadas: cada uma conta só o seu tempo exclusivo (por exemplo,
+    'draw' não inclui 'render'). O trace usa o formato JSON de eventos do Chrome
+    (chrome://tracing ou ui.perfetto.dev)."""
+
+    PHASES = ('wait', 'events', 'input', 'physics', 'mines', 'timers', 'check_win', 'draw', 'render', 'overlay')
+    COLORS = {
+        'wait': DARK_GRAY, 'events': (0, 200, 200), 'input': (0, 120, 255), 'physics': (255, 80, 80),
+        'mines': ORANGE, 'timers': (180, 100, 255), 'check_win': YELLOW, 'draw': GREEN,
+        'render': (0, 150, 0), 'overlay': LIGHT_GRAY,
+    }
 
-        # Dimensões da janela (redimensionável)
-        self.window_width = DEFAULT_WIDTH
-        self.window_height = DEFAULT_HEIGHT
-        
-        # Try to set mode, fallback if SetProp fails (common on Windows)
+    def __init__(self, enabled=False, window=PROFILER_WINDOW):
+        self.enabled = enabled
+        self.samples = {phase: deque(maxlen=window) for phase in self.PHASES}
+        self.frame_totals = deque(maxlen=window)  # Tempo total por frame (sem 'wait')
+        self.current = dict.fromkeys(self.PHASES, 0)
+        self.stack = []
+        self.stats = {}
+        self.frames_since_stats = 0
+        self.text_cache = None  # Texto do overlay, refeito só quando os percentis mudam
+        self.surface_cache = None  # SurfaceCache cujo uso de memória é mostrado no overlay
+        self.tracing = False
+        self.trace_events = []
+
+    def begin(self, phase):
+        self.stack.append([phase, time.perf_counter_ns(), 0])
+
+    def end(self):
+        phase, start, children = self.stack.pop()
+        elapsed = time.perf_counter_ns() - start
+        self.current[phase] += elapsed - children
+        if self.stack:
+            self.stack[-1][2] += elapsed
+        if self.tracing and len(self.trace_events) < PROFILER_TRACE_MAX_EVENTS:
+            self.trace_events.append({'name': phase, 'ph': 'X', 'pid': 1, 'tid': 1,
+                                      'ts': start / 1000, 'dur': elapsed / 1000})
+
+    def end_frame(self):
+        """Fechar o frame atual: guardar os tempos por fase e recomeçar os acumuladores"""
+        total = 0
+        for phase, elapsed in self.current.items():
+            self.samples[phase].append(elapsed)
+            if phase != 'wait':
+                total += elapsed
+            self.current[phase] = 0
+        self.frame_totals.append(total)
+        self.frames_since_stats += 1
+
+    def percentiles(self):
+        """p50/p95/p99 (ms) por fase e do frame; recalculado no máximo a cada 30 frames"""
+        if self.frames_since_stats >= 30 or not self.stats:
+            self.frames_since_stats = 0
+            self.stats = {}
+            self.text_cache = None
+            for phase, values in (('frame', self.frame_totals), *self.samples.items()):
+                if values:
+                    self.stats[phase] = np.percentile(np.fromiter(values, dtype=np.int64), (50, 95, 99)) / 1e6
+        return self.stats
+
+    def start_trace(self):
+        self.trace_events = []
+        self.tracing = True
+        self.text_cache = None
+
+    def stop_trace(self, path=None):
+        """Parar a gravação e escrever o trace; devolve o caminho do ficheiro"""
+        self.tracing = False
+        self.text_cache = None
+        if path is None:
+            path = f"trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
         try:
-            self.screen = pygame.display.set_mode(
-                (self.window_width, self.window_height),
-                pygame.RESIZABLE
-            )
-        except pygame.error as e:
-            print(f"Warning: Failed to set RESIZABLE mode ({e}). Retrying without it.")
-            try:
-                self.screen = pygame.display.set_mode(
-                    (self.window_width, self.window_height)
-                )
+            with open(path, 'w') as f:
+                json.dump({'traceEvents': self.trace_events, 'displayTimeUnit': 'ms'}, f)
+        except OSError as e:
+            print(f"Erro ao guardar trace: {e}")
+            return None
+        finally:
+            self.trace_events = []
+        return path
+
+    def render_text(self, font, stats, width):
+        """Percentis por fase (texto), em cache até à próxima atualização"""
+        line_height = font.get_linesize()
+        rows = [phase for phase in self.PHASES if phase in stats]
+        extra_rows = 3 if self.surface_cache else 2
+        surface = pygame.Surface((width, line_height * (len(rows) + extra_rows)), pygame.SRCALPHA)
+        text_y = 0
+        if 'frame' in stats:
+            p50, p95, p99 = stats['frame']
+            header = f"frame  p50 {p50:5.2f}  p95 {p95:5.2f}  p99 {p99:5.2f} ms"
+            surface.blit(font.render(header, True, WHITE), (0, text_y))
+        text_y += line_height
+        if self.tracing:
+            surface.blit(font.render("TRACE", True, RED), (0, text_y))
+        text_y += line_height
+        for phase in rows:
+            p50, p95, p99 = stats[phase]
+            label = f"{phase:<10} {p50:6.2f} {p95:6.2f} {p99:6.2f}"
+            surface.blit(font.render(label, True, self.COLORS[phase]), (0, text_y))
+            text_y += line_height
+        if self.surface_cache:
+            surface.blit(font.render(self.surface_cache.usage(), True, LIGHT_GRAY), (0, text_y))
+        return surface
+
+    def draw(self, screen, font, x=10, y=10):
+        """Overlay compacto: gráfico dos últimos frames e percentis por fase"""
+        stats = self.percentiles()
+        width = 330
+        graph_height = 60
+        if self.text_cache is None:
+            self.text_cache = self.render_text(font, stats, width - 10)
+
+        panel = pygame.Surface((width, graph_height + self.text_cache.get_height() + 15), pygame.SRCALPHA)
+        panel.fill((0, 0, 0, 180))
+
+        # Gráfico de barras dos últimos frames (escala 0-33 ms; linha = orçamento de 1/FPS)
+        budget_ns = 1e9 / FPS
+        scale = graph_height / (2 * budget_ns)
+        bar_width = max(1, (width - 10) // PROFILER_GRAPH_FRAMES)
+        recent = list(self.frame_totals)[-PROFILER_GRAPH_FRAMES:]
+        for i, total in enumerate(recent):
+            bar_height = min(graph_height, int(total * scale))
+            color = RED if total > budget_ns else GREEN
+            pygame.draw.rect(panel, color, (5 + i * bar_width, 5 + graph_height - bar_height, bar_width, bar_height))
+        budget_y = 5 + graph_height - int(budget_ns * scale)
+        pygame.draw.line(panel, YELLOW, (5, budget_y), (width - 5, budget_y))
+
+        panel.blit(self.text_cache, (5, graph_height + 10))
+        screen.blit(panel, (x, y))
+
+def write_varint(buffer, value):
+    """Acrescentar um inteiro não negativo em varint (7 bits por byte)"""
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def read_varint(data, pos):
+    """Ler um varint em data[pos:]; devolve (valor, posição seguinte)"""
+    value = 0
+    shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+def zigzag(value):
+    """Inteiro com sinal -> sem sinal (valores pequenos, positivos ou negativos, ficam com 1 byte)"""
+    return value * 2 if value >= 0 else -value * 2 - 1
+
+
+def unzigzag(value):
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def prune_replays(directory, keep, referenced=()):
+    """Apagar os replays mais antigos de directory, deixando só os keep mais recentes (0 = todos).
+
+    Os caminhos em referenced (replays de pontuações na leaderboard) nunca são apagados
+    nem contam para o limite."""
+    if not keep:
+        return
+    referenced = {os.path.abspath(path) for path in referenced}
+    try:
+        paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith('.gmr')]
+        paths = [path for path in paths if os.path.abspath(path) not in referenced]
+        paths.sort(key=os.path.getmtime)
+    except OSError:
+        return
+    for path in paths[:-keep]:
+        try:
+            os.remove(path)
+        except OSError as e:
+            print(f"Erro ao apagar replay antigo: {e}")
+
+
+class ReplayRecorder:
+    """Grava um jogo em memória: inputs de cada passo de física, ações do jogador e eventos.
+
+    Os inputs (já quantizados) são guardados como deltas em varint e os passos com o mesmo
+    input são agrupados (run-length). Com o ruído do acelerómetro o input muda quase a cada
+    passo, por isso o stream é comprimido com zlib no fim (menos de metade do tamanho)."""
+
+    def __init__(self, header):
+        self.header = header
+        self.buffer = bytearray()
+        self.last_input = (0, 0, 0, 0)
+        self.run_input = None
+        self.run_length = 0
+        self.ticks = 0
+
+    def input(self, input1, input2):
+        vector = (input1[0], input1[1], input2[0], input2[1])
+        self.ticks += 1
+        if vector == self.run_input:
+            self.run_length += 1
+            return
+        self.flush()
+        self.run_input = vector
+        self.run_length = 1
+
+    def flush(self):
+        """Escrever o bloco de passos com input repetido que está pendente"""
+        if not self.run_length:
+            return
+        self.buffer.append(REPLAY_TAG_INPUT)
+        write_varint(self.buffer, self.run_length)
+        for value, last in zip(self.run_input, self.last_input):
+            write_varint(self.buffer, zigzag(value - last))
+        self.last_input = self.run_input
+        self.run_length = 0
+
+    def action(self, code):
+        self.flush()
+        self.buffer.append(REPLAY_TAG_ACTION)
+        write_varint(self.buffer, code)
+
+    def event(self, kind, player, value):
+        self.flush()
+        self.buffer.append(REPLAY_TAG_EVENT)
+        write_varint(self.buffer, kind)
+        write_varint(self.buffer, player)
+        write_varint(self.buffer, zigzag(value))
+
+    def finish(self, summary):
+        """Conteúdo do ficheiro: cabeçalho JSON, stream de registos (zlib) e resumo final.
+
+        O resumo também fica nos últimos bytes (JSON + tamanho em 4 bytes) para poder
+        ser lido sem percorrer o stream."""
+        self.flush()
+        header = json.dumps(self.header, separators=(',', ':')).encode('utf-8')
+        summary = json.dumps(summary, separators=(',', ':')).encode('utf-8')
+        data = bytearray(REPLAY_MAGIC)
+        data.append(REPLAY_VERSION)
+        write_varint(data, len(header))
+        data += header
+        self.buffer.append(REPLAY_TAG_END)
+        data += zlib.compress(self.buffer, REPLAY_COMPRESSION_LEVEL)
+        data += summary
+        data += len(summary).to_bytes(4, 'little')
+        return bytes(data)
+
+
+class Replay:
+    """Replay lido de bytes ou de um ficheiro mapeado em memória (Replay.open).
+
+    O stream de registos é lido diretamente do mmap: na versão 1 sem cópia; na versão 2
+    descomprimido aos poucos (blocos de REPLAY_READ_CHUNK), sem nunca estar todo em memória."""
+
+    def __init__(self, data):
+        if len(data) < 9 or bytes(data[:4]) != REPLAY_MAGIC:
+            raise ValueError("Ficheiro de replay inválido")
+        version = data[4]
+        if version not in (1, REPLAY_VERSION):
+            raise ValueError(f"Versão de replay não suportada: {version}")
+        self.data = data
+        self.version = version
+        header_length, pos = read_varint(data, 5)
+        self.header = json.loads(bytes(data[pos:pos + header_length]))
+        summary_length = int.from_bytes(data[-4:], 'little')
+        self.body_start = pos + header_length
+        self.body_end = len(data) - 4 - summary_length
+        self.summary = json.loads(bytes(data[self.body_end:-4]))
+
+    @classmethod
+    def open(cls, path):
+        with open(path, 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(data)
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+
+    def body_chunks(self):
+        """Blocos descomprimidos do stream (versão 2), cada um com até REPLAY_READ_CHUNK bytes"""
+        decompressor = zlib.decompressobj()
+        try:
+            for start in range(self.body_start, self.body_end, REPLAY_READ_CHUNK):
+                pending = self.data[start:min(start + REPLAY_READ_CHUNK, self.body_end)]
+                while pending:
+                    yield decompressor.decompress(pending, REPLAY_READ_CHUNK)
+                    pending = decompressor.unconsumed_tail
+            yield decompressor.flush()
+        except zlib.error as e:
+            raise ValueError(f"Stream de replay corrompido: {e}")
+
+    def commands(self):
+        """Registos do stream: ('input', passos, input1, input2), ('action', código)
+        ou ('event', tipo, jogador, valor)"""
+        if self.version == 1:
+            data, pos, chunks = self.data, self.body_start, ()
+            refill_at = len(data)  # Tudo no mmap: nunca é preciso ler mais
+        else:
+            data, pos, chunks = b'', 0, self.body_chunks()
+            refill_at = 0
+        vector = [0, 0, 0, 0]
+        while True:
+            if pos >= refill_at:
+                # Garantir um registo inteiro no bloco atual (junta o resto ao bloco seguinte)
+                refill_at = len(data)
+                for chunk in chunks:
+                    data = data[pos:] + chunk
+                    pos = 0
+                    if len(data) >= REPLAY_MAX_RECORD:
+                        refill_at = len(data) - REPLAY_MAX_RECORD
+                        break
+            tag = data[pos]
+            pos += 1
+            if tag == REPLAY_TAG_INPUT:
+                count, pos = read_varint(data, pos)
+                for i in range(4):
+                    delta, pos = read_varint(data, pos)
+                    vector[i] += unzigzag(delta)
+                yield ('input', count, (vector[0], vector[1]), (vector[2], vector[3]))
+            elif tag == REPLAY_TAG_ACTION:
+                code, pos = read_varint(data, pos)
+                yield ('action', code)
+            elif tag == REPLAY_TAG_EVENT:
+                kind, pos = read_varint(data, pos)
+                player, pos = read_varint(data, pos)
+                value, pos = read_varint(data, pos)
+                yield ('event', kind, player, unzigzag(value))
+            elif tag == REPLAY_TAG_END:
+                return
+            else:
+                raise ValueError(f"Registo de replay desconhecido: {tag}")
+
+
+class ReplayPlayer:
+    """Re-simula um replay numa Simulation (headless) ou no Game (para ver no ecrã).
+
+    Os mesmos inputs por passo de física dão exatamente o mesmo jogo; cada evento gravado
+    é comparado com o que a simulação produz e as diferenças ficam em mismatches."""
+
+    def __init__(self, replay, sim):
+        self.replay = replay
+        self.sim = sim
+        self.commands = replay.commands()
+        self.input1 = (0, 0)
+        self.input2 = (0, 0)
+        self.pending_ticks = 0
+        self.ticks = 0
+        self.event_index = 0
+        self.time_accumulator = 0.0
+        self.mismatches = []
+        self.finished = False
+        # Limite de passos: o total do resumo (no máximo REPLAY_MAX_TIME), para um contador
+        # adulterado no ficheiro não prender a re-simulação
+        max_ticks = round(REPLAY_MAX_TIME / PHYSICS_DT)
+        ticks = replay.summary.get('ticks')
+        self.max_ticks = min(ticks, max_ticks) if isinstance(ticks, int) else max_ticks
+
+    def start(self):
+        """Configurar a simulação como no jogo gravado e começar do primeiro nível"""
+        header = self.replay.header
+        if header['physics_dt'] != PHYSICS_DT or header['input_scale'] != REPLAY_INPUT_SCALE:
+            raise ValueError("Replay gravado com outra configuração de física")
+        if header.get('maze_version') != MAZE_CACHE_VERSION:
+            raise ValueError("Replay gravado com outra versão dos labirintos")
+        sim = self.sim
+        sim.game_mode = header['game_mode']
+        sim.difficulty = header['difficulty']
+        sim.num_players = header['num_players']
+        sim.sensitivity = header['sensitivity']
+        sim.difficulty_band = tuple(header['difficulty_band']) if header.get('difficulty_band') else None
+        sim.world_width, sim.world_height = header['world']
+        sim.start_game(header['seed'])
+        sim.recorder = None  # Não gravar a própria reprodução
+
+    def advance(self, max_ticks=None):
+        """Correr até max_ticks passos de física (None = até ao fim); devolve os passos corridos"""
+        sim = self.sim
+        done = 0
+        while not self.finished and (max_ticks is None or done < max_ticks):
+            if self.pending_ticks:
+                if sim.state != "PLAYING":
+                    # tick() não faz nada fora de PLAYING (e só esses passos são gravados)
+                    self.pending_ticks = 0
+                    continue
+                count = self.pending_ticks if max_ticks is None else min(self.pending_ticks, max_ticks - done)
+                ran = 0
+                while ran < count and sim.state == "PLAYING":
+                    sim.tick(self.input1, self.input2)
+                    ran += 1
+                self.pending_ticks -= ran
+                self.ticks += ran
+                done += ran
+                continue
+
+            command = next(self.commands, None)
+            if command is None:
+                self.finish()
+            elif command[0] == 'input':
+                _, count, self.input1, self.input2 = command
+                if self.ticks + count > self.max_ticks:
+                    raise ValueError(f"replay com mais passos do que o gravado ({self.ticks + count} > {self.max_ticks})")
+                self.pending_ticks = count
+            elif command[0] == 'action':
+                sim.apply_action(command[1])
+            else:
+                self.check_event(command[1:])
+        return done
+
+    def advance_time(self, dt, speed=1.0):
+        """Avançar os passos de física correspondentes a dt segundos reais (para ver no ecrã)"""
+        self.time_accumulator += dt * speed
+        ticks = int(self.time_accumulator / PHYSICS_DT + 1e-6)
+        if not ticks:
+            return 0
+        self.time_accumulator -= ticks * PHYSICS_DT
+        return self.advance(ticks)
+
+    def check_event(self, recorded):
+        log = self.sim.event_log
+        produced = log[self.event_index] if self.event_index < len(log) else None
+        self.event_index += 1
+        if produced != recorded:
+            self.mismatches.append(f"passo {self.ticks}: evento gravado {recorded}, simulado {produced}")
+
+    def finish(self):
+        self.finished = True
+        extra = self.sim.event_log[self.event_index:]
+        if extra:
+            self.mismatches.append(f"eventos a mais na simulação: {extra}")
+        summary = self.sim.replay_summary()
+        for key, value in self.replay.summary.items():
+            if summary.get(key) != value:
+                self.mismatches.append(f"{key}: gravado {value}, simulado {summary.get(key)}")
+
+class Simulation:
+    """Lógica do jogo sem janela, som nem serial: labirinto, física, minas, temporizadores e vitória.
+
+    O tempo de jogo (sim_time) só avança em step(), por isso a simulação pode correr
+    mais depressa que o tempo real (testes, bots, benchmarks). O Game herda desta classe."""
+
+    def __init__(self, game_mode='normal', difficulty='normal', num_players=1, sensitivity=1.0,
+                 world_width=DEFAULT_WIDTH, world_height=DEFAULT_HEIGHT, seed=None, maze_cache=None):
+        # Dimensões virtuais do mundo do jogo (fixas)
+        self.world_width = world_width
+        self.world_height = world_height
+        self.sensitivity = sensitivity
+
+        # Modo de jogo
+        self.game_mode = game_mode  # normal, minefield, timeattack, elimination
+        self.difficulty = difficulty # easy, normal, hard
+        self.num_players = num_players # 1 or 2
+        self.ball2 = None
+        self.player1_finished = False
+        self.player2_finished = False
+        self.player1_time = 0
+        self.player2_time = 0
+        self.player1_score = 0
+        self.player2_score = 0
+        self.player1_lives = 0
+        self.player2_lives = 0
+        self.winner = None # "Player 1", "Player 2" or None
+
+        # Sistema de vidas
+        self.lives = 5
+        self.max_lives = 5
+        self.mine_hit_animation_time = 0
+
+        # Sistema de precisão (modo normal)
+        self.precision_score = 0
+        self.wall_collisions = 0
+        self.collision_pause_time = 0
+        self.last_precision_update = 0
+
+        # Lista de minas no labirinto atual
+        self.mines = []
+
+        # Estado do jogo
+        self.state = "MENU"
+        self.pending_score_data = None
+        self.level = 1
+        self.timer = 0
+        self.sim_time = 0.0  # Tempo de jogo (segundos), avançado por step()
+
+        # Níveis determinísticos: seed fixa (ou None = nova seed em cada jogo) e cache de labirintos
+        self.seed = seed
+        self.session_seed = seed if seed is not None else random.getrandbits(32)
+        self.level_rng = random.Random(self.session_seed)  # Tempos aleatórios do nível
+        self.maze_cache = maze_cache or MazeCache()
+        self.difficulty_band = None  # (mín, máx) de metrics['difficulty'], ou None = primeiro labirinto da seed
+        self.profiler = None  # FrameProfiler opcional (tempos por fase em step)
+
+        # Física em passo fixo e gravação de replays
+        self.step_accumulator = 0.0  # Tempo ainda não simulado (< PHYSICS_DT)
+        self.tick_count = 0
+        self.record_replays = False
+        self.replay_keep = REPLAY_KEEP
+        self.recorder = None  # ReplayRecorder do jogo atual
+        self.event_log = []  # Eventos (tipo, jogador, valor) do jogo atual
+
+        # Estatísticas
+        self.total_time = 0
+        self.best_time = float('inf')
+        self.levels_completed = 0
+        self.total_score = 0
+        self.current_score = 0
+        self.current_time = 0
+
+    def start_game(self, seed=None):
+        """Iniciar jogo com modo selecionado (seed repetida = mesmos labirintos)"""
+        if seed is None:
+            seed = self.seed if self.seed is not None else random.getrandbits(32)
+        self.session_seed = seed
+        self.state = "PLAYING"
+        self.level = 1
+        self.sim_time = 0.0
+        self.step_accumulator = 0.0
+        self.tick_count = 0
+        self.event_log = []
+        self.recorder = ReplayRecorder(self.replay_header()) if self.record_replays else None
+        self.total_time = 0
+        self.levels_completed = 0
+        self.total_score = 0
+        self.current_score = 0
+        self.current_time = 0
+        self.winner = None
+        self.player1_score = 0
+        self.player2_score = 0
+        # Resetar vidas baseado no modo
+        mode_config = GAME_MODES.get(self.game_mode, {})
+        self.lives = mode_config.get('initial_lives', 5)
+        self.max_lives = self.lives
+        self.player1_lives = self.lives
+        self.player2_lives = self.lives
+        self.init_level()
+
+    def level_params(self, level):
+        """Argumentos de MazeCache.get para um nível (o último é a seed do nível)"""
+        mine_percentage = GAME_MODES.get(self.game_mode, {}).get('mine_percentage', 0.15)
+        seed = level_seed(self.session_seed, level, self.difficulty, self.game_mode)
+        return (level, self.world_width, self.world_height, self.game_mode, mine_percentage, self.difficulty, seed)
+
+    def load_layout(self, params):
+        return self.maze_cache.get(*params, band=self.difficulty_band)
+
+    def init_level(self):
+        """Inicializar um novo nível"""
+        # Obter configuração do modo atual
+        mode_config = GAME_MODES.get(self.game_mode, {})
+
+        # Labirinto com minas (usando dificuldade), a partir da seed do nível (cache ou gerado)
+        params = self.level_params(self.level)
+        layout = self.load_layout(params)
+        seed = params[-1]
+        self.walls = layout['walls']
+        self.mines = [Mine(x, y, size) for x, y, size in layout['mines']]
+        self.goal_pos = layout['goal']
+        current_cell_size = layout['cell_size']
+        self.cell_size = current_cell_size
+        self.distance_field = layout['distance']  # Distância ao objetivo (em células) de cada célula
+        self.open_sides = layout['open_sides']  # Bits 0-3: lados sem parede [top, right, bottom, left]
+        self.wall_index = WallIndex(self.walls)
+        self.level_rng = random.Random(seed)
+
+        # Adjust goal radius to fit in cell (max 30, or 40% of cell size to avoid touching walls)
+        self.goal_radius = min(30, int(current_cell_size * 0.4))
+
+        # Posição inicial da bola: centro da célula inicial (com células < 60px, o antigo
+        # ponto fixo a 60px da margem caía noutra célula)
+        ball_start_x = MAZE_MARGIN + current_cell_size // 2
+        ball_start_y = MAZE_MARGIN_TOP + current_cell_size // 2
+        self.ball = Ball(ball_start_x, ball_start_y, self.sensitivity, self.world_width, self.world_height)
+        
+        # Setup Multiplayer
+        if self.num_players == 2:
+            # Balls placed equidistant from the top-left corner (0,0) of the cell
+            # This forms a triangle with the corner wall, ensuring fairness.
+            
+            # Distances within the cell
+            dist_far = current_cell_size * 0.75
+            dist_close = current_cell_size * 0.25
+            
+            start_x = MAZE_MARGIN
+            start_y = MAZE_MARGIN_TOP
+            
+            # P1 (Red): Further Right, Closer to Top
+            self.ball.x = start_x + dist_far
+            self.ball.y = start_y + dist_close
+            
+            # P2 (Green): Further Down, Closer to Left
+            self.ball2 = Ball(start_x + dist_close, start_y + dist_far, self.sensitivity, self.world_width, self.world_height, color=BALL2_COLOR)
+            self.ball2_start = (self.ball2.x, self.ball2.y)
+            
+            self.player1_finished = False
+            self.player2_finished = False
+            
+            # Store starting distances for score calculation (caminho pelo labirinto)
+            self.p1_start_dist = self.path_distance(self.ball.x, self.ball.y)
+            self.p2_start_dist = self.path_distance(self.ball2.x, self.ball2.y)
+        else:
+            self.ball2 = None
+        self.ball_start = (self.ball.x, self.ball.y)  # Também usada depois de uma mina
+
+        # Resetar variáveis do nível
+        self.timer = 0
+        self.level_start_time = self.sim_time
+        self.mine_hit_animation_time = 0
+
+        # Resetar sistema de precisão
+        if mode_config.get('track_precision', False):
+            self.wall_collisions = 0
+            self.precision_score = 0
+            self.collision_pause_time = 0
+            self.last_precision_update = self.sim_time
+
+        # Configurar timer baseado no modo e dificuldade
+        if mode_config.get('timer_direction') == 'down':
+            if self.game_mode == 'elimination':
+                 # Random time adjustments based on difficulty
+                 base_min, base_max = 30, 80
+                 if self.difficulty == 'easy':
+                     base_min, base_max = 45, 100
+                 elif self.difficulty == 'hard':
+                     base_min, base_max = 35, 75
+                 
+                 self.timer = self.level_rng.randint(base_min, base_max)
+            elif mode_config.get('random_time_on_level', False):
+                # Fallback logic
+                min_time = mode_config.get('random_time_min', 30)
+                max_time = mode_config.get('random_time_max', 80)
+                self.timer = self.level_rng.randint(min_time, max_time)
+            else:
+                # Modo time attack - tempo fixo adjusted by difficulty
+                base_time = mode_config.get('initial_time', 60)
+                if self.difficulty == 'easy':
+                    self.timer = base_time + 60 # +1 min
+                elif self.difficulty == 'hard':
+                    self.timer = max(30, base_time - 60) # -1 min
+                else:
+                    self.timer = base_time
+
+    def step(self, dt, accel1=(0, 0), accel2=(0, 0)):
+        """Avançar dt segundos de jogo em passos fixos de física (PHYSICS_DT).
+
+        accel1/accel2 são as inclinações (em g) dos jogadores 1 e 2; são quantizadas para
+        REPLAY_INPUT_SCALE, por isso o mesmo input gravado reproduz exatamente o mesmo jogo."""
+        if self.state != "PLAYING":
+            return
+        input1 = (round(accel1[0] * REPLAY_INPUT_SCALE), round(accel1[1] * REPLAY_INPUT_SCALE))
+        input2 = (round(accel2[0] * REPLAY_INPUT_SCALE), round(accel2[1] * REPLAY_INPUT_SCALE))
+
+        # O tempo que sobra fica para o frame seguinte
+        self.step_accumulator = min(self.step_accumulator + dt, MAX_STEP_TIME)
+        while self.step_accumulator + 1e-9 >= PHYSICS_DT and self.state == "PLAYING":
+            self.step_accumulator -= PHYSICS_DT
+            self.tick(input1, input2)
+
+    def tick(self, input1, input2):
+        """Um passo fixo de física: bolas, minas, game over, temporizador e vitória.
+
+        input1/input2 são as inclinações quantizadas (1/REPLAY_INPUT_SCALE g) de cada jogador."""
+        if self.state != "PLAYING":
+            return
+        if self.recorder:
+            self.recorder.input(input1, input2)
+        self.tick_count += 1
+        dt_step = PHYSICS_DT
+        self.sim_time += dt_step
+        prof = self.profiler if self.profiler and self.profiler.enabled else None
+
+        # Atualizar sensibilidade da bola
+        self.ball.sensitivity = self.sensitivity
+        if self.ball2:
+            self.ball2.sensitivity = self.sensitivity
+
+        accel1 = (input1[0] / REPLAY_INPUT_SCALE, input1[1] / REPLAY_INPUT_SCALE)
+        accel2 = (input2[0] / REPLAY_INPUT_SCALE, input2[1] / REPLAY_INPUT_SCALE)
+
+        # Player 1 Update
+        if not self.player1_finished:
+            if prof:
+                prof.begin('physics')
+            collided1 = self.ball.update(accel1[0], accel1[1], dt_step, self.walls, PHYSICS_FRICTION,
+                                          self.wall_index)
+            if prof:
+                prof.end()
+            if collided1:
+                self.on_wall_collision(1, self.ball.impact_speed)
+            
+            # Check mines P1
+            if prof:
+                prof.begin('mines')
+            mine = self.find_mine_hit(self.ball)
+            if prof:
+                prof.end()
+            if mine is not None:
+                self.mines.remove(mine)
+                
+                if self.num_players == 2:
+                    self.player1_lives -= 1
+                    if self.player1_lives <= 0:
+                        self.winner = "Player 2"
+                        self.lives = 0 
+                else:
+                    self.lives -= 1
+                    
+                self.mine_hit_animation_time = self.sim_time
+                self.on_mine_hit(1)
+                self.record_event(REPLAY_EVENT_MINE_HIT, 1, self.player1_lives if self.num_players == 2 else self.lives)
+                # Reset P1 pos
+                self.ball.x, self.ball.y = self.ball_start
+                self.ball.vx = 0
+                self.ball.vy = 0
+
+        # Player 2 Update
+        if self.num_players == 2 and self.ball2 and not self.player2_finished:
+            if prof:
+                prof.begin('physics')
+            collided2 = self.ball2.update(accel2[0], accel2[1], dt_step, self.walls, PHYSICS_FRICTION,
+                                           self.wall_index)
+            if prof:
+                prof.end()
+            if collided2:
+                self.on_wall_collision(2, self.ball2.impact_speed)
+
+            # Check mines P2
+            if prof:
+                prof.begin('mines')
+            mine = self.find_mine_hit(self.ball2)
+            if prof:
+                prof.end()
+            if mine is not None:
+                self.mines.remove(mine)
+                
+                self.player2_lives -= 1
+                if self.player2_lives <= 0:
+                    self.winner = "Player 1"
+                    self.lives = 0
+                
+                self.mine_hit_animation_time = self.sim_time
+                self.on_mine_hit(2)
+                self.record_event(REPLAY_EVENT_MINE_HIT, 2, self.player2_lives)
+                # Reset P2 pos
+                self.ball2.x, self.ball2.y = self.ball2_start
+                self.ball2.vx = 0
+                self.ball2.vy = 0
+
+        if prof:
+            prof.begin('timers')
+
+        # Game Over Condition
+        if self.lives <= 0 or (self.num_players == 2 and (self.player1_lives <= 0 or self.player2_lives <= 0)):
+            self.on_game_over()
+            self.record_event(REPLAY_EVENT_GAME_OVER, 0, self.level)
+            
+            # Calculate final scores for multiplayer based on progress
+            if self.num_players == 2 and self.game_mode == 'elimination':
+                dist1 = self.path_distance(self.ball.x, self.ball.y)
+                dist2 = self.path_distance(self.ball2.x, self.ball2.y)
+                
+                # Add progress scores if not already finished
+                if not self.player1_finished and hasattr(self, 'p1_start_dist') and self.p1_start_dist > 0:
+                    if dist1 < self.p1_start_dist:
+                        p1_partial = int(1000 * (self.p1_start_dist - dist1) / self.p1_start_dist)
+                        self.player1_score += p1_partial
+                
+                if not self.player2_finished and hasattr(self, 'p2_start_dist') and self.p2_start_dist > 0:
+                    if dist2 < self.p2_start_dist:
+                        p2_partial = int(1000 * (self.p2_start_dist - dist2) / self.p2_start_dist)
+                        self.player2_score += p2_partial
+            
+            # Determine score to save
+            if self.num_players == 2:
+                if self.winner == "Player 1":
+                    score_to_save = self.player1_score
+                elif self.winner == "Player 2":
+                    score_to_save = self.player2_score
+                else:
+                    score_to_save = max(self.player1_score, self.player2_score)
+            else:
+                score_to_save = self.total_score if self.levels_completed > 0 else self.precision_score
+                
+            self.pending_score_data = {
+                'level': self.level,
+                'time': self.total_time,
+                'score': score_to_save,
+                'game_mode': self.game_mode,
+                'is_game_over': True
+            }
+            self.state = "GAME_OVER"
+
+        # Timer Update
+        mode_config = GAME_MODES.get(self.game_mode, {})
+        if mode_config.get('timer_direction') == 'down':
+            self.timer -= dt_step
+            if self.timer <= 0:
+                self.timer = 0
+                self.on_game_over()
+                self.record_event(REPLAY_EVENT_GAME_OVER, 0, self.level)
+                
+                # Elimination Mode Logic: Time Out
+                if self.game_mode == 'elimination' and self.num_players == 2:
+                    # If time runs out, whoever didn't finish loses.
+                    # If both didn't finish, the one furthest from goal loses (closest wins).
+                    
+                    # Calculate current distances (caminho pelo labirinto, não em linha reta)
+                    dist1 = self.path_distance(self.ball.x, self.ball.y)
+                    dist2 = self.path_distance(self.ball2.x, self.ball2.y)
+                    
+                    # Calculate partial scores based on progress from start
+                    if not self.player1_finished:
+                        if hasattr(self, 'p1_start_dist') and self.p1_start_dist > 0 and dist1 < self.p1_start_dist:
+                            # Score based on % distance covered
+                            p1_partial = int(1000 * (self.p1_start_dist - dist1) / self.p1_start_dist)
+                            self.player1_score += p1_partial
+                        
+                    if not self.player2_finished:
+                        if hasattr(self, 'p2_start_dist') and self.p2_start_dist > 0 and dist2 < self.p2_start_dist:
+                            p2_partial = int(1000 * (self.p2_start_dist - dist2) / self.p2_start_dist)
+                            self.player2_score += p2_partial
+                    
+                    # Determine Winner based on scores (not just distance)
+                    if self.player1_finished and not self.player2_finished:
+                        self.winner = "Player 1"
+                    elif self.player2_finished and not self.player1_finished:
+                        self.winner = "Player 2"
+                    else:
+                        # Both failed to finish - winner is who has more points
+                        if self.player1_score > self.player2_score:
+                            self.winner = "Player 1"
+                        elif self.player2_score > self.player1_score:
+                            self.winner = "Player 2"
+                        else:
+                            self.winner = "Draw"
+                    
+                    self.state = "MP_WIN"
+                else:
+                    # Standard Game Over
+                    score_to_save = self.total_score if self.levels_completed > 0 else self.precision_score
+                    self.pending_score_data = {
+                        'level': self.level,
+                        'time': self.total_time,
+                        'score': score_to_save,
+                        'game_mode': self.game_mode,
+                        'is_game_over': True
+                    }
+                    self.state = "GAME_OVER"
+        else:
+            self.timer = self.sim_time - self.level_start_time
+
+        # Atualizar animações
+        if self.mine_hit_animation_time > 0:
+            if self.sim_time - self.mine_hit_animation_time > 0.5:
+                self.mine_hit_animation_time = 0
+
+        if prof:
+            prof.end()
+            prof.begin('check_win')
+
+        # Verificar vitória
+        self.check_win()
+
+        if prof:
+            prof.end()
+
+    def path_distance(self, x, y):
+        """Distância ao objetivo pelo labirinto (em pixels), a partir da célula que contém (x, y)"""
+        rows, cols = self.distance_field.shape
+        col = min(max(int((x - MAZE_MARGIN) // self.cell_size), 0), cols - 1)
+        row = min(max(int((y - MAZE_MARGIN_TOP) // self.cell_size), 0), rows - 1)
+        return int(self.distance_field[row, col]) * self.cell_size
+
+    def find_mine_hit(self, ball):
+        """Primeira mina em contacto com a bola (ou None)"""
+        for mine in self.mines:
+            distance = math.sqrt((ball.x - mine.x)**2 + (ball.y - mine.y)**2)
+            if distance < BALL_RADIUS + mine.size:
+                return mine
+        return None
+
+    def check_win(self):
+        """Verificar se a bola chegou ao objetivo (buraco)"""
+        # Evitar verificar se já estamos em estado de vitória
+        if self.state != "PLAYING":
+            return
+
+        # Helper for single player win logic (reuse existing code logic)
+        def process_level_complete(time_taken):
+            # Congelar a bola
+            self.ball.vx = 0
+            self.ball.vy = 0
+
+            # Calcular tempo do nível
+            self.total_time += time_taken
+            self.best_time = min(self.best_time, time_taken)
+            self.levels_completed += 1
+
+            # Calcular pontuação
+            mode_config = GAME_MODES.get(self.game_mode, {})
+            if mode_config.get('track_precision', False):
+                score = int(self.level * 1000 / max(0.1, time_taken)) + self.precision_score
+            else:
+                score = int(self.level * 1000 / max(0.1, time_taken))
+            
+            self.current_score = score
+            self.total_score += score
+            self.current_time = time_taken
+
+            # Adicionar tempo aleatório no modo eliminação
+            self.last_bonus_time = 0
+            if mode_config.get('random_time_on_level', False):
+                min_time = mode_config.get('random_time_min', 30)
+                max_time = mode_config.get('random_time_max', 80)
+                bonus_time = self.level_rng.randint(min_time, max_time)
+                self.timer += bonus_time
+                self.last_bonus_time = bonus_time
+
+            # Adicionar vida se alguma foi perdida
+            if self.lives < self.max_lives:
+                self.lives += 1
+
+            # Store data for name input
+            self.pending_score_data = {
+                'level': self.level,
+                'time': time_taken,
+                'score': self.total_score,
+                'game_mode': self.game_mode
+            }
+
+            # Avançar nível (Single Player Normal Mode is Infinite in existing code)
+            # But multiplayer Normal is 1 level.
+            if self.num_players == 2 and self.game_mode == 'normal':
+                self.state = "WIN" # End after 1 level
+            else:
+                self.level += 1
+                self.state = "WIN"
+
+        if self.num_players == 1:
+            dx = self.ball.x - self.goal_pos[0]
+            dy = self.ball.y - self.goal_pos[1]
+            distance = math.sqrt(dx*dx + dy*dy)
+
+            if distance < self.goal_radius:
+                # Toca o buzzer / som ao vencer
+                self.on_level_complete(1)
+                process_level_complete(self.sim_time - self.level_start_time)
+                self.record_event(REPLAY_EVENT_LEVEL_COMPLETE, 1, self.current_score)
+        else:
+            # Multiplayer
+            current_time = self.sim_time - self.level_start_time
+            
+            # Check P1
+            if not self.player1_finished:
+                dist1 = math.sqrt((self.ball.x - self.goal_pos[0])**2 + (self.ball.y - self.goal_pos[1])**2)
+                if dist1 < self.goal_radius:
+                    self.player1_finished = True
+                    self.player1_time = current_time
+                    # Calculate P1 score
+                    score = int(self.level * 1000 / max(0.1, current_time))
+                    self.player1_score += score
+                    
+                    # Buzzer / som para cada jogador que chega ao objetivo, em todos os modos
+                    # (process_level_complete só é usado com um jogador)
+                    self.on_level_complete(1)
+                    self.record_event(REPLAY_EVENT_LEVEL_COMPLETE, 1, score)
+                    # Freeze ball
+                    self.ball.vx = 0
+                    self.ball.vy = 0
+                    self.ball.x = -1000 # Move off screen
+
+            # Check P2
+            if not self.player2_finished:
+                dist2 = math.sqrt((self.ball2.x - self.goal_pos[0])**2 + (self.ball2.y - self.goal_pos[1])**2)
+                if dist2 < self.goal_radius:
+                    self.player2_finished = True
+                    self.player2_time = current_time
+                    # Calculate P2 score
+                    score = int(self.level * 1000 / max(0.1, current_time))
+                    self.player2_score += score
+                    
+                    self.on_level_complete(2)
+                    self.record_event(REPLAY_EVENT_LEVEL_COMPLETE, 2, score)
+                    # Freeze ball
+                    self.ball2.vx = 0
+                    self.ball2.vy = 0
+                    self.ball2.x = -1000 # Move off screen
+            
+            # Check conditions
+            if self.player1_finished and self.player2_finished:
+                # Both finished
+                if self.game_mode == 'normal':
+                    # Set current stats for WIN screen
+                    self.current_time = max(self.player1_time, self.player2_time)
+                    
+                    # Determine Winner based on time
+                    if self.player1_time < self.player2_time:
+                        self.winner = "Player 1"
+                    elif self.player2_time < self.player1_time:
+                        self.winner = "Player 2"
+                    else:
+                        self.winner = "Draw"
+                        
+                    # Score calculation for MP (basic implementation)
+                    mode_config = GAME_MODES.get(self.game_mode, {})
+                    score = int(self.level * 1000 / max(0.1, self.current_time))
+                    self.current_score = score
+                    self.total_score += score
+                    self.levels_completed += 1
+                    self.total_time += self.current_time
+                    
+                    self.state = "MP_WIN" # End Game on special screen
+                else:
+                    # Minefield / Elimination - Continue to next level
+                    self.level += 1
+                    
+                    # Add bonus time or Reset Time
+                    mode_config = GAME_MODES.get(self.game_mode, {})
+                    if self.game_mode == 'elimination':
+                        # Reset to random time
+                        self.timer = self.level_rng.randint(30, 80)
+                    elif mode_config.get('random_time_on_level', False):
+                         bonus = self.level_rng.randint(30, 80)
+                         self.timer += bonus
+                         
+                    self.init_level()
+                    # Reset finished flags
+                    self.player1_finished = False
+                    self.player2_finished = False
+
+    def force_finish_mp_game(self):
+        """Force finish the MP game if one player is waiting"""
+        if self.recorder:
+            self.recorder.action(REPLAY_ACTION_FORCE_FINISH)
+        current_time = self.sim_time - self.level_start_time
+        
+        if self.player1_finished and not self.player2_finished:
+            self.player2_finished = True
+            self.player2_time = current_time + 10 # Penalty
+            # Stop ball
+            if self.ball2:
+                self.ball2.vx = 0
+                self.ball2.vy = 0
+            
+        elif self.player2_finished and not self.player1_finished:
+            self.player1_finished = True
+            self.player1_time = current_time + 10
+            # Stop ball
+            self.ball.vx = 0
+            self.ball.vy = 0
+            
+        # The main loop will check 'if p1_finished and p2_finished' in the next frame and trigger win
+
+    def restart_level(self):
+        """Recomeçar o nível atual (tecla R)"""
+        if self.recorder:
+            self.recorder.action(REPLAY_ACTION_RESTART_LEVEL)
+        self.init_level()
+
+    def continue_level(self):
+        """Passar ao nível seguinte a partir do ecrã de vitória (já incrementado em check_win)"""
+        if self.recorder:
+            self.recorder.action(REPLAY_ACTION_NEXT_LEVEL)
+        self.init_level()
+        self.state = "PLAYING"
+
+    def apply_action(self, code):
+        """Repetir uma ação gravada num replay"""
+        if code == REPLAY_ACTION_RESTART_LEVEL:
+            self.restart_level()
+        elif code == REPLAY_ACTION_NEXT_LEVEL:
+            self.continue_level()
+        elif code == REPLAY_ACTION_FORCE_FINISH:
+            self.force_finish_mp_game()
+        else:
+            raise ValueError(f"Ação de replay desconhecida: {code}")
+
+    def record_event(self, kind, player=0, value=0):
+        self.event_log.append((kind, player, value))
+        if self.recorder:
+            self.recorder.event(kind, player, value)
+
+    def replay_header(self):
+        """Tudo o que é preciso para voltar a simular este jogo (além dos inputs)"""
+        return {
+            'seed': self.session_seed,
+            'game_mode': self.game_mode,
+            'difficulty': self.difficulty,
+            'num_players': self.num_players,
+            'sensitivity': self.sensitivity,
+            'difficulty_band': list(self.difficulty_band) if self.difficulty_band else None,
+            'world': [self.world_width, self.world_height],
+            'input_scale': REPLAY_INPUT_SCALE,
+            'physics_dt': PHYSICS_DT,
+            'maze_version': MAZE_CACHE_VERSION,
+            'date': datetime.now().isoformat(timespec='seconds')
+        }
+
+    def replay_summary(self):
+        """Resultado do jogo (guardado no fim do replay e comparado ao reproduzi-lo)"""
+        return {
+            'ticks': self.tick_count,
+            'level': self.level,
+            'levels_completed': self.levels_completed,
+            'total_score': self.total_score,
+            'total_time': self.total_time,
+            'lives': self.lives,
+            'player1_score': self.player1_score,
+            'player2_score': self.player2_score,
+            'winner': self.winner
+        }
+
+    def save_replay(self, path=None, directory=REPLAY_DIR):
+        """Guardar o jogo gravado (se houver) e parar a gravação; devolve o caminho do ficheiro.
+
+        Sem path, o ficheiro fica em directory com a data, o modo e a seed no nome; só os
+        replays soltos de REPLAY_DIR contam para o limite replay_keep."""
+        recorder, self.recorder = self.recorder, None
+        if recorder is None or not recorder.ticks:
+            return None
+        prune = path is None and directory == REPLAY_DIR
+        if path is None:
+            filename = f"{datetime.now():%Y%m%d_%H%M%S}_{self.game_mode}_{recorder.header['seed']}.gmr"
+            path = os.path.join(directory, filename)
+        try:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            with open(path, 'wb') as f:
+                f.write(recorder.finish(self.replay_summary()))
+        except OSError as e:
+            print(f"Erro ao guardar replay: {e}")
+            return None
+        if prune:
+            referenced = self.referenced_replays()
+            if referenced is not None:
+                prune_replays(REPLAY_DIR, self.replay_keep, referenced)
+        return path
+
+    def referenced_replays(self):
+        """Replays que não podem ser apagados (None = não se sabe: não apagar nenhum)"""
+        return ()
+
+    def run_headless(self, controller=None, dt=1.0 / FPS, max_frames=FPS * 600, max_levels=None):
+        """Correr o jogo sem janela, tão rápido quanto possível.
+
+        controller(sim) devolve (accel1, accel2) em cada frame (None = sem input). Termina em
+        game over, ao fim de max_levels níveis ou de max_frames frames; devolve os frames corridos."""
+        if self.state not in ("PLAYING", "WIN"):
+            self.start_game()
+        frames = 0
+        while frames < max_frames:
+            if self.state == "WIN":
+                if max_levels is not None and self.levels_completed >= max_levels:
+                    break
+                self.continue_level()
+            elif self.state != "PLAYING":
+                break
+            if controller:
+                accel1, accel2 = controller(self)
+                self.step(dt, accel1, accel2)
+            else:
+                self.step(dt)
+            frames += 1
+        return frames
+
+    # Hooks de efeitos (som, buzzer do STM32); o Game implementa-os, a simulação ignora-os
+
+    def on_wall_collision(self, player, impact_speed):
+        pass
+
+    def on_mine_hit(self, player):
+        pass
+
+    def on_level_complete(self, player):
+        pass
+
+    def on_game_over(self):
+        pass
+
+def random_tilt_controller(seed=None, hold_frames=20):
+    """Input sintético para a simulação: inclinações aleatórias mantidas durante hold_frames frames"""
+    rng = random.Random(seed)
+    state = {'frame': 0, 'accel': ((0, 0), (0, 0))}
+
+    def controller(sim):
+        if state['frame'] % hold_frames == 0:
+            state['accel'] = tuple((rng.uniform(-1, 1), rng.uniform(-1, 1)) for _ in range(2))
+        state['frame'] += 1
+        return state['accel']
+
+    return controller
+
+def verify_replay_score(entry, replay_root='.'):
+    """Re-simular o replay de uma pontuação e comparar com o que foi guardado.
+
+    entry é uma linha de Database.get_scores_to_verify; devolve (id, ok, motivo), com ok
+    None se o replay não puder ser verificado (ficheiro em falta, ilegível ou gravado por
+    outra versão do jogo): isso não quer dizer que a pontuação foi adulterada. Corre num
+    processo do pool de verify_scores, por isso só recebe e devolve dados simples."""
+    score_id, _, level, time_taken, score, game_mode, replay_path = entry
+    if not os.path.isabs(replay_path):
+        replay_path = os.path.join(replay_root, replay_path)
+    try:
+        replay = Replay.open(replay_path)
+    except (OSError, ValueError) as e:
+        return score_id, None, f"replay ilegível: {e}"
+
+    try:
+        header = replay.header
+        sim = Simulation(world_width=header['world'][0], world_height=header['world'][1])
+        player = ReplayPlayer(replay, sim)
+        player.start()
+    except (ValueError, KeyError, TypeError, IndexError) as e:
+        replay.close()
+        return score_id, None, f"replay não verificável: {e}"
+
+    try:
+        player.advance()
+    except Exception as e:
+        # Qualquer erro num ficheiro adulterado falha esta pontuação sem parar as restantes
+        return score_id, False, f"replay inválido: {e}"
+    finally:
+        replay.close()
+
+    # O resultado vem da simulação, não do resumo guardado no ficheiro
+    problems = list(player.mismatches)
+    result = sim.pending_score_data
+    if result is None:
+        problems.append("o jogo reproduzido não termina com uma pontuação")
+    else:
+        if result['game_mode'] != game_mode:
+            problems.append(f"modo: guardado {game_mode}, replay {result['game_mode']}")
+        if result['level'] != level:
+            problems.append(f"nível: guardado {level}, replay {result['level']}")
+        if result['score'] != score:
+            problems.append(f"pontuação: guardada {score}, replay {result['score']}")
+        if abs(result['time'] - time_taken) > 1e-6:
+            problems.append(f"tempo: guardado {time_taken:.3f}s, replay {result['time']:.3f}s")
+    return score_id, not problems, "; ".join(problems)
+
+
+def verify_scores(entries, replay_root='.', workers=None, chunksize=1, executor=None):
+    """Verificar várias pontuações em paralelo (um processo por núcleo); devolve os resultados por ordem.
+
+    executor: pool já criado (de preferência antes de arrancar threads); por omissão cria um."""
+    if executor is not None:
+        return list(executor.map(verify_replay_score, entries,
+                                 [replay_root] * len(entries), chunksize=chunksize))
+    if workers == 1:
+        return [verify_replay_score(entry, replay_root) for entry in entries]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return verify_scores(entries, replay_root, chunksize=chunksize, executor=executor)
+
+class MazeBot:
+    """Jogador automático para testes de longa duração e de carga.
+
+    Cada bola segue o campo de distâncias até ao objetivo com um controlador PD: alinha-se
+    com o centro do corredor e avança para o centro da célula seguinte. Devolve inclinações
+    em g (como o acelerómetro), por isso serve de controller para run_headless e de input
+    no Game, para um ou dois jogadores."""
+
+    STEPS = ((-1, 0), (0, 1), (1, 0), (0, -1))  # [top, right, bottom, left]
+
+    def __init__(self, kp=BOT_KP, kd=BOT_KD):
+        self.kp = kp
+        self.kd = kd
+
+    def __call__(self, sim):
+        accel1 = (0, 0) if sim.player1_finished else self.control(sim, sim.ball)
+        accel2 = (0, 0)
+        if sim.num_players == 2 and sim.ball2 and not sim.player2_finished:
+            accel2 = self.control(sim, sim.ball2)
+        return accel1, accel2
+
+    def control(self, sim, ball):
+        cell = sim.cell_size
+        rows, cols = sim.distance_field.shape
+        col = min(max(int((ball.x - MAZE_MARGIN) // cell), 0), cols - 1)
+        row = min(max(int((ball.y - MAZE_MARGIN_TOP) // cell), 0), rows - 1)
+        distance = sim.distance_field[row, col]
+
+        center_x = MAZE_MARGIN + col * cell + cell / 2
+        center_y = MAZE_MARGIN_TOP + row * cell + cell / 2
+        if distance <= 0:
+            target_x, target_y = sim.goal_pos
+        else:
+            side = self.next_side(sim, row, col)
+            dr, dc = self.STEPS[side]
+            # Alvo: a última célula do troço reto à frente (trava antes da curva seguinte)
+            run = 1
+            while (distance - run > 0 and run < cols + rows
+                   and self.next_side(sim, row + dr * run, col + dc * run) == side):
+                run += 1
+            # Avançar ao longo do corredor mantendo-se no centro dele (evita as esquinas)
+            if dc:
+                target_x, target_y = center_x + dc * cell * run, center_y
+                off_axis = abs(ball.y - center_y)
+            else:
+                target_x, target_y = center_x, center_y + dr * cell * run
+                off_axis = abs(ball.x - center_x)
+            # Enquanto estiver desalinhada, a bola avança mais devagar
+            forward = max(0.2, 1 - off_axis / (cell * 0.3))
+            if dc:
+                target_x = ball.x + (target_x - ball.x) * forward
+            else:
+                target_y = ball.y + (target_y - ball.y) * forward
+
+        ax = self.kp * (target_x - ball.x) - self.kd * ball.vx
+        ay = self.kp * (target_y - ball.y) - self.kd * ball.vy
+        return max(-1.0, min(1.0, ax)), max(-1.0, min(1.0, ay))
+
+    def next_side(self, sim, row, col):
+        """Lado [top, right, bottom, left] por onde se sai da célula em direção ao objetivo"""
+        distance = sim.distance_field[row, col]
+        for side, (dr, dc) in enumerate(self.STEPS):
+            if sim.open_sides[row, col] >> side & 1 and sim.distance_field[row + dr, col + dc] == distance - 1:
+                return side
+        return None
+
+class Scene:
+    """Um ecrã do jogo (entrada de Game.scenes): eventos, atualização e desenho de um estado.
+
+    back é o estado para onde o ESC volta (ou uma função a chamar); hover devolve os rects
+    (coordenadas do mundo) que mostram o cursor de mão. on_enter / on_exit são chamados
+    quando o jogo entra / sai do estado. Uma cena não animada só é redesenhada depois de
+    input, de uma mudança de hover ou de estado, ou a cada `refresh` segundos (dados que
+    mudam em segundo plano, como as portas STM32 detetadas)."""
+
+    animated = False  # Redesenhar em todos os frames
+
+    def __init__(self, game, handle_event=None, draw=None, back=None, hover=None, refresh=None):
+        self.game = game
+        self.handle_event = handle_event
+        self.draw_handler = draw
+        self.back = back
+        self.hover = hover
+        self.refresh = refresh
+        self.hit_grid = None  # HitGrid dos hover_rects (refeita depois de cada redesenho)
+
+    def on_enter(self):
+        pass
+
+    def on_exit(self):
+        pass
+
+    def on_event(self, event):
+        if self.handle_event:
+            self.handle_event(event)
+
+    def on_escape(self):
+        if callable(self.back):
+            self.back()
+        elif self.back:
+            self.game.state = self.back
+
+    def is_animated(self):
+        return self.animated
+
+    def update(self, dt):
+        pass
+
+    def draw(self):
+        self.draw_handler()
+
+    def hover_rects(self):
+        return self.hover() if self.hover else ()
+
+    def invalidate_layout(self):
+        self.hit_grid = None
+
+    def hit_test(self, x, y):
+        """Índice (em hover_rects) do elemento em (x, y), ou None"""
+        if self.hover is None:
+            return None
+        if self.hit_grid is None:
+            self.hit_grid = HitGrid(self.hover_rects())
+        return self.hit_grid.find(x, y)
+
+
+class PlayingScene(Scene):
+    """Jogo a decorrer: input (STM32, teclado, bot ou replay) e Simulation.step"""
+
+    animated = True
+
+    def on_event(self, event):
+        game = self.game
+        if event.type != pygame.KEYDOWN or game.replay_player:
+            return
+        if event.key == pygame.K_r:
+            game.restart_level()
+        elif event.key == pygame.K_t:
+            # Force Finish in MP Normal Mode
+            if game.num_players == 2 and game.game_mode == 'normal':
+                if game.player1_finished or game.player2_finished:
+                    game.force_finish_mp_game()
+
+    def on_escape(self):
+        self.game.pause_game()
+
+    def update(self, dt):
+        game = self.game
+        if game.replay_player:
+            # A ver um replay: os inputs vêm do ficheiro
+            game.advance_replay(dt)
+            return
+        prof = game.profiler if game.profiler.enabled else None
+
+        # Ler dados
+        if prof:
+            prof.begin('input')
+        game.read_serial()
+        game.handle_keyboard()
+        if game.bot:
+            (game.accel_x, game.accel_y), (game.accel2_x, game.accel2_y) = game.bot(game)
+        if prof:
+            prof.end()
+
+        # Física, minas, temporizador e vitória (Simulation.step)
+        game.step(dt,
+                  (game.accel_x + game.keyboard_accel_x, game.accel_y + game.keyboard_accel_y),
+                  (game.accel2_x + game.keyboard2_accel_x, game.accel2_y + game.keyboard2_accel_y))
+
+
+class PausedScene(Scene):
+    """Pausa: o jogo congelado e o overlay escuro são desenhados uma vez, à entrada"""
+
+    def on_enter(self):
+        self.game.pause_background = self.game.render_pause_background()
+
+    def on_exit(self):
+        self.game.pause_background = None
+
+    def on_escape(self):
+        self.game.resume_game()
+
+
+class ResultScene(Scene):
+    """Vitória / game over / fim do multijogador; com o bot (ou num replay) avança sozinho"""
+
+    def is_animated(self):
+        return bool(self.game.bot or self.game.replay_player)
+
+    def update(self, dt):
+        game = self.game
+        if game.replay_player:
+            if game.state == "WIN":
+                game.advance_replay(dt)
+        elif game.bot:
+            # Bot: seguir para o nível seguinte / recomeçar sem esperar pelos botões
+            if game.state == "WIN":
+                game.continue_level()
+            else:
+                game.start_game()
+
+
+class Game(Simulation):
+    def __init__(self):
+        self.init_start = time.perf_counter()
+
+        # Configurações persistentes
+        self.config = Config()
+
+        # Banda de dificuldade: os candidatos são gerados num pool de processos, criado antes
+        # de qualquer thread (áudio do SDL, serial, sincronização, pré-carregamento) para os
+        # processos não serem copiados (fork) com locks de outras threads
+        band = self.config.get('maze_difficulty_band')
+        maze_executor = None
+        if band:
+            from concurrent.futures import ProcessPoolExecutor
+            maze_executor = ProcessPoolExecutor()
+            maze_executor.submit(int)  # Arrancar já os processos
+
+        pygame.init()
+        pygame.mixer.init(frequency=22050, size=-16, channels=2, buffer=512)
+
+        # Set window icon BEFORE set_mode to avoid SetProp errors
+        try:
+            # Prefer PNG for Pygame compatibility
+            icon_path = "icon.png"
+            if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
+                icon_path = os.path.join(sys._MEIPASS, 'icon.png')
+            
+            # Fallback to ICO if PNG not found
+            if not os.path.exists(icon_path):
+                icon_path = "icon.ico"
+                if getattr(sys, 'frozen', False) and hasattr(sys, '_MEIPASS'):
+                    icon_path = os.path.join(sys._MEIPASS, 'icon.ico')
+
+            if os.path.exists(icon_path):
+                icon_surface = pygame.image.load(icon_path)
+                # Scale to 32x32 to prevent potential memory errors with large icons
+                icon_surface = pygame.transform.scale(icon_surface, (32, 32))
+                pygame.display.set_icon(icon_surface)
+        except Exception as e:
+            print(f"Warning: Could not set window icon: {e}")
+
+        # Dimensões da janela (redimensionável)
+        self.window_width = DEFAULT_WIDTH
+        self.window_height = DEFAULT_HEIGHT
+        self.view_size = None  # Tamanho da janela para o qual view_transform foi calculado
+        self.view_transform = None  # (scale, offset_x, offset_y)
+        
+        # Try to set mode, fallback if SetProp fails (common on Windows)
+        try:
+            self.screen = pygame.display.set_mode(
+                (self.window_width, self.window_height),
+                pygame.RESIZABLE
+            )
+        except pygame.error as e:
+            print(f"Warning: Failed to set RESIZABLE mode ({e}). Retrying without it.")
+            try:
+                self.screen = pygame.display.set_mode(
+                    (self.window_width, self.window_height)
+                )
             except pygame.error as e2:
                 print(f"Critical Error: Failed to set video mode: {e2}")
                 raise e2
@@ -1308,8 +4408,10 @@ class Game:
         self.clock = pygame.time.Clock()
 
         # Dimensões virtuais do mundo do jogo (fixas)
-        self.world_width = DEFAULT_WIDTH
-        self.world_height = DEFAULT_HEIGHT
+        super().__init__(world_width=DEFAULT_WIDTH, world_height=DEFAULT_HEIGHT,
+                         maze_cache=MazeCache(disk_dir=self.config.get('maze_cache_dir') or None,
+                                              executor=maze_executor))
+        self.difficulty_band = tuple(band) if band else None
 
         # Surface virtual para renderizar o jogo
         self.world_surface = pygame.Surface((self.world_width, self.world_height))
@@ -1318,38 +4420,53 @@ class Game:
         self.title_font = pygame.font.Font(None, 96)
         self.font = pygame.font.Font(None, 48)
         self.small_font = pygame.font.Font(None, 32)
-
-        # Configurações persistentes
-        self.config = Config()
+        self.profiler_font = pygame.font.Font(None, 20)
 
         # Volume control (0.0 to 1.0)
         self.game_volume = self.config.get('game_volume')
 
-        # Generate game sounds
-        try:
-            self.sound_level_complete = generate_level_complete_sound()
-            self.sound_mine_hit = generate_mine_hit_sound()
-            self.sound_game_over = generate_game_over_sound()
-            self.sound_wall_collision = generate_wall_collision_sound()
-
-            # Set initial volumes
-            self.sound_level_complete.set_volume(self.game_volume)
-            self.sound_mine_hit.set_volume(self.game_volume)
-            self.sound_game_over.set_volume(self.game_volume)
-            self.sound_wall_collision.set_volume(self.game_volume * 0.3)  # Wall collision is quieter
-        except Exception as e:
-            print(f"Warning: Could not generate sounds: {e}")
-            self.sound_level_complete = None
-            self.sound_mine_hit = None
-            self.sound_game_over = None
-            self.sound_wall_collision = None
+        # Surfaces em cache (sprites, camada estática dos níveis, texto do HUD) com orçamento de memória
+        self.surface_cache = SurfaceCache(self.config.get('surface_cache_mb') * 2**20)
+
+        # Profiler de frames (overlay com F3, trace com F4)
+        self.profiler = FrameProfiler(enabled=self.config.get('show_profiler'))
+        self.profiler.surface_cache = self.surface_cache
+        self.sprite_atlas = None  # SpriteAtlas (bolas, corações, indicador), criado por sprites()
+
+        # Próximo nível (labirinto + camada estática) preparado em segundo plano
+        self.level_preloader = LevelPreloader(self.prepare_level)
+        self.level_layout = None
+        self.level_layer_key = None
 
-        # Base de dados
-        self.db = Database()
+        # Bot (MazeBot) a substituir o acelerómetro/teclado (testes de longa duração)
+        self.bot = None
+
+        # Replays: gravar cada jogo; replay_player != None enquanto se vê um replay
+        self.record_replays = self.config.get('record_replays')
+        self.replay_keep = self.config.get('replay_keep')
+        self.replay_player = None
+        self.replay_speed = 1.0
+
+        # Game sounds: gerados na primeira vez que são pedidos (e guardados em disco), tocados
+        # pelo AudioEngine em canais reservados
+        self.sounds = SoundBank(self.config.get('sound_cache_dir') or None, self.game_volume)
+        self.audio = AudioEngine(self.sounds)
+        self.music = MusicPlayer(self.audio.pools['music'][0] if 'music' in self.audio.pools else None,
+                                 self.game_volume if self.config.get('music') else 0)
+
+        # Base de dados: aberta (e migrada) depois do primeiro frame, ou no primeiro acesso a self.db
+        self.database = None
+
+        # Sincronização da leaderboard com outros quiosques (opcional)
+        self.sync_client = None
+        if self.config.get('sync_url'):
+            self.sync_client = LeaderboardSyncClient(self.config.get('sync_url'), self.config.get('kiosk_id') or None)
+            self.sync_client.start()
 
         # Serial
         self.serial_port = None
         self.serial_connected = False
+        self.serial_lock = threading.Lock()  # Uma ligação de cada vez (thread de scan / thread principal)
 
         # Dados do acelerómetro
         self.accel_x = 0
@@ -1366,96 +4483,113 @@ class Game:
         self.keyboard2_accel_x = 0
         self.keyboard2_accel_y = 0
 
-        # Configurações (carregar do arquivo)
-        self.sensitivity = self.config.get('sensitivity')
-        self.invert_x = self.config.get('invert_x')
-        self.invert_y = self.config.get('invert_y')
-        self.swap_xy = self.config.get('swap_xy')
-        self.language = self.config.get('language')
-
-        # Modo de jogo
-        self.game_mode = 'normal'  # normal, minefield, timeattack, elimination
-        self.difficulty = 'normal' # easy, normal, hard
-        self.num_players = 1 # 1 or 2
-        self.ball2 = None
-        self.player1_finished = False
-        self.player2_finished = False
-        self.player1_time = 0
-        self.player2_time = 0
-        self.player1_score = 0
-        self.player2_score = 0
-        self.player1_lives = 0
-        self.player2_lives = 0
-        self.winner = None # "Player 1", "Player 2" or None
+        # Configurações (carregar do arquivo)
+        self.sensitivity = self.config.get('sensitivity')
+        self.invert_x = self.config.get('invert_x')
+        self.invert_y = self.config.get('invert_y')
+        self.swap_xy = self.config.get('swap_xy')
+        self.language = self.config.get('language')
+
+        # Portas STM32 (modo de jogo, vidas, etc. vêm de Simulation)
         self.stm32_ports = [] # List of connected STM32 ports
         self.p1_port_index = -1
         self.p2_port_index = -1
 
 
-        # Sistema de vidas
-        self.lives = 5
-        self.max_lives = 5
+        # Animação de vida perdida
         self.life_lost_animation_time = 0
-        self.mine_hit_animation_time = 0
-
-        # Sistema de precisão (modo normal)
-        self.precision_score = 0
-        self.wall_collisions = 0
-        self.collision_pause_time = 0
-        self.last_precision_update = 0
-
-        # Lista de minas no labirinto atual
-        self.mines = []
 
         # Estado do jogo
         self.state = "MENU"  # MENU, SETTINGS, PLAYING, PAUSED, WIN, LEADERBOARD, MODE_SELECT, NAME_INPUT, GAME_OVER, PLAYER_PROFILE, DIFFICULTY_SELECT, STM32_SETUP, CONTROLS
         self.running = True
         self.pending_score_data = None  # Store score data until name is entered
         self.selected_player_name = None  # For player profile view
-        self.level = 1
-        self.timer = 0
         self.player_name = "Player"
 
         # Leaderboard filter
         self.leaderboard_filter = None  # None = all modes
 
-        # Estatísticas
-        self.total_time = 0
-        self.best_time = float('inf')
-        self.levels_completed = 0
+        # Janela da leaderboard carregada por páginas (keyset) à medida que se faz scroll
+        self.leaderboard_rows = []
+        self.leaderboard_first_rank = 1  # Posição da primeira linha carregada
+        self.leaderboard_scroll = 0  # Índice (em leaderboard_rows) da primeira linha visível
+        self.leaderboard_at_start = True
+        self.leaderboard_at_end = False
+        self.leaderboard_highlight_id = None  # Entrada do jogador após "Ir para mim"
+        self.leaderboard_global = False  # Top global (cache da sincronização) em vez do local
 
         # Controlo de input para prevenir múltiplas alternâncias
         self.last_esc_time = 0
         self.esc_cooldown = 0.3  # segundos
 
-        # Controlo de beeps para colisões
-        self.last_beep_time = 0
-
         # Armazenar velocidade da bola quando pausado
         self.paused_vx = 0
         self.paused_vy = 0
 
-        # Controlo de redesenho do menu de pausa
-        self.pause_menu_dirty = True
-        
+        # Redesenho dos ecrãs estáticos (input, hover, mudança de estado ou refresh da cena)
+        self.needs_redraw = True
+        self.last_redraw = 0
+
         # Cursor state
         self.cursor_hand_active = False
+        self.hover_index = None  # Índice (em Scene.hover_rects) do elemento debaixo do rato
+        self.mouse_world_pos = (-1, -1)  # Última posição do rato (coordenadas do mundo)
 
-        # Criar menus
+        # Criar menus e o registo de cenas (um Scene por estado)
         self.create_menus()
+        self.pause_background = None
+        self.scenes = self.create_scenes()
+        self.scene_state = None  # Estado da cena ativa (on_enter / on_exit quando muda)
 
-        # Tentar conectar ao serial automaticamente
-        self.connect_serial()
-        
-        # Iniciar thread de scan em background
+        # Ligação ao STM32 e scan de portas em background (a procura de portas pode demorar segundos)
         self.scan_thread = threading.Thread(target=self.serial_scan_loop, daemon=True)
         self.scan_thread.start()
 
-        # Inicializar jogo
-        self.init_level()
+        # Arranque por fases: o menu aparece já; o resto é feito um passo por frame depois do
+        # primeiro frame (o primeiro labirinto só é gerado em start_game)
+        self.startup_tasks = deque([lambda: self.db, self.sprites])
+        if self.game_volume > 0:
+            self.queue_sound_preload()
+        self.startup_marks = [('imports', self.init_start), ('Game()', time.perf_counter())]
+        self.first_frame_done = False
+        self.startup_done = False
+
+    @property
+    def db(self):
+        if self.database is None:
+            self.database = Database()
+        return self.database
+
+    def queue_sound_preload(self):
+        """Gerar as variantes dos efeitos que ainda faltam, uma por frame (sem som não são
+        geradas no arranque, por isso também é chamado quando o volume deixa de ser 0)"""
+        self.startup_tasks.extend(lambda variant=variant: self.audio.preload(*variant)
+                                  for variant in self.sounds.variants() if variant not in self.sounds.sounds)
+
+    def run_startup_task(self):
+        """Próxima tarefa adiada do arranque; no primeiro frame regista o tempo até aqui"""
+        if not self.first_frame_done:
+            self.first_frame_done = True
+            self.startup_marks.append(('primeiro frame', time.perf_counter()))
+            stages = []
+            previous = STARTUP_TIME
+            for name, mark in self.startup_marks:
+                stages.append(f"{name} {(mark - previous) * 1000:.0f} ms")
+                previous = mark
+            print(f"Arranque: primeiro frame em {(previous - STARTUP_TIME) * 1000:.0f} ms ({', '.join(stages)})")
+        elif self.startup_tasks:
+            self.startup_tasks.popleft()()
+            if not self.startup_tasks and not self.startup_done:
+                self.startup_done = True
+                print(f"Arranque completo em {(time.perf_counter() - STARTUP_TIME) * 1000:.0f} ms")
 
     def serial_scan_loop(self):
-        """Background thread to scan for STM32 ports continuously"""
+        """Background thread: ligação inicial ao STM32 e depois scan contínuo das portas"""
+        try:
+            self.connect_serial()
+        except Exception as e:
+            print(f"Error connecting to serial: {e}")
+        time.sleep(2)
         while self.running:
             try:
                 ports = self.scan_stm32_ports()
@@ -1500,6 +4634,130 @@ class Game:
         mine_thread = threading.Thread(target=mine_async, daemon=True)
         mine_thread.start()
 
+    def prepare_level(self, params):
+        """Labirinto e camada estática de um nível (corre na thread do LevelPreloader)"""
+        layout = self.maze_cache.get(*params, band=self.difficulty_band)
+        return layout, self.render_static_layer(layout)
+
+    def load_layout(self, params):
+        """Usar o nível pré-gerado se estiver pronto; senão gerar agora"""
+        key = ('static_layer', params)
+        if key == self.level_layer_key:
+            # Reiniciar o mesmo nível: reutilizar a camada estática (static_layer redesenha-a
+            # se tiver saído da cache)
+            return self.level_layout
+        prepared = self.level_preloader.take(params)
+        if prepared is None:
+            prepared = self.prepare_level(params)
+        layout, static_layer = prepared
+        # Camada estática na SurfaceCache (conta para o orçamento); a do nível anterior já não
+        # volta a ser usada
+        self.surface_cache.discard(self.level_layer_key)
+        self.level_layout = layout
+        self.level_layer_key = key
+        self.surface_cache.put(key, static_layer)
+        return layout
+
+    def sprites(self):
+        """SpriteAtlas do jogo (desenhado uma vez; conta para o orçamento da SurfaceCache)"""
+        if self.sprite_atlas is None:
+            self.sprite_atlas = render_sprite_atlas()
+            self.surface_cache.pin('sprite_atlas', self.sprite_atlas.surface)
+        return self.sprite_atlas
+
+    def static_layer(self):
+        """Camada estática do nível atual (redesenhada se tiver saído da cache)"""
+        return self.surface_cache.get(self.level_layer_key, self.render_static_layer, self.level_layout)
+
+    def init_level(self):
+        super().init_level()
+        # Preparar já o nível seguinte enquanto este é jogado
+        self.level_preloader.request(self.level_params(self.level + 1))
+
+    def render_static_layer(self, layout):
+        """Fundo, paredes e objetivo de um nível numa surface (desenhada uma vez por nível)"""
+        surface = pygame.Surface((self.world_width, self.world_height))
+        surface.fill(BLACK)
+
+        # Desenhar paredes - Inflate by 1px to fix seams
+        for wall in layout['walls']:
+            # Sombra
+            shadow_rect = pygame.Rect(wall[0] + 2, wall[1] + 2, wall[2], wall[3])
+            pygame.draw.rect(surface, DARK_GRAY, shadow_rect)
+
+            # Parede - Inflate to fix seams
+            pygame.draw.rect(surface, WALL_COLOR, pygame.Rect(wall).inflate(1, 1))
+
+        # Desenhar objetivo como buraco verde com efeito
+        goal_pos = layout['goal']
+        goal_radius = min(30, int(layout['cell_size'] * 0.4))
+        for i in range(3):
+            radius = goal_radius - i * 8
+            color_intensity = 255 - i * 60
+            color = (0, color_intensity, 0)
+            pygame.draw.circle(surface, color, goal_pos, radius)
+
+        # Círculo interno escuro (buraco)
+        pygame.draw.circle(surface, DARK_GREEN, goal_pos, goal_radius // 2)
+        return surface
+
+    def start_game(self, seed=None):
+        """Iniciar jogo com modo selecionado"""
+        if not self.serial_connected:
+            self.connect_serial(reconnect=False)
+        if seed is None and self.config.get('daily_challenge'):
+            seed = daily_seed()
+        self.save_replay()
+        self.replay_player = None
+        super().start_game(seed)
+
+    def referenced_replays(self):
+        """Replays das pontuações da leaderboard (ficam mesmo acima do limite replay_keep)"""
+        try:
+            return self.db.get_replay_paths()
+        except sqlite3.Error as e:
+            print(f"Erro ao ler os replays da leaderboard: {e}")
+            return None
+
+    def watch_replay(self, replay, speed=1.0):
+        """Ver um replay no ecrã (os inputs do jogador são ignorados até ao fim)"""
+        player = ReplayPlayer(replay, self)
+        player.start()
+        self.replay_player = player
+        self.replay_speed = speed
+
+    def finish_replay(self):
+        """Fim do replay: não deixar guardar a pontuação nem continuar o jogo reproduzido"""
+        for mismatch in self.replay_player.mismatches:
+            print(f"Replay diferente do gravado: {mismatch}")
+        self.replay_player = None
+        self.pending_score_data = None
+        if self.state not in ("GAME_OVER", "MP_WIN"):
+            self.state = "MENU"
+
+    def music_tempo(self):
+        """Andamento da música: acelera nos últimos segundos quando o tempo conta para baixo"""
+        if GAME_MODES.get(self.game_mode, {}).get('timer_direction') != 'down':
+            return MUSIC_BPM
+        urgency = min(1.0, max(0.0, 1 - self.timer / MUSIC_URGENT_TIME))
+        return MUSIC_BPM * (1 + MUSIC_TEMPO_BOOST * urgency)
+
+    def on_wall_collision(self, player, impact_speed):
+        # Bola encostada / a deslizar na parede: sem som; volume pela velocidade do impacto
+        if impact_speed >= SOUND_IMPACT_MIN_SPEED:
+            self.audio.play('wall_collision', player, impact_speed / SOUND_IMPACT_FULL_SPEED)
+
+    def on_mine_hit(self, player):
+        self.send_mine_command()
+        self.audio.play('mine_hit', player)
+
+    def on_level_complete(self, player):
+        self.send_beep_command()
+        self.audio.play('level_complete', player)
+
+    def on_game_over(self):
+        self.audio.play('game_over')
+
     def create_stm32_setup_buttons(self):
         """Criar botões para configuração STM32"""
         center_x = self.world_width // 2
@@ -1512,17 +4770,12 @@ class Game:
             Button(center_x - button_width // 2, 600, button_width, button_height, t('continue', self.language), DARK_GREEN),
             Button(center_x - button_width // 2, 670, button_width, button_height, t('back', self.language), GRAY),
         ]
+        self.apply_language()
 
     def draw_stm32_setup(self):
         """Desenhar tela de configuração STM32"""
         self.world_surface.fill(BLACK)
         
-        # Update texts
-        self.stm32_setup_buttons[0].text = t('beep_1', self.language)
-        self.stm32_setup_buttons[1].text = t('beep_2', self.language)
-        self.stm32_setup_buttons[2].text = t('continue', self.language)
-        self.stm32_setup_buttons[3].text = t('back', self.language)
-        
         # Title
         title = self.font.render(t('stm32_setup', self.language), True, WHITE)
         title_rect = title.get_rect(center=(self.world_width // 2, 80))
@@ -1615,12 +4868,6 @@ class Game:
         """Desenhar menu de seleção de dificuldade"""
         self.world_surface.fill(BLACK)
         
-        # Update texts
-        self.difficulty_buttons[0].text = t('difficulty_easy', self.language)
-        self.difficulty_buttons[1].text = t('difficulty_normal', self.language)
-        self.difficulty_buttons[2].text = t('difficulty_hard', self.language)
-        self.difficulty_buttons[3].text = t('back', self.language)
-        
         # Title
         title = self.font.render(t('select_difficulty', self.language), True, WHITE)
         title_rect = title.get_rect(center=(self.world_width // 2, 150))
@@ -1714,6 +4961,10 @@ class Game:
         self.leaderboard_buttons = [
             Button(center_x, 600, button_width, button_height, "Voltar", GRAY),
         ]
+        self.leaderboard_jump_button = Button(center_x + button_width + 20, 610, 200, 50,
+                                              t('jump_to_me', self.language), BLUE)
+        self.leaderboard_scope_button = Button(center_x - 220, 610, 200, 50,
+                                               t('scope_local', self.language), BLUE)
 
         # Menu de seleção de modos - usar cards verticais
         card_width = 600
@@ -1773,28 +5024,54 @@ class Game:
             Button(buttons_start_x, 420, button_width_each, button_height, "Guardar", DARK_GREEN),
             Button(buttons_start_x + button_width_each + button_spacing, 420, button_width_each, button_height, "Descartar", GRAY),
         ]
-
-    def connect_serial(self):
-        """Conectar à porta série do STM32"""
-        ports = self.scan_stm32_ports()
-        self.stm32_ports = ports  # Update cached list
-        
-        if ports:
-            try:
-                print(f"  A tentar conectar a {ports[0]}...")
-                self.serial_port = serial.Serial(
-                    ports[0],
-                    baudrate=115200,
-                    timeout=0.01
-                )
-                self.serial_connected = True
-                print(f"  [OK] Conectado a: {ports[0]}")
+        self.apply_language()
+
+    def apply_language(self):
+        """Textos dos botões existentes no idioma atual (BUTTON_LABELS)"""
+        messages = MESSAGE_TABLES[self.language]
+        for name, message_ids in BUTTON_LABELS.items():
+            buttons = getattr(self, name, None)  # Alguns só são criados ao desenhar o ecrã
+            if isinstance(buttons, Button):
+                buttons = (buttons,)
+            for button, message_id in zip(buttons or (), message_ids):
+                button.text = messages[message_id]
+
+    def set_language(self, language):
+        self.language = language
+        self.config.set('language', language)
+        self.apply_language()
+
+    def connect_serial(self, reconnect=True):
+        """Conectar à porta série do STM32.
+
+        Chamado pela thread de scan e pela thread principal: se já houver uma ligação em curso
+        não faz nada (devolve False); com reconnect=False não volta a ligar se já estiver ligado."""
+        if not self.serial_lock.acquire(blocking=False):
+            return False
+        try:
+            if self.serial_connected and not reconnect:
                 return True
-            except Exception as e:
-                print(f"  [X] Erro ao conectar a {ports[0]}: {e}")
-        
-        print("\nAVISO: Nenhum STM32 encontrado. A usar teclado para controlo.")
-        return False
+            ports = self.scan_stm32_ports()
+            self.stm32_ports = ports  # Update cached list
+
+            if ports:
+                try:
+                    print(f"  A tentar conectar a {ports[0]}...")
+                    self.serial_port = serial.Serial(
+                        ports[0],
+                        baudrate=115200,
+                        timeout=0.01
+                    )
+                    self.serial_connected = True
+                    print(f"  [OK] Conectado a: {ports[0]}")
+                    return True
+                except Exception as e:
+                    print(f"  [X] Erro ao conectar a {ports[0]}: {e}")
+
+            print("\nAVISO: Nenhum STM32 encontrado. A usar teclado para controlo.")
+            return False
+        finally:
+            self.serial_lock.release()
 
     def scan_stm32_ports(self):
         """Procurar por portas STM32 disponíveis"""
@@ -1825,98 +5102,12 @@ class Game:
         
         return found_ports
 
-    def init_level(self):
-        """Inicializar um novo nível"""
-        # Obter configuração do modo atual
-        mode_config = GAME_MODES.get(self.game_mode, {})
-        mine_percentage = mode_config.get('mine_percentage', 0.15)
-
-        # Gerar labirinto com minas (usando dificuldade)
-        self.walls, self.mines, self.goal_pos, current_cell_size = MazeGenerator.generate(
-            self.level,
-            self.world_width,
-            self.world_height,
-            self.game_mode,
-            mine_percentage,
-            self.difficulty
-        )
-
-        # Adjust goal radius to fit in cell (max 30, or 40% of cell size to avoid touching walls)
-        self.goal_radius = min(30, int(current_cell_size * 0.4))
-
-        # Posição inicial da bola (com margem segura)
-        ball_start_x = MAZE_MARGIN + 60
-        ball_start_y = MAZE_MARGIN_TOP + 60
-        self.ball = Ball(ball_start_x, ball_start_y, self.sensitivity, self.world_width, self.world_height)
-        
-        # Setup Multiplayer
-        if self.num_players == 2:
-            # Balls placed equidistant from the top-left corner (0,0) of the cell
-            # This forms a triangle with the corner wall, ensuring fairness.
-            
-            # Distances within the cell
-            dist_far = current_cell_size * 0.75
-            dist_close = current_cell_size * 0.25
-            
-            start_x = MAZE_MARGIN
-            start_y = MAZE_MARGIN_TOP
-            
-            # P1 (Red): Further Right, Closer to Top
-            self.ball.x = start_x + dist_far
-            self.ball.y = start_y + dist_close
-            
-            # P2 (Green): Further Down, Closer to Left
-            self.ball2 = Ball(start_x + dist_close, start_y + dist_far, self.sensitivity, self.world_width, self.world_height, color=GREEN)
-            
-            self.player1_finished = False
-            self.player2_finished = False
-            
-            # Store starting distances for score calculation
-            self.p1_start_dist = math.sqrt((self.ball.x - self.goal_pos[0])**2 + (self.ball.y - self.goal_pos[1])**2)
-            self.p2_start_dist = math.sqrt((self.ball2.x - self.goal_pos[0])**2 + (self.ball2.y - self.goal_pos[1])**2)
-        else:
-            self.ball2 = None
-
-        # Resetar variáveis do nível
-        self.timer = 0
-        self.level_start_time = time.time()
-        self.mine_hit_animation_time = 0
-
-        # Resetar sistema de precisão
-        if mode_config.get('track_precision', False):
-            self.wall_collisions = 0
-            self.precision_score = 0
-            self.collision_pause_time = 0
-            self.last_precision_update = time.time()
-
-        # Configurar timer baseado no modo e dificuldade
-        if mode_config.get('timer_direction') == 'down':
-            if self.game_mode == 'elimination':
-                 # Random time adjustments based on difficulty
-                 base_min, base_max = 30, 80
-                 if self.difficulty == 'easy':
-                     base_min, base_max = 45, 100
-                 elif self.difficulty == 'hard':
-                     base_min, base_max = 35, 75
-                 
-                 self.timer = random.randint(base_min, base_max)
-            elif mode_config.get('random_time_on_level', False):
-                # Fallback logic
-                min_time = mode_config.get('random_time_min', 30)
-                max_time = mode_config.get('random_time_max', 80)
-                self.timer = random.randint(min_time, max_time)
-            else:
-                # Modo time attack - tempo fixo adjusted by difficulty
-                base_time = mode_config.get('initial_time', 60)
-                if self.difficulty == 'easy':
-                    self.timer = base_time + 60 # +1 min
-                elif self.difficulty == 'hard':
-                    self.timer = max(30, base_time - 60) # -1 min
-                else:
-                    self.timer = base_time
-
     def get_scale_and_offset(self):
-        """Calcular escala e offset para manter proporções ao redimensionar"""
+        """Calcular escala e offset para manter proporções ao redimensionar (recalculados só
+        quando o tamanho da janela muda)"""
+        if self.view_size == (self.window_width, self.window_height):
+            return self.view_transform
+
         # Calcular razão de aspecto
         window_ratio = self.window_width / self.window_height
         world_ratio = self.world_width / self.world_height
@@ -1934,7 +5125,9 @@ class Game:
             offset_x = 0
             offset_y = (self.window_height - scaled_height) / 2
 
-        return scale, offset_x, offset_y
+        self.view_size = (self.window_width, self.window_height)
+        self.view_transform = (scale, offset_x, offset_y)
+        return self.view_transform
 
     def screen_to_world(self, screen_x, screen_y):
         """Converter coordenadas da tela para coordenadas do mundo"""
@@ -1943,14 +5136,40 @@ class Game:
         world_y = (screen_y - offset_y) / scale
         return world_x, world_y
 
+    def pointer_events(self, events):
+        """Eventos do frame com os do rato convertidos em PointerEvent (coordenadas do mundo).
+
+        MOUSEMOTIONs seguidos com os mesmos botões são juntos num só (última posição,
+        deslocamento somado): um rato a 1000 Hz gera ~16 por frame e só o último interessa."""
+        scale, offset_x, offset_y = self.get_scale_and_offset()
+        converted = []
+        for event in events:
+            if event.type not in (pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN, pygame.MOUSEBUTTONUP):
+                converted.append(event)
+                continue
+            screen_x, screen_y = event.pos
+            world_pos = (int((screen_x - offset_x) / scale), int((screen_y - offset_y) / scale))
+            previous = converted[-1] if converted else None
+            if (event.type == pygame.MOUSEMOTION and isinstance(previous, PointerEvent) and
+                    previous.type == pygame.MOUSEMOTION and previous.buttons == event.buttons):
+                previous.rel = (previous.rel[0] + event.rel[0], previous.rel[1] + event.rel[1])
+                previous.screen_pos = event.pos
+                previous.pos = world_pos
+            else:
+                converted.append(PointerEvent(event, world_pos))
+        return converted
+
     def render_world_to_screen(self):
         """Renderizar surface do mundo na tela com escala correta"""
+        prof = self.profiler if self.profiler.enabled else None
+        if prof:
+            prof.begin('render')
         scale, offset_x, offset_y = self.get_scale_and_offset()
 
-        # Escalar a surface do mundo
-        scaled_width = int(self.world_width * scale)
-        scaled_height = int(self.world_height * scale)
-        scaled_surface = pygame.transform.scale(self.world_surface, (scaled_width, scaled_height))
+        # Escalar a surface do mundo (para uma surface por resolução, reutilizada entre frames)
+        scaled_size = (int(self.world_width * scale), int(self.world_height * scale))
+        scaled_surface = self.surface_cache.get(('scaled_world', scaled_size), pygame.Surface, scaled_size)
+        pygame.transform.scale(self.world_surface, scaled_size, scaled_surface)
 
         # Limpar tela com preto (barras laterais)
         self.screen.fill(BLACK)
@@ -1958,6 +5177,13 @@ class Game:
         # Desenhar surface escalada
         self.screen.blit(scaled_surface, (offset_x, offset_y))
 
+        if prof:
+            prof.end()
+            # Overlay em coordenadas da janela (não escalado)
+            prof.begin('overlay')
+            prof.draw(self.screen, self.profiler_font)
+            prof.end()
+
     def read_serial(self):
         """Ler dados do acelerómetro via série"""
         if self.serial_port and self.serial_port.is_open:
@@ -2018,216 +5244,48 @@ class Game:
         if self.num_players == 2:
             if keys[pygame.K_a]:
                 self.keyboard2_accel_x -= keyboard_accel_magnitude
-            if keys[pygame.K_d]:
-                self.keyboard2_accel_x += keyboard_accel_magnitude
-            if keys[pygame.K_w]:
-                self.keyboard2_accel_y -= keyboard_accel_magnitude
-            if keys[pygame.K_s]:
-                self.keyboard2_accel_y += keyboard_accel_magnitude
-
-        # Normalizar se diagonal (para não ter aceleração maior nas diagonais)
-        if self.keyboard_accel_x != 0 and self.keyboard_accel_y != 0:
-            diagonal_factor = 1 / math.sqrt(2)
-            self.keyboard_accel_x *= diagonal_factor
-            self.keyboard_accel_y *= diagonal_factor
-            
-        if self.keyboard2_accel_x != 0 and self.keyboard2_accel_y != 0:
-            diagonal_factor = 1 / math.sqrt(2)
-            self.keyboard2_accel_x *= diagonal_factor
-            self.keyboard2_accel_y *= diagonal_factor
-
-        # Reset da aceleração do acelerómetro quando se usa apenas teclado
-        if not self.serial_connected:
-            # Só resetar se não houver input de teclado
-            if not any([keys[pygame.K_LEFT], keys[pygame.K_RIGHT], keys[pygame.K_UP], keys[pygame.K_DOWN]]):
-                self.accel_x = 0
-                self.accel_y = 0
-            if not any([keys[pygame.K_a], keys[pygame.K_d], keys[pygame.K_w], keys[pygame.K_s]]):
-                self.accel2_x = 0
-                self.accel2_y = 0
-
-    def check_win(self):
-        """Verificar se a bola chegou ao objetivo (buraco)"""
-        # Evitar verificar se já estamos em estado de vitória
-        if self.state != "PLAYING":
-            return
-
-        # Helper for single player win logic (reuse existing code logic)
-        def process_level_complete(time_taken):
-            # Toca o buzzer ao vencer
-            self.send_beep_command()
-
-            # Congelar a bola
-            self.ball.vx = 0
-            self.ball.vy = 0
-
-            # Calcular tempo do nível
-            self.total_time += time_taken
-            self.best_time = min(self.best_time, time_taken)
-            self.levels_completed += 1
-
-            # Calcular pontuação
-            mode_config = GAME_MODES.get(self.game_mode, {})
-            if mode_config.get('track_precision', False):
-                score = int(self.level * 1000 / max(0.1, time_taken)) + self.precision_score
-            else:
-                score = int(self.level * 1000 / max(0.1, time_taken))
-            
-            self.current_score = score
-            self.total_score += score
-            self.current_time = time_taken
-
-            # Adicionar tempo aleatório no modo eliminação
-            self.last_bonus_time = 0
-            if mode_config.get('random_time_on_level', False):
-                min_time = mode_config.get('random_time_min', 30)
-                max_time = mode_config.get('random_time_max', 80)
-                bonus_time = random.randint(min_time, max_time)
-                self.timer += bonus_time
-                self.last_bonus_time = bonus_time
-
-            # Adicionar vida se alguma foi perdida
-            if self.lives < self.max_lives:
-                self.lives += 1
-
-            # Store data for name input
-            self.pending_score_data = {
-                'level': self.level,
-                'time': time_taken,
-                'score': self.total_score,
-                'game_mode': self.game_mode
-            }
-
-            # Avançar nível (Single Player Normal Mode is Infinite in existing code)
-            # But multiplayer Normal is 1 level.
-            if self.num_players == 2 and self.game_mode == 'normal':
-                self.state = "WIN" # End after 1 level
-            else:
-                self.level += 1
-                if self.sound_level_complete:
-                    self.sound_level_complete.play()
-                self.state = "WIN"
-
-        if self.num_players == 1:
-            dx = self.ball.x - self.goal_pos[0]
-            dy = self.ball.y - self.goal_pos[1]
-            distance = math.sqrt(dx*dx + dy*dy)
-
-            if distance < self.goal_radius:
-                process_level_complete(time.time() - self.level_start_time)
-        else:
-            # Multiplayer
-            current_time = time.time() - self.level_start_time
-            
-            # Check P1
-            if not self.player1_finished:
-                dist1 = math.sqrt((self.ball.x - self.goal_pos[0])**2 + (self.ball.y - self.goal_pos[1])**2)
-                if dist1 < self.goal_radius:
-                    self.player1_finished = True
-                    self.player1_time = current_time
-                    # Calculate P1 score
-                    score = int(self.level * 1000 / max(0.1, current_time))
-                    self.player1_score += score
-                    
-                    self.send_beep_command()
-                    # Freeze ball
-                    self.ball.vx = 0
-                    self.ball.vy = 0
-                    self.ball.x = -1000 # Move off screen
-                    if self.sound_level_complete:
-                        self.sound_level_complete.play()
+            if keys[pygame.K_d]:
+                self.keyboard2_accel_x += keyboard_accel_magnitude
+            if keys[pygame.K_w]:
+                self.keyboard2_accel_y -= keyboard_accel_magnitude
+            if keys[pygame.K_s]:
+                self.keyboard2_accel_y += keyboard_accel_magnitude
 
-            # Check P2
-            if not self.player2_finished:
-                dist2 = math.sqrt((self.ball2.x - self.goal_pos[0])**2 + (self.ball2.y - self.goal_pos[1])**2)
-                if dist2 < self.goal_radius:
-                    self.player2_finished = True
-                    self.player2_time = current_time
-                    # Calculate P2 score
-                    score = int(self.level * 1000 / max(0.1, current_time))
-                    self.player2_score += score
-                    
-                    self.send_beep_command()
-                    # Freeze ball
-                    self.ball2.vx = 0
-                    self.ball2.vy = 0
-                    self.ball2.x = -1000 # Move off screen
-                    if self.sound_level_complete:
-                        self.sound_level_complete.play()
+        # Normalizar se diagonal (para não ter aceleração maior nas diagonais)
+        if self.keyboard_accel_x != 0 and self.keyboard_accel_y != 0:
+            diagonal_factor = 1 / math.sqrt(2)
+            self.keyboard_accel_x *= diagonal_factor
+            self.keyboard_accel_y *= diagonal_factor
             
-            # Check conditions
-            if self.player1_finished and self.player2_finished:
-                # Both finished
-                if self.game_mode == 'normal':
-                    # Set current stats for WIN screen
-                    self.current_time = max(self.player1_time, self.player2_time)
-                    
-                    # Determine Winner based on time
-                    if self.player1_time < self.player2_time:
-                        self.winner = "Player 1"
-                    elif self.player2_time < self.player1_time:
-                        self.winner = "Player 2"
-                    else:
-                        self.winner = "Draw"
-                        
-                    # Score calculation for MP (basic implementation)
-                    mode_config = GAME_MODES.get(self.game_mode, {})
-                    score = int(self.level * 1000 / max(0.1, self.current_time))
-                    self.current_score = score
-                    self.total_score += score
-                    self.levels_completed += 1
-                    self.total_time += self.current_time
-                    
-                    self.state = "MP_WIN" # End Game on special screen
-                else:
-                    # Minefield / Elimination - Continue to next level
-                    self.level += 1
-                    
-                    # Add bonus time or Reset Time
-                    mode_config = GAME_MODES.get(self.game_mode, {})
-                    if self.game_mode == 'elimination':
-                        # Reset to random time
-                        self.timer = random.randint(30, 80)
-                    elif mode_config.get('random_time_on_level', False):
-                         bonus = random.randint(30, 80)
-                         self.timer += bonus
-                         
-                    self.init_level()
-                    # Reset finished flags
-                    self.player1_finished = False
-                    self.player2_finished = False
+        if self.keyboard2_accel_x != 0 and self.keyboard2_accel_y != 0:
+            diagonal_factor = 1 / math.sqrt(2)
+            self.keyboard2_accel_x *= diagonal_factor
+            self.keyboard2_accel_y *= diagonal_factor
+
+        # Reset da aceleração do acelerómetro quando se usa apenas teclado
+        if not self.serial_connected:
+            # Só resetar se não houver input de teclado
+            if not any([keys[pygame.K_LEFT], keys[pygame.K_RIGHT], keys[pygame.K_UP], keys[pygame.K_DOWN]]):
+                self.accel_x = 0
+                self.accel_y = 0
+            if not any([keys[pygame.K_a], keys[pygame.K_d], keys[pygame.K_w], keys[pygame.K_s]]):
+                self.accel2_x = 0
+                self.accel2_y = 0
 
     def draw_direction_indicator(self):
         """Desenhar indicador de direção no top-center"""
-        indicator_size = 40
         center_x = self.world_width // 2
         center_y = 60
+        sprites = self.sprites()
+        frames = 360 // ARROW_ANGLE_STEP
 
         def draw_arrow(x, y, ax, ay, color):
-            magnitude = math.sqrt(ax**2 + ay**2)
-            if magnitude < 0.15:
-                pygame.draw.circle(self.world_surface, color, (x, y), indicator_size // 2)
-                pygame.draw.circle(self.world_surface, WHITE, (x, y), indicator_size // 2, 3)
+            # Seta pré-desenhada no atlas, com o ângulo arredondado a ARROW_ANGLE_STEP graus
+            if math.hypot(ax, ay) < 0.15:
+                step = None
             else:
-                angle = math.atan2(ay, ax)
-                arrow_length = indicator_size
-                arrow_width = indicator_size // 2
-                
-                tip_x = x + arrow_length * math.cos(angle)
-                tip_y = y + arrow_length * math.sin(angle)
-                
-                base_angle1 = angle + math.pi * 0.75
-                base_angle2 = angle - math.pi * 0.75
-                
-                base1_x = x + arrow_width * math.cos(base_angle1)
-                base1_y = y + arrow_width * math.sin(base_angle1)
-                
-                base2_x = x + arrow_width * math.cos(base_angle2)
-                base2_y = y + arrow_width * math.sin(base_angle2)
-                
-                points = [(tip_x, tip_y), (base1_x, base1_y), (base2_x, base2_y)]
-                pygame.draw.polygon(self.world_surface, color, points)
-                pygame.draw.polygon(self.world_surface, WHITE, points, 3)
+                step = round(math.degrees(math.atan2(ay, ax)) / ARROW_ANGLE_STEP) % frames
+            sprites.blit(self.world_surface, ('indicator', color, step), x, y)
 
         if self.num_players == 2:
             # Player 1 (Red)
@@ -2247,16 +5305,16 @@ class Game:
 
     def draw_hearts(self):
         """Desenhar corações (vidas) no centro inferior"""
-        heart_size = 30
         heart_spacing = 40
         y_pos = self.world_height - 25
+        sprites = self.sprites()
 
         # Calcular posição centralizada
-        total_width = self.max_lives * heart_spacing - (heart_spacing - heart_size)
+        total_width = self.max_lives * heart_spacing - (heart_spacing - HEART_SIZE)
         start_x = (self.world_width - total_width) // 2
 
         for i in range(self.max_lives):
-            x = start_x + i * heart_spacing + heart_size // 2
+            x = start_x + i * heart_spacing + HEART_SIZE // 2
 
             # Animação de pulso quando perde vida
             scale = 1.0
@@ -2267,89 +5325,32 @@ class Game:
                     # If P1 lost and i == current_lives, pulse
                     # For shared/single player:
                     if self.num_players == 1 and int(i) == int(self.lives):
-                         scale = 1.0 + 0.3 * math.sin(time_since_lost * 20)
+                         scale = 1.0 + HEART_PULSE * math.sin(time_since_lost * 20)
                     # For MP, we could pulse specific half, but simpler to pulse whole heart if either lost
                     elif self.num_players == 2:
                          if (int(i) == int(self.player1_lives)) or (int(i) == int(self.player2_lives)):
-                             scale = 1.0 + 0.3 * math.sin(time_since_lost * 20)
+                             scale = 1.0 + HEART_PULSE * math.sin(time_since_lost * 20)
 
-            size = int(heart_size * scale)
-            
-            # Shapes logic
-            left_circle_pos = (int(x - size//4), int(y_pos - size//4))
-            right_circle_pos = (int(x + size//4), int(y_pos - size//4))
-            
-            # Triangle points
-            # Tip is at (x, y_pos + size//2)
-            # Top Left is (x - size//2, y_pos - size//6)
-            # Top Right is (x + size//2, y_pos - size//6)
-            # Top Center is (x, y_pos - size//6)
-            
-            triangle_tip = (x, y_pos + size//2)
-            triangle_top_left = (x - size//2, y_pos - size//6)
-            triangle_top_right = (x + size//2, y_pos - size//6)
-            triangle_top_center = (x, y_pos - size//6)
+            size = int(HEART_SIZE * scale)
 
             if self.num_players == 2:
-                # --- Multiplayer: Split Heart ---
-                
-                # Save current clip
-                original_clip = self.world_surface.get_clip()
-                
-                # 1. Draw Left Half (Player 1 - RED)
-                # Set clip to the left side of the heart's center x
-                self.world_surface.set_clip(pygame.Rect(0, 0, x, self.world_height))
-                
+                # Multiplayer: coração dividido (esquerda = jogador 1, direita = jogador 2)
                 color_p1 = RED if i < self.player1_lives else DARK_GRAY
-                
-                pygame.draw.circle(self.world_surface, color_p1, left_circle_pos, size//3)
-                poly_p1 = [triangle_tip, triangle_top_left, triangle_top_center]
-                pygame.draw.polygon(self.world_surface, color_p1, poly_p1)
-                
-                # 2. Draw Right Half (Player 2 - GREEN)
-                # Set clip to the right side of the heart's center x
-                self.world_surface.set_clip(pygame.Rect(x, 0, self.world_width - x, self.world_height))
-                
                 color_p2 = GREEN if i < self.player2_lives else DARK_GRAY
-                
-                pygame.draw.circle(self.world_surface, color_p2, right_circle_pos, size//3)
-                poly_p2 = [triangle_tip, triangle_top_right, triangle_top_center]
-                pygame.draw.polygon(self.world_surface, color_p2, poly_p2)
-                
-                # Reset Clip
-                self.world_surface.set_clip(original_clip)
-                
-                # Draw a thin black line in the middle to separate
-                # Extend line higher up to split circles visually
-                line_top_y = y_pos - size//2
-                pygame.draw.line(self.world_surface, BLACK, (x, line_top_y), triangle_tip, 2)
-                
+                sprites.blit(self.world_surface, ('heart', size, color_p1, color_p2), x, y_pos)
             else:
-                # --- Single Player: Full Heart ---
                 heart_color = RED if i < self.lives else DARK_GRAY
-                
-                # Draw both circles
-                pygame.draw.circle(self.world_surface, heart_color, left_circle_pos, size//3)
-                pygame.draw.circle(self.world_surface, heart_color, right_circle_pos, size//3)
-
-                # Full Triangle
-                triangle_points = [triangle_tip, triangle_top_left, triangle_top_right]
-                pygame.draw.polygon(self.world_surface, heart_color, triangle_points)
+                sprites.blit(self.world_surface, ('heart', size, heart_color, None), x, y_pos)
 
     def draw_mines(self):
         """Desenhar minas no labirinto"""
         for mine in self.mines:
-            mine.draw(self.world_surface)
+            mine.draw(self.world_surface, self.surface_cache)
 
     def draw_menu(self):
         """Desenhar menu principal"""
         self.world_surface.fill(BLACK)
 
-        # Update button texts
-        button_keys = ['play', 'settings', 'leaderboard', 'exit']
-        for i, button in enumerate(self.main_menu_buttons):
-            button.text = t(button_keys[i], self.language)
-
         # Título com efeito
         title = self.title_font.render(t('title', self.language), True, GREEN)
         title_rect = title.get_rect(center=(self.world_width // 2, 150))
@@ -2377,11 +5378,6 @@ class Game:
         """Desenhar menu de seleção de jogadores"""
         self.world_surface.fill(BLACK)
 
-        # Update button texts
-        self.player_select_buttons[0].text = t('single_player', self.language)
-        self.player_select_buttons[1].text = t('multi_player', self.language)
-        self.player_select_buttons[2].text = t('back', self.language)
-
         # Título
         title = self.font.render(t('select_players', self.language), True, WHITE)
         title_rect = title.get_rect(center=(self.world_width // 2, 150))
@@ -2399,9 +5395,6 @@ class Game:
         """Desenhar menu de definições"""
         self.world_surface.fill(BLACK)
 
-        # Update button texts
-        self.settings_buttons[0].text = t('back', self.language)
-
         # Título
         title = self.font.render(t('settings', self.language), True, WHITE)
         title_rect = title.get_rect(center=(self.world_width // 2, 50))
@@ -2456,18 +5449,12 @@ class Game:
             conn_color = RED
 
         # Check for hover on the connection text to indicate clickability
-        mouse_pos = pygame.mouse.get_pos()
         # We need to calculate the rect first to check hover, or use a pre-calculated position
         # Let's calculate rect, check hover, then draw with potential color change
         conn_surface_temp = self.small_font.render(connection_text, True, conn_color)
         conn_rect = conn_surface_temp.get_rect(center=(self.world_width // 2, 520))
         
-        # Convert mouse pos for collision check
-        scale, offset_x, offset_y = self.get_scale_and_offset()
-        world_mouse_x = (mouse_pos[0] - offset_x) / scale
-        world_mouse_y = (mouse_pos[1] - offset_y) / scale
-        
-        if conn_rect.collidepoint(world_mouse_x, world_mouse_y):
+        if conn_rect.collidepoint(self.mouse_world_pos):
             conn_color = WHITE  # Highlight on hover
             
         conn_surface = self.small_font.render(connection_text, True, conn_color)
@@ -2482,7 +5469,7 @@ class Game:
         show_controls_rect = show_c_surf_temp.get_rect(center=(self.world_width // 2, 560))
         
         show_c_color = BLUE
-        if show_controls_rect.collidepoint(world_mouse_x, world_mouse_y):
+        if show_controls_rect.collidepoint(self.mouse_world_pos):
             show_c_color = YELLOW
             
         show_controls_surface = self.small_font.render(show_controls_text, True, show_c_color)
@@ -2535,10 +5522,10 @@ class Game:
         # Back Button
         if not hasattr(self, 'controls_back_button'):
             self.controls_back_button = Button(self.world_width // 2 - 200, 600, 400, 70, t('back', self.language), GRAY)
+            self.apply_language()
         
         # Update button position (in case it was created with old coordinates)
         self.controls_back_button.rect.y = 600
-        self.controls_back_button.text = t('back', self.language)
         self.controls_back_button.draw(self.world_surface, self.font)
         
         self.render_world_to_screen()
@@ -2553,9 +5540,6 @@ class Game:
         """Desenhar leaderboard com filtro de modo"""
         self.world_surface.fill(BLACK)
 
-        # Update button texts
-        self.leaderboard_buttons[0].text = t('back', self.language)
-
         # Título
         title = self.font.render(t('leaderboard', self.language), True, GOLD)
         title_rect = title.get_rect(center=(self.world_width // 2, 40))
@@ -2563,16 +5547,6 @@ class Game:
 
         # Filter buttons with colored outline for selection
         for i, button in enumerate(self.leaderboard_filter_buttons):
-            # Update button text based on language
-            button_texts = [
-                t('all_modes', self.language),
-                t('normal_mode', self.language),
-                t('minefield_mode', self.language),
-                t('timeattack_mode', self.language),
-                t('elimination_mode', self.language)
-            ]
-            button.text = button_texts[i]
-
             # Draw button
             button.draw(self.world_surface, self.small_font)
 
@@ -2622,32 +5596,33 @@ class Game:
         # Linha separadora
         pygame.draw.line(self.world_surface, GRAY, (40, y_offset + 30), (self.world_width - 40, y_offset + 30), 2)
 
-        # Scores - with filter (store rects for clickability)
-        scores = self.db.get_top_scores(10, self.leaderboard_filter)
+        # Scores - janela já carregada (store rects for clickability)
+        visible_rows = self.leaderboard_rows[self.leaderboard_scroll:self.leaderboard_scroll + LEADERBOARD_VISIBLE_ROWS]
+        first_visible_rank = self.leaderboard_first_rank + self.leaderboard_scroll
         y_offset = 175
         self.leaderboard_entry_rects = []  # Store entry positions for click detection
 
-        for i, score_data in enumerate(scores):
-            # Unpack data - now includes game_mode
-            name, level, time_taken, score, date, game_mode = score_data
-            color = GOLD if i == 0 else (LIGHT_GRAY if i == 1 else (GRAY if i == 2 else WHITE))
+        for i, score_data in enumerate(visible_rows):
+            # Unpack data - now includes game_mode and row id
+            name, level, time_taken, score, date, game_mode, row_id = score_data
+            rank_number = first_visible_rank + i
+            color = GOLD if rank_number == 1 else (LIGHT_GRAY if rank_number == 2 else (GRAY if rank_number == 3 else WHITE))
 
             # Create clickable rect for this entry
             entry_rect = pygame.Rect(40, y_offset - 5, self.world_width - 80, 30)
             self.leaderboard_entry_rects.append((entry_rect, name))
 
+            # Destacar a entrada encontrada com "Ir para mim"
+            if row_id == self.leaderboard_highlight_id:
+                pygame.draw.rect(self.world_surface, (0, 60, 120), entry_rect)
+
             # Highlight on hover (will be handled in event handler)
-            # Draw hover background if mouse is over
-            mouse_pos = pygame.mouse.get_pos()
-            # Convert to world coordinates
-            scale, offset_x, offset_y = self.get_scale_and_offset()
-            world_mouse_x = (mouse_pos[0] - offset_x) / scale
-            world_mouse_y = (mouse_pos[1] - offset_y) / scale
-            if entry_rect.collidepoint(world_mouse_x, world_mouse_y):
+            # Draw hover background if mouse is over (posição do rato já convertida em run())
+            if entry_rect.collidepoint(self.mouse_world_pos):
                 pygame.draw.rect(self.world_surface, (40, 40, 40), entry_rect)
 
             # Render each field with overflow handling
-            rank = self.small_font.render(str(i + 1), True, color)
+            rank = self.small_font.render(str(rank_number), True, color)
             # Limit name to 12 characters for overflow
             name_text = self.small_font.render(name[:12], True, color)
             level_text = self.small_font.render(str(level), True, color)
@@ -2684,39 +5659,38 @@ class Game:
 
             y_offset += 35
 
+        # Barra de scroll (só quando há mais entradas além das visíveis)
+        if not (self.leaderboard_at_start and self.leaderboard_at_end and len(self.leaderboard_rows) <= LEADERBOARD_VISIBLE_ROWS):
+            track_rect = pygame.Rect(self.world_width - 30, 170, 6, LEADERBOARD_VISIBLE_ROWS * 35)
+            pygame.draw.rect(self.world_surface, DARK_GRAY, track_rect)
+            position = self.leaderboard_scroll / max(1, len(self.leaderboard_rows) - LEADERBOARD_VISIBLE_ROWS)
+            thumb_y = track_rect.y + int((track_rect.height - 40) * position)
+            pygame.draw.rect(self.world_surface, LIGHT_GRAY, (track_rect.x, thumb_y, track_rect.width, 40))
+
         # Botões
         for button in self.leaderboard_buttons:
             button.draw(self.world_surface, self.font)
 
+        self.leaderboard_jump_button.draw(self.world_surface, self.small_font)
+
+        # Alternar local/global só quando a sincronização está ativa
+        if self.sync_client:
+            if self.leaderboard_global:
+                self.leaderboard_scope_button.text = t('scope_global', self.language)
+                self.leaderboard_scope_button.color = ORANGE
+            else:
+                self.leaderboard_scope_button.text = t('scope_local', self.language)
+                self.leaderboard_scope_button.color = BLUE
+            self.leaderboard_scope_button.draw(self.world_surface, self.small_font)
+
         # Renderizar na tela
         self.render_world_to_screen()
         pygame.display.flip()
 
     def draw_playing(self):
         """Desenhar o jogo em andamento"""
-        self.world_surface.fill(BLACK)
-
-        # Desenhar paredes - Inflate by 1px to fix seams
-        for wall in self.walls:
-            # Create rect from tuple
-            wall_rect = pygame.Rect(wall)
-            
-            # Sombra
-            shadow_rect = pygame.Rect(wall[0] + 2, wall[1] + 2, wall[2], wall[3])
-            pygame.draw.rect(self.world_surface, DARK_GRAY, shadow_rect)
-            
-            # Parede - Inflate to fix seams
-            pygame.draw.rect(self.world_surface, WALL_COLOR, wall_rect.inflate(1, 1))
-
-        # Desenhar objetivo como buraco verde com efeito
-        for i in range(3):
-            radius = self.goal_radius - i * 8
-            color_intensity = 255 - i * 60
-            color = (0, color_intensity, 0)
-            pygame.draw.circle(self.world_surface, color, self.goal_pos, radius)
-
-        # Círculo interno escuro (buraco)
-        pygame.draw.circle(self.world_surface, DARK_GREEN, self.goal_pos, self.goal_radius // 2)
+        # Fundo, paredes e objetivo (camada estática do nível)
+        self.world_surface.blit(self.static_layer(), (0, 0))
 
         # Desenhar minas
         self.draw_mines()
@@ -2724,22 +5698,22 @@ class Game:
         # Desenhar bola (com animação de explosão se pisar mina)
         if self.mine_hit_animation_time > 0:
             # Animação de explosão
-            animation_progress = (time.time() - self.mine_hit_animation_time) / 0.5
+            animation_progress = (self.sim_time - self.mine_hit_animation_time) / 0.5
             explosion_radius = int(BALL_RADIUS * (1 + animation_progress * 2))
             explosion_alpha = int(255 * (1 - animation_progress))
             explosion_color = (255, explosion_alpha, 0)
             pygame.draw.circle(self.world_surface, explosion_color, (int(self.ball.x), int(self.ball.y)), explosion_radius, 3)
 
-        self.ball.draw(self.world_surface)
+        self.ball.draw(self.world_surface, self.sprites())
         
         if self.ball2:
-            self.ball2.draw(self.world_surface)
+            self.ball2.draw(self.world_surface, self.sprites())
 
         # Indicador de direção
         self.draw_direction_indicator()
 
         # HUD
-        # Timer
+        # Timer (muda a cada décima: desenhado diretamente, não vale a pena ir para a cache)
         mode_config = GAME_MODES.get(self.game_mode, {})
         if mode_config.get('timer_direction') == 'down':
             timer_text = self.font.render(f"{t('time', self.language)}: {self.timer:.1f}s", True, YELLOW if self.timer > 10 else RED)
@@ -2749,7 +5723,7 @@ class Game:
 
         # Nível (Hide in MP Normal Mode)
         if not (self.num_players == 2 and self.game_mode == 'normal'):
-            level_text = self.font.render(f"{t('level', self.language)}: {self.level}", True, WHITE)
+            level_text = self.surface_cache.text(self.font, f"{t('level', self.language)}: {self.level}", WHITE)
             # Right align with 10px margin
             level_rect = level_text.get_rect(topright=(self.world_width - 10, 10))
             self.world_surface.blit(level_text, level_rect)
@@ -2757,7 +5731,7 @@ class Game:
         # MP Normal Mode: Early End Text
         if self.num_players == 2 and self.game_mode == 'normal' and (self.player1_finished or self.player2_finished):
              end_text_str = "Pressione 'T' para terminar" if self.language == 'pt' else "Press 'T' to end"
-             end_text = self.small_font.render(end_text_str, True, WHITE)
+             end_text = self.surface_cache.text(self.small_font, end_text_str, WHITE)
              # Right align top (replaces Level text)
              end_rect = end_text.get_rect(topright=(self.world_width - 10, 10))
              self.world_surface.blit(end_text, end_rect)
@@ -2776,7 +5750,7 @@ class Game:
         self.world_surface.blit(accel_text, (10, self.world_height - 30))
 
         # Instruções - Right align with 10px margin
-        instructions = self.small_font.render(t('hud_instructions', self.language), True, GRAY)
+        instructions = self.surface_cache.text(self.small_font, t('hud_instructions', self.language), GRAY)
         inst_rect = instructions.get_rect(topright=(self.world_width - 10, self.world_height - 30))
         self.world_surface.blit(instructions, inst_rect)
 
@@ -2784,39 +5758,18 @@ class Game:
         self.render_world_to_screen()
         pygame.display.flip()
 
-    def draw_pause(self):
-        """Desenhar menu de pausa"""
-        # Só redesenhar se necessário (evita blinking)
-        if not self.pause_menu_dirty:
-            return
-
-        # Desenhar jogo atrás com overlay escuro
-        self.world_surface.fill(BLACK)
-
-        # Desenhar paredes
-        for wall in self.walls:
-            # Sombra
-            shadow_rect = pygame.Rect(wall[0] + 2, wall[1] + 2, wall[2], wall[3])
-            pygame.draw.rect(self.world_surface, DARK_GRAY, shadow_rect)
-            # Parede
-            pygame.draw.rect(self.world_surface, WALL_COLOR, wall)
-
-        # Desenhar objetivo
-        for i in range(3):
-            radius = self.goal_radius - i * 8
-            color_intensity = 255 - i * 60
-            color = (0, color_intensity, 0)
-            pygame.draw.circle(self.world_surface, color, self.goal_pos, radius)
-
-        pygame.draw.circle(self.world_surface, DARK_GREEN, self.goal_pos, self.goal_radius // 2)
+    def render_pause_background(self):
+        """Jogo congelado com o overlay escuro (desenhado uma vez, ao entrar na pausa)"""
+        # Camada estática: paredes e objetivo
+        self.world_surface.blit(self.static_layer(), (0, 0))
 
         # Desenhar minas
         self.draw_mines()
 
         # Desenhar bola na posição pausada
-        self.ball.draw(self.world_surface)
+        self.ball.draw(self.world_surface, self.sprites())
         if self.ball2:
-            self.ball2.draw(self.world_surface)
+            self.ball2.draw(self.world_surface, self.sprites())
 
         # Indicador de direção
         self.draw_direction_indicator()
@@ -2825,7 +5778,7 @@ class Game:
         timer_text = self.font.render(f"{t('time', self.language)}: {self.timer:.1f}s", True, YELLOW)
         self.world_surface.blit(timer_text, (10, 10))
 
-        level_text = self.font.render(f"{t('level', self.language)}: {self.level}", True, WHITE)
+        level_text = self.surface_cache.text(self.font, f"{t('level', self.language)}: {self.level}", WHITE)
         self.world_surface.blit(level_text, (self.world_width - 150, 10))
 
         combined_x = self.accel_x + self.keyboard_accel_x
@@ -2836,7 +5789,7 @@ class Game:
         )
         self.world_surface.blit(accel_text, (10, self.world_height - 30))
 
-        instructions = self.small_font.render("ESC: Pausar | R: Reiniciar", True, GRAY)
+        instructions = self.surface_cache.text(self.small_font, "ESC: Pausar | R: Reiniciar", GRAY)
         self.world_surface.blit(instructions, (self.world_width - 280, self.world_height - 30))
 
         # Overlay escuro
@@ -2844,11 +5797,11 @@ class Game:
         overlay.set_alpha(180)
         overlay.fill(BLACK)
         self.world_surface.blit(overlay, (0, 0))
+        return self.world_surface.copy()
 
-        # Update button texts
-        button_keys = ['resume', 'restart', 'menu']
-        for i, button in enumerate(self.pause_menu_buttons):
-            button.text = t(button_keys[i], self.language)
+    def draw_pause(self):
+        """Desenhar menu de pausa"""
+        self.world_surface.blit(self.pause_background, (0, 0))
 
         # Título
         title = self.font.render(t('paused', self.language), True, WHITE)
@@ -2863,18 +5816,10 @@ class Game:
         self.render_world_to_screen()
         pygame.display.flip()
 
-        # Marcar como limpo
-        self.pause_menu_dirty = False
-
     def draw_win(self):
         """Desenhar tela de vitória com métricas"""
         self.world_surface.fill(BLACK)
 
-        # Update button texts
-        button_keys = ['next_level', 'menu']
-        for i, button in enumerate(self.win_menu_buttons):
-            button.text = t(button_keys[i], self.language)
-
         # Título
         title = self.title_font.render(t('level_complete', self.language), True, GREEN)
         title_rect = title.get_rect(center=(self.world_width // 2, 80))
@@ -2926,9 +5871,6 @@ class Game:
         """Desenhar menu de seleção de modo de jogo com cards verticais"""
         self.world_surface.fill(BLACK)
 
-        # Update button texts and card descriptions
-        self.mode_select_back_button.text = t('back', self.language)
-        
         # Filter available modes
         mode_keys = ['normal', 'minefield', 'timeattack', 'elimination']
         if self.num_players == 2:
@@ -2968,10 +5910,6 @@ class Game:
         """Desenhar tela de input de nome"""
         self.world_surface.fill(BLACK)
 
-        # Update button texts
-        self.name_input_buttons[0].text = t('save', self.language)
-        self.name_input_buttons[1].text = t('discard', self.language)
-
         # Título
         title_text = t('save_progress', self.language)
         title = self.title_font.render(title_text, True, GREEN)
@@ -3017,10 +5955,6 @@ class Game:
         """Desenhar tela de vitória multiplayer"""
         self.world_surface.fill(BLACK)
         
-        # Update button texts
-        self.mp_win_buttons[0].text = t('play_again', self.language)
-        self.mp_win_buttons[1].text = t('menu', self.language)
-        
         # Determine Title based on winner
         winner_text = t('draw', self.language)
         winner_color = WHITE
@@ -3065,11 +5999,6 @@ class Game:
         """Desenhar tela de game over"""
         self.world_surface.fill(BLACK)
 
-        # Update button texts
-        button_keys = ['try_again', 'menu']
-        for i, button in enumerate(self.gameover_buttons):
-            button.text = t(button_keys[i], self.language)
-
         # Título
         title = self.title_font.render(t('game_over', self.language), True, RED)
         title_rect = title.get_rect(center=(self.world_width // 2, 120))
@@ -3178,12 +6107,10 @@ class Game:
             no_data_rect = no_data.get_rect(center=(self.world_width // 2, 300))
             self.world_surface.blit(no_data, no_data_rect)
 
-        # Back button - create once if doesn't exist, update text each frame
+        # Back button - create once if doesn't exist (texto atualizado por apply_language)
         if not hasattr(self, 'player_profile_back_button'):
             self.player_profile_back_button = Button(self.world_width // 2 - 200, 600, 400, 70, t('back', self.language), GRAY)
-
-        # Update button text for language
-        self.player_profile_back_button.text = t('back', self.language)
+            self.apply_language()
         self.player_profile_back_button.draw(self.world_surface, self.font)
 
         # Renderizar na tela
@@ -3204,6 +6131,7 @@ class Game:
                 elif i == 1:  # Definições
                     self.state = "SETTINGS"
                 elif i == 2:  # Leaderboard
+                    self.reset_leaderboard_view()
                     self.state = "LEADERBOARD"
                 elif i == 3:  # Sair
                     self.running = False
@@ -3280,8 +6208,8 @@ class Game:
                 else:
                     # No pending data, go directly
                     if i == 0:  # Tentar Novamente
-                        # Reset everything for a fresh start
-                        self.start_game()
+                        # Reset everything, same mazes (same session seed)
+                        self.start_game(self.session_seed)
                     elif i == 1:  # Menu Principal
                         self.state = "MENU"
 
@@ -3310,7 +6238,10 @@ class Game:
 
     def save_pending_score(self):
         """Save the pending score to database"""
-        if self.pending_score_data and self.name_input.text.strip():
+        saving = bool(self.pending_score_data and self.name_input.text.strip())
+        # O replay de uma pontuação guardada fica em REPLAY_SCORES_DIR, fora do limite replay_keep
+        replay_path = self.save_replay(directory=REPLAY_SCORES_DIR if saving else REPLAY_DIR)
+        if saving:
             self.player_name = self.name_input.text.strip()
             try:
                 self.db.add_score(
@@ -3318,8 +6249,11 @@ class Game:
                     self.pending_score_data['level'],
                     self.pending_score_data['time'],
                     self.pending_score_data['score'],
-                    self.pending_score_data['game_mode']
+                    self.pending_score_data['game_mode'],
+                    replay_path
                 )
+                if self.sync_client:
+                    self.sync_client.request_sync()
             except Exception as e:
                 print(f"Erro ao salvar pontuação: {e}")
 
@@ -3329,32 +6263,11 @@ class Game:
 
     def discard_pending_score(self):
         """Discard the pending score without saving"""
+        self.save_replay()
         # Go to menu without saving
         self.pending_score_data = None
         self.state = "MENU"
 
-    def start_game(self):
-        """Iniciar jogo com modo selecionado"""
-        if not self.serial_connected:
-            self.connect_serial()
-        self.state = "PLAYING"
-        self.level = 1
-        self.total_time = 0
-        self.levels_completed = 0
-        self.total_score = 0
-        self.current_score = 0
-        self.current_time = 0
-        self.winner = None
-        self.player1_score = 0
-        self.player2_score = 0
-        # Resetar vidas baseado no modo
-        mode_config = GAME_MODES.get(self.game_mode, {})
-        self.lives = mode_config.get('initial_lives', 5)
-        self.max_lives = self.lives
-        self.player1_lives = self.lives
-        self.player2_lives = self.lives
-        self.init_level()
-
     def handle_settings_events(self, event):
         """Tratar eventos do menu de definições"""
         # Volume slider
@@ -3364,14 +6277,11 @@ class Game:
         if old_volume != self.game_volume:
             self.config.set('game_volume', self.game_volume)
             # Update sound volumes
-            if self.sound_level_complete:
-                self.sound_level_complete.set_volume(self.game_volume)
-            if self.sound_mine_hit:
-                self.sound_mine_hit.set_volume(self.game_volume)
-            if self.sound_game_over:
-                self.sound_game_over.set_volume(self.game_volume)
-            if self.sound_wall_collision:
-                self.sound_wall_collision.set_volume(self.game_volume * 0.3)  # Keep wall collision quieter
+            self.sounds.set_volume(self.game_volume)
+            if old_volume <= 0 < self.game_volume:
+                self.queue_sound_preload()
+            if self.config.get('music'):
+                self.music.set_volume(self.game_volume)
 
         # Sensitivity slider
         self.sensitivity_slider.handle_event(event)
@@ -3386,8 +6296,7 @@ class Game:
             mouse_pos = event.pos
             # Language text click (Y: 260)
             if hasattr(self, 'language_text_rect') and self.language_text_rect.collidepoint(mouse_pos):
-                self.language = 'en' if self.language == 'pt' else 'pt'
-                self.config.set('language', self.language)
+                self.set_language('en' if self.language == 'pt' else 'pt')
             # Botão inverter X (ajustado para nova posição Y: 360)
             elif 340 < mouse_pos[1] < 390 and self.world_width // 2 - 150 < mouse_pos[0] < self.world_width // 2 + 200:
                 self.invert_x = not self.invert_x
@@ -3414,6 +6323,87 @@ class Game:
                 if i == 0: # Back
                     self.state = "MENU"
 
+    def reset_leaderboard_view(self):
+        """Recarregar a leaderboard a partir do topo (ao entrar ou mudar de filtro)"""
+        self.leaderboard_first_rank = 1
+        self.leaderboard_scroll = 0
+        self.leaderboard_at_start = True
+        self.leaderboard_highlight_id = None
+        if self.leaderboard_global and self.sync_client:
+            # Top global já está todo em memória (cache da sincronização)
+            self.leaderboard_rows = self.sync_client.get_global_top(self.leaderboard_filter)
+            self.leaderboard_at_end = True
+        else:
+            self.leaderboard_rows = self.db.get_scores_page(LEADERBOARD_PAGE_SIZE, self.leaderboard_filter)
+            self.leaderboard_at_end = len(self.leaderboard_rows) < LEADERBOARD_PAGE_SIZE
+
+    def load_leaderboard_pages(self):
+        """Carregar páginas vizinhas quando o scroll se aproxima das extremidades da janela"""
+        if self.leaderboard_global:
+            return
+        # Página seguinte
+        if not self.leaderboard_at_end and \
+                self.leaderboard_scroll + LEADERBOARD_VISIBLE_ROWS * 2 > len(self.leaderboard_rows):
+            after = Database.score_key(self.leaderboard_rows[-1]) if self.leaderboard_rows else None
+            page = self.db.get_scores_page(LEADERBOARD_PAGE_SIZE, self.leaderboard_filter, after=after)
+            self.leaderboard_rows.extend(page)
+            self.leaderboard_at_end = len(page) < LEADERBOARD_PAGE_SIZE
+
+        # Página anterior (apenas depois de "Ir para mim" ou de descartar linhas do início)
+        if not self.leaderboard_at_start and self.leaderboard_scroll < LEADERBOARD_VISIBLE_ROWS:
+            before = Database.score_key(self.leaderboard_rows[0])
+            page = self.db.get_scores_page(LEADERBOARD_PAGE_SIZE, self.leaderboard_filter, before=before)
+            self.leaderboard_rows[0:0] = page
+            self.leaderboard_scroll += len(page)
+            self.leaderboard_first_rank -= len(page)
+            self.leaderboard_at_start = len(page) < LEADERBOARD_PAGE_SIZE
+
+        # Limitar memória: descartar as linhas mais afastadas da zona visível
+        excess = len(self.leaderboard_rows) - LEADERBOARD_MAX_ROWS
+        if excess > 0:
+            if self.leaderboard_scroll > len(self.leaderboard_rows) // 2:
+                drop = min(excess, self.leaderboard_scroll - LEADERBOARD_VISIBLE_ROWS)
+                if drop > 0:
+                    del self.leaderboard_rows[:drop]
+                    self.leaderboard_scroll -= drop
+                    self.leaderboard_first_rank += drop
+                    self.leaderboard_at_start = False
+            else:
+                del self.leaderboard_rows[-excess:]
+                self.leaderboard_at_end = False
+
+    def scroll_leaderboard(self, delta):
+        """Deslocar a janela visível da leaderboard delta linhas"""
+        self.leaderboard_scroll += delta
+        self.load_leaderboard_pages()
+        max_scroll = max(0, len(self.leaderboard_rows) - LEADERBOARD_VISIBLE_ROWS)
+        self.leaderboard_scroll = max(0, min(self.leaderboard_scroll, max_scroll))
+
+    def jump_to_player_entry(self):
+        """Mostrar a janela da leaderboard em redor da melhor entrada do jogador atual"""
+        if self.leaderboard_global:
+            self.reset_leaderboard_view()
+            best_index = next((i for i, row in enumerate(self.leaderboard_rows) if row[0] == self.player_name), None)
+            if best_index is not None:
+                self.leaderboard_highlight_id = self.leaderboard_rows[best_index][6]
+                self.scroll_leaderboard(best_index - LEADERBOARD_VISIBLE_ROWS // 2)
+            return
+
+        around = self.db.get_scores_around(self.player_name, self.leaderboard_filter,
+                                           rows_before=LEADERBOARD_PAGE_SIZE,
+                                           rows_after=LEADERBOARD_PAGE_SIZE)
+        if around is None:
+            return
+        rows, first_rank = around
+        best_index = next(i for i, row in enumerate(rows) if row[0] == self.player_name)
+        self.leaderboard_rows = rows
+        self.leaderboard_first_rank = first_rank
+        self.leaderboard_at_start = first_rank == 1
+        self.leaderboard_at_end = len(rows) - best_index - 1 < LEADERBOARD_PAGE_SIZE
+        self.leaderboard_highlight_id = rows[best_index][6]
+        self.leaderboard_scroll = 0
+        self.scroll_leaderboard(best_index - LEADERBOARD_VISIBLE_ROWS // 2)
+
     def handle_leaderboard_events(self, event):
         """Tratar eventos da leaderboard"""
         # Handle filter buttons
@@ -3429,8 +6419,35 @@ class Game:
                     self.leaderboard_filter = 'timeattack'
                 elif i == 4:
                     self.leaderboard_filter = 'elimination'
+                self.reset_leaderboard_view()
                 return
 
+        if self.leaderboard_jump_button.handle_event(event):
+            self.jump_to_player_entry()
+            return
+
+        if self.sync_client and self.leaderboard_scope_button.handle_event(event):
+            self.leaderboard_global = not self.leaderboard_global
+            self.reset_leaderboard_view()
+            return
+
+        # Scroll com roda do rato e teclado (páginas carregadas sob pedido)
+        if event.type == pygame.MOUSEWHEEL:
+            self.scroll_leaderboard(-event.y * 3)
+            return
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_DOWN:
+                self.scroll_leaderboard(1)
+            elif event.key == pygame.K_UP:
+                self.scroll_leaderboard(-1)
+            elif event.key == pygame.K_PAGEDOWN:
+                self.scroll_leaderboard(LEADERBOARD_VISIBLE_ROWS)
+            elif event.key == pygame.K_PAGEUP:
+                self.scroll_leaderboard(-LEADERBOARD_VISIBLE_ROWS)
+            elif event.key == pygame.K_HOME:
+                self.reset_leaderboard_view()
+            return
+
         # Handle clicks on leaderboard entries
         if event.type == pygame.MOUSEBUTTONDOWN and hasattr(self, 'leaderboard_entry_rects'):
             for entry_rect, player_name in self.leaderboard_entry_rects:
@@ -3446,18 +6463,10 @@ class Game:
 
     def handle_pause_events(self, event):
         """Tratar eventos do menu de pausa"""
-        # Marcar menu como dirty quando há eventos de mouse
-        if event.type == pygame.MOUSEMOTION or event.type == pygame.MOUSEBUTTONDOWN:
-            self.pause_menu_dirty = True
-
         for i, button in enumerate(self.pause_menu_buttons):
             if button.handle_event(event):
                 if i == 0:  # Continuar
-                    # Restaurar velocidade da bola
-                    self.ball.vx = self.paused_vx
-                    self.ball.vy = self.paused_vy
-                    self.state = "PLAYING"
-                    self.level_start_time = time.time() - self.timer
+                    self.resume_game()
                 elif i == 1:  # Reiniciar
                     self.start_game()
                 elif i == 2:  # Menu
@@ -3470,8 +6479,7 @@ class Game:
                 if i == 0:  # Próximo nível
                     try:
                         # Nível já foi incrementado em check_win
-                        self.init_level()
-                        self.state = "PLAYING"
+                        self.continue_level()
                     except Exception as e:
                         print(f"Erro ao iniciar próximo nível: {e}")
                         self.state = "MENU"
@@ -3483,101 +6491,119 @@ class Game:
                     else:
                         self.state = "MENU"
 
-    def update_cursor(self):
-        """Update mouse cursor based on hover state"""
-        should_be_hand = False
-        
-        # Check active buttons based on state
-        active_buttons = []
-        if self.state == "MENU":
-            active_buttons = self.main_menu_buttons
-        elif self.state == "SETTINGS":
-            active_buttons = self.settings_buttons
-            # Check sliders
-            if self.volume_slider.rect.collidepoint(pygame.mouse.get_pos()) or \
-               self.sensitivity_slider.rect.collidepoint(pygame.mouse.get_pos()):
-                should_be_hand = True
-            # Check texts
-            mouse_pos = pygame.mouse.get_pos()
-            scale, offset_x, offset_y = self.get_scale_and_offset()
-            world_mouse_x = (mouse_pos[0] - offset_x) / scale
-            world_mouse_y = (mouse_pos[1] - offset_y) / scale
-            
-            if hasattr(self, 'language_text_rect') and self.language_text_rect.collidepoint(world_mouse_x, world_mouse_y):
-                should_be_hand = True
-            if hasattr(self, 'connection_text_rect') and self.connection_text_rect.collidepoint(world_mouse_x, world_mouse_y):
-                should_be_hand = True
-            if hasattr(self, 'show_controls_text_rect') and self.show_controls_text_rect.collidepoint(world_mouse_x, world_mouse_y):
-                should_be_hand = True
-            if hasattr(self, 'text_x_rect') and self.text_x_rect.collidepoint(world_mouse_x, world_mouse_y):
-                should_be_hand = True
-            if hasattr(self, 'text_y_rect') and self.text_y_rect.collidepoint(world_mouse_x, world_mouse_y):
-                should_be_hand = True
-            if hasattr(self, 'text_swap_rect') and self.text_swap_rect.collidepoint(world_mouse_x, world_mouse_y):
-                should_be_hand = True
-                
-        elif self.state == "LEADERBOARD":
-            active_buttons = self.leaderboard_buttons + self.leaderboard_filter_buttons
-            # Check entries
-            if hasattr(self, 'leaderboard_entry_rects'):
-                mouse_pos = pygame.mouse.get_pos()
-                scale, offset_x, offset_y = self.get_scale_and_offset()
-                world_mouse_x = (mouse_pos[0] - offset_x) / scale
-                world_mouse_y = (mouse_pos[1] - offset_y) / scale
-                for entry_rect, _ in self.leaderboard_entry_rects:
-                    if entry_rect.collidepoint(world_mouse_x, world_mouse_y):
-                        should_be_hand = True
-                        break
-        elif self.state == "PAUSED":
-            active_buttons = self.pause_menu_buttons
-        elif self.state == "WIN":
-            active_buttons = self.win_menu_buttons
-        elif self.state == "MP_WIN":
-            active_buttons = self.mp_win_buttons
-        elif self.state == "GAME_OVER":
-            active_buttons = self.gameover_buttons
-        elif self.state == "MODE_SELECT":
-            active_buttons = [self.mode_select_back_button]
-            # Check cards
-            for card in self.mode_cards:
-                # Need to check against active cards only? Or check all, hidden ones wont trigger
-                # Card is_hovered is updated in handle_event, let's check rect directly
-                mouse_pos = pygame.mouse.get_pos()
-                scale, offset_x, offset_y = self.get_scale_and_offset()
-                world_mouse_x = (mouse_pos[0] - offset_x) / scale
-                world_mouse_y = (mouse_pos[1] - offset_y) / scale
-                if card.rect.collidepoint(world_mouse_x, world_mouse_y):
-                    should_be_hand = True
-        elif self.state == "PLAYER_SELECT":
-            active_buttons = self.player_select_buttons
-        elif self.state == "DIFFICULTY_SELECT":
-            if hasattr(self, 'difficulty_buttons'):
-                active_buttons = self.difficulty_buttons
-        elif self.state == "STM32_SETUP":
-            if hasattr(self, 'stm32_setup_buttons'):
-                active_buttons = self.stm32_setup_buttons
-        elif self.state == "CONTROLS":
-            if hasattr(self, 'controls_back_button'):
-                active_buttons = [self.controls_back_button]
-        elif self.state == "PLAYER_PROFILE":
-            if hasattr(self, 'player_profile_back_button'):
-                active_buttons = [self.player_profile_back_button]
-        elif self.state == "NAME_INPUT":
-            active_buttons = self.name_input_buttons
-
-        # Check buttons
-        if not should_be_hand:
-            for button in active_buttons:
-                # Button hover is already handled? No, let's check logic
-                # Button.rect is world coords
-                mouse_pos = pygame.mouse.get_pos()
-                scale, offset_x, offset_y = self.get_scale_and_offset()
-                world_mouse_x = (mouse_pos[0] - offset_x) / scale
-                world_mouse_y = (mouse_pos[1] - offset_y) / scale
-                if button.rect.collidepoint(world_mouse_x, world_mouse_y):
-                    should_be_hand = True
-                    break
-        
+    def create_scenes(self):
+        """Registo estado -> Scene (eventos, desenho, ESC e rects com cursor de mão de cada ecrã)"""
+        def rects(*groups):
+            return [item.rect for group in groups for item in group]
+
+        def optional(*names):
+            # Atributos criados só quando o ecrã é desenhado pela primeira vez
+            return [item for item in (getattr(self, name, None) for name in names) if item is not None]
+
+        def settings_hover():
+            return (rects(self.settings_buttons, (self.volume_slider, self.sensitivity_slider)) +
+                    optional('language_text_rect', 'connection_text_rect', 'show_controls_text_rect',
+                                   'text_x_rect', 'text_y_rect', 'text_swap_rect'))
+
+        def leaderboard_hover():
+            buttons = self.leaderboard_buttons + self.leaderboard_filter_buttons + [self.leaderboard_jump_button]
+            if self.sync_client:
+                buttons.append(self.leaderboard_scope_button)
+            entries = [entry_rect for entry_rect, _ in getattr(self, 'leaderboard_entry_rects', ())]
+            return rects(buttons) + entries
+
+        result_scene = lambda handle_event, draw, buttons: ResultScene(
+            self, handle_event, draw, back="MENU", hover=lambda: rects(buttons()))
+        return {
+            "MENU": Scene(self, self.handle_menu_events, self.draw_menu,
+                          hover=lambda: rects(self.main_menu_buttons)),
+            "DIFFICULTY_SELECT": Scene(self, self.handle_difficulty_select_events, self.draw_difficulty_select,
+                                       back="MENU", hover=lambda: rects(*optional('difficulty_buttons'))),
+            "PLAYER_SELECT": Scene(self, self.handle_player_select_events, self.draw_player_select,
+                                   back="DIFFICULTY_SELECT", hover=lambda: rects(self.player_select_buttons)),
+            "STM32_SETUP": Scene(self, self.handle_stm32_setup_events, self.draw_stm32_setup,
+                                 back="PLAYER_SELECT", hover=lambda: rects(*optional('stm32_setup_buttons')),
+                                 refresh=1.0),
+            "MODE_SELECT": Scene(self, self.handle_mode_select_events, self.draw_mode_select, back="PLAYER_SELECT",
+                                 hover=lambda: rects([self.mode_select_back_button], self.mode_cards)),
+            "SETTINGS": Scene(self, self.handle_settings_events, self.draw_settings, back="MENU",
+                              hover=settings_hover, refresh=1.0),
+            "CONTROLS": Scene(self, self.handle_controls_events, self.draw_controls, back="SETTINGS",
+                              hover=lambda: rects(optional('controls_back_button'))),
+            "LEADERBOARD": Scene(self, self.handle_leaderboard_events, self.draw_leaderboard, back="MENU",
+                                 hover=leaderboard_hover, refresh=1.0),
+            "PLAYER_PROFILE": Scene(self, self.handle_player_profile_events, self.draw_player_profile,
+                                    back="LEADERBOARD", hover=lambda: rects(optional('player_profile_back_button'))),
+            "PLAYING": PlayingScene(self, draw=self.draw_playing),
+            "PAUSED": PausedScene(self, self.handle_pause_events, self.draw_pause,
+                                  hover=lambda: rects(self.pause_menu_buttons)),
+            "WIN": result_scene(self.handle_win_events, self.draw_win, lambda: self.win_menu_buttons),
+            "MP_WIN": result_scene(self.handle_mp_win_events, self.draw_mp_win, lambda: self.mp_win_buttons),
+            "GAME_OVER": result_scene(self.handle_gameover_events, self.draw_gameover,
+                                      lambda: self.gameover_buttons),
+            "NAME_INPUT": Scene(self, self.handle_name_input_events, self.draw_name_input,
+                                back=self.discard_pending_score, hover=lambda: rects(self.name_input_buttons),
+                                refresh=0.5),  # Cursor do texto a piscar
+        }
+
+    def active_scene(self):
+        """Cena do estado atual; chama on_exit / on_enter quando o estado mudou desde a última vez"""
+        if self.state != self.scene_state:
+            previous = self.scenes.get(self.scene_state)
+            if previous:
+                previous.on_exit()
+            self.scene_state = self.state
+            scene = self.scenes[self.state]
+            scene.invalidate_layout()
+            scene.on_enter()
+            self.needs_redraw = True
+            self.hover_index = None
+            self.update_hover()
+        return self.scenes[self.state]
+
+    def can_idle(self, scene):
+        """Nada para atualizar nem desenhar até ao próximo evento (ou refresh da cena)"""
+        return not (self.needs_redraw or scene.is_animated() or self.startup_tasks or
+                    not self.first_frame_done or self.profiler.enabled or self.refresh_due(scene))
+
+    def refresh_due(self, scene):
+        return scene.refresh is not None and time.perf_counter() - self.last_redraw >= scene.refresh
+
+    def idle_timeout(self, scene):
+        """Milissegundos a esperar por eventos: até ao próximo refresh da cena, no máximo IDLE_MAX_WAIT_MS"""
+        if scene.refresh is None:
+            return IDLE_MAX_WAIT_MS
+        remaining = self.last_redraw + scene.refresh - time.perf_counter()
+        return max(1, min(IDLE_MAX_WAIT_MS, int(remaining * 1000) + 1))
+
+    def pause_game(self):
+        # Salvar velocidade da bola antes de pausar e congelá-la
+        self.paused_vx = self.ball.vx
+        self.paused_vy = self.ball.vy
+        self.ball.vx = 0
+        self.ball.vy = 0
+        self.state = "PAUSED"
+
+    def resume_game(self):
+        # Restaurar velocidade da bola
+        self.ball.vx = self.paused_vx
+        self.ball.vy = self.paused_vy
+        self.state = "PLAYING"
+
+    def advance_replay(self, dt):
+        self.replay_player.advance_time(dt, self.replay_speed)
+        if self.replay_player.finished:
+            self.finish_replay()
+
+    def update_hover(self):
+        """Elemento debaixo do rato e cursor de mão; devolve True se o elemento mudou.
+
+        Só é chamado quando o rato se move ou o ecrã foi redesenhado (os rects podem ter mudado)."""
+        hover_index = self.active_scene().hit_test(*self.mouse_world_pos)
+        hover_changed = hover_index != self.hover_index
+        self.hover_index = hover_index
+        should_be_hand = hover_index is not None
+
         # Update cursor only if changed
         if should_be_hand != self.cursor_hand_active:
             self.cursor_hand_active = should_be_hand
@@ -3585,35 +6611,35 @@ class Game:
                 pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_HAND)
             else:
                 pygame.mouse.set_cursor(pygame.SYSTEM_CURSOR_ARROW)
-
-    def force_finish_mp_game(self):
-        """Force finish the MP game if one player is waiting"""
-        current_time = time.time() - self.level_start_time
-        
-        if self.player1_finished and not self.player2_finished:
-            self.player2_finished = True
-            self.player2_time = current_time + 10 # Penalty
-            # Stop ball
-            if self.ball2:
-                self.ball2.vx = 0
-                self.ball2.vy = 0
-            
-        elif self.player2_finished and not self.player1_finished:
-            self.player1_finished = True
-            self.player1_time = current_time + 10
-            # Stop ball
-            self.ball.vx = 0
-            self.ball.vy = 0
-            
-        # The main loop will check 'if p1_finished and p2_finished' in the next frame and trigger win
+        return hover_changed
 
     def run(self):
         """Loop principal do jogo"""
         while self.running:
-            dt = self.clock.tick(FPS) / 1000.0
-
-            # Eventos
-            for event in pygame.event.get():
+            prof = self.profiler if self.profiler.enabled else None
+            scene = self.active_scene()
+            if self.can_idle(scene):
+                # Ecrã estático sem alterações: bloquear até haver um evento (sem gastar CPU)
+                event = pygame.event.wait(self.idle_timeout(scene))
+                events = [event] if event.type != pygame.NOEVENT else []
+                events += pygame.event.get()
+                dt = self.clock.tick() / 1000.0
+            else:
+                if prof:
+                    prof.begin('wait')
+                dt = self.clock.tick(FPS) / 1000.0
+                events = pygame.event.get()
+            if prof:
+                prof.end()
+                prof.begin('events')
+
+            # Eventos (os do rato já em coordenadas do mundo)
+            mouse_moved = False
+            for event in self.pointer_events(events):
+                # Input redesenha o ecrã; movimento do rato só com um botão premido (sliders)
+                # ou se mudar o elemento debaixo do cursor (ver update_hover)
+                if event.type != pygame.MOUSEMOTION or any(event.buttons):
+                    self.needs_redraw = True
                 if event.type == pygame.QUIT:
                     self.running = False
                 elif event.type == pygame.VIDEORESIZE:
@@ -3624,341 +6650,341 @@ class Game:
                         (self.window_width, self.window_height),
                         pygame.RESIZABLE
                     )
+                    # A mesma posição no ecrã corresponde agora a outro ponto do mundo
+                    world_x, world_y = self.screen_to_world(*pygame.mouse.get_pos())
+                    self.mouse_world_pos = (int(world_x), int(world_y))
+                    mouse_moved = True
                 elif event.type == pygame.KEYDOWN:
                     if event.key == pygame.K_ESCAPE:
                         # Verificar cooldown para prevenir múltiplas alternâncias
                         current_time = time.time()
                         if current_time - self.last_esc_time > self.esc_cooldown:
                             self.last_esc_time = current_time
-                            if self.state == "PLAYING":
-                                # Salvar velocidade da bola antes de pausar
-                                self.paused_vx = self.ball.vx
-                                self.paused_vy = self.ball.vy
-                                # Congelar a bola
-                                self.ball.vx = 0
-                                self.ball.vy = 0
-                                self.state = "PAUSED"
-                                self.pause_menu_dirty = True
-                            elif self.state == "PAUSED":
-                                # Restaurar velocidade da bola
-                                self.ball.vx = self.paused_vx
-                                self.ball.vy = self.paused_vy
-                                self.state = "PLAYING"
-                                self.level_start_time = time.time() - self.timer
-                            
-                            # Menu Navigation Back Logic
-                            elif self.state == "SETTINGS":
-                                self.state = "MENU"
-                            elif self.state == "CONTROLS":
-                                self.state = "SETTINGS"
-                            elif self.state == "LEADERBOARD":
-                                self.state = "MENU"
-                            elif self.state == "PLAYER_PROFILE":
-                                self.state = "LEADERBOARD"
-                            elif self.state == "DIFFICULTY_SELECT":
-                                self.state = "MENU"
-                            elif self.state == "PLAYER_SELECT":
-                                self.state = "DIFFICULTY_SELECT"
-                            elif self.state == "MODE_SELECT":
-                                self.state = "PLAYER_SELECT"
-                            elif self.state == "STM32_SETUP":
-                                self.state = "PLAYER_SELECT"
-                            elif self.state == "NAME_INPUT":
-                                self.discard_pending_score()
-                            elif self.state in ["GAME_OVER", "WIN", "MP_WIN"]:
-                                self.state = "MENU"
-
-                    elif event.key == pygame.K_r and self.state == "PLAYING":
-                        self.init_level()
+                            self.active_scene().on_escape()
                     elif event.key == pygame.K_F11:
                         # Alternar fullscreen
                         pygame.display.toggle_fullscreen()
-                    elif event.key == pygame.K_t:
-                         # Force Finish in MP Normal Mode
-                         if self.state == "PLAYING" and self.num_players == 2 and self.game_mode == 'normal':
-                             if self.player1_finished or self.player2_finished:
-                                 self.force_finish_mp_game()
-
-                # Converter coordenadas do mouse para coordenadas do mundo
-                if event.type == pygame.MOUSEMOTION or event.type == pygame.MOUSEBUTTONDOWN:
-                    if hasattr(event, 'pos'):
-                        world_pos = self.screen_to_world(event.pos[0], event.pos[1])
-                        # Criar novo evento com coordenadas do mundo
-                        event_dict = event.__dict__.copy()
-                        event_dict['pos'] = (int(world_pos[0]), int(world_pos[1]))
-                        event = type(event)(event.type, event_dict)
-
-                # Eventos específicos do estado
-                if self.state == "MENU":
-                    self.handle_menu_events(event)
-                elif self.state == "PLAYER_SELECT":
-                    self.handle_player_select_events(event)
-                elif self.state == "STM32_SETUP":
-                    self.handle_stm32_setup_events(event)
-                elif self.state == "MODE_SELECT":
-                    self.handle_mode_select_events(event)
-                elif self.state == "SETTINGS":
-                    self.handle_settings_events(event)
-                elif self.state == "CONTROLS":
-                    self.handle_controls_events(event)
-                elif self.state == "LEADERBOARD":
-                    self.handle_leaderboard_events(event)
-                elif self.state == "PLAYER_PROFILE":
-                    self.handle_player_profile_events(event)
-                elif self.state == "PAUSED":
-                    self.handle_pause_events(event)
-                elif self.state == "WIN":
-                    self.handle_win_events(event)
-                elif self.state == "MP_WIN":
-                    self.handle_mp_win_events(event)
-                elif self.state == "NAME_INPUT":
-                    self.handle_name_input_events(event)
-                elif self.state == "GAME_OVER":
-                    self.handle_gameover_events(event)
-                elif self.state == "DIFFICULTY_SELECT":
-                    self.handle_difficulty_select_events(event)
-            
-            # Update Cursor State
-            self.update_cursor()
-
-            # Atualização do jogo
-            if self.state == "PLAYING":
-                # Ler dados
-                self.read_serial()
-                self.handle_keyboard()
-
-                # Atualizar sensibilidade da bola
-                self.ball.sensitivity = self.sensitivity
-                if self.ball2:
-                    self.ball2.sensitivity = self.sensitivity
-
-                # PHYSICS SUB-STEPPING (Fix collision bugs)
-                physics_steps = 4
-                dt_step = dt / physics_steps
-                
-                # Calculate friction per sub-step to preserve original friction feel
-                friction_per_substep = FRICTION**(1/physics_steps)
-                
-                for _ in range(physics_steps):
-                    # Player 1 Update
-                    if not self.player1_finished:
-                        combined_accel_x = self.accel_x + self.keyboard_accel_x
-                        combined_accel_y = self.accel_y + self.keyboard_accel_y
-                        collided1 = self.ball.update(combined_accel_x, combined_accel_y, dt_step, self.walls, friction_per_substep)
-                        if collided1 and self.sound_wall_collision:
-                            # Limit sound frequency
-                            if time.time() - self.last_beep_time > 0.1:
-                                self.sound_wall_collision.play()
-                                self.last_beep_time = time.time()
-                        
-                        # Check mines P1
-                        if len(self.mines) > 0:
-                            for mine in self.mines[:]:
-                                distance = math.sqrt((self.ball.x - mine.x)**2 + (self.ball.y - mine.y)**2)
-                                if distance < BALL_RADIUS + mine.size:
-                                    self.mines.remove(mine)
-                                    self.send_mine_command()
-                                    
-                                    if self.num_players == 2:
-                                        self.player1_lives -= 1
-                                        if self.player1_lives <= 0:
-                                            self.winner = "Player 2"
-                                            self.lives = 0 
-                                    else:
-                                        self.lives -= 1
-                                        
-                                    self.mine_hit_animation_time = time.time()
-                                    if self.sound_mine_hit:
-                                        self.sound_mine_hit.play()
-                                    # Reset P1 pos
-                                    offset = BALL_RADIUS + 2
-                                    self.ball.x = MAZE_MARGIN + 60 
-                                    self.ball.y = MAZE_MARGIN_TOP + 60
-                                    self.ball.vx = 0
-                                    self.ball.vy = 0
-                                    break
-
-                    # Player 2 Update
-                    if self.num_players == 2 and self.ball2 and not self.player2_finished:
-                        combined_accel2_x = self.accel2_x + self.keyboard2_accel_x
-                        combined_accel2_y = self.accel2_y + self.keyboard2_accel_y
-                        collided2 = self.ball2.update(combined_accel2_x, combined_accel2_y, dt_step, self.walls, friction_per_substep)
-                        if collided2 and self.sound_wall_collision:
-                             if time.time() - self.last_beep_time > 0.1:
-                                self.sound_wall_collision.play()
-                                self.last_beep_time = time.time()
-
-                        # Check mines P2
-                        if len(self.mines) > 0:
-                            for mine in self.mines[:]:
-                                distance = math.sqrt((self.ball2.x - mine.x)**2 + (self.ball2.y - mine.y)**2)
-                                if distance < BALL_RADIUS + mine.size:
-                                    self.mines.remove(mine)
-                                    self.send_mine_command()
-                                    
-                                    self.player2_lives -= 1
-                                    if self.player2_lives <= 0:
-                                        self.winner = "Player 1"
-                                        self.lives = 0
-                                    
-                                    self.mine_hit_animation_time = time.time()
-                                    if self.sound_mine_hit:
-                                        self.sound_mine_hit.play()
-                                    # Reset P2 pos
-                                    offset_y = BALL_RADIUS * 2 + 10
-                                    self.ball2.x = MAZE_MARGIN + 60
-                                    self.ball2.y = MAZE_MARGIN_TOP + 60 + offset_y
-                                    self.ball2.vx = 0
-                                    self.ball2.vy = 0
-                                    break
-
-                # Game Over Condition
-                if self.lives <= 0 or (self.num_players == 2 and (self.player1_lives <= 0 or self.player2_lives <= 0)):
-                    if self.sound_game_over:
-                        self.sound_game_over.play()
-                    
-                    # Calculate final scores for multiplayer based on progress
-                    if self.num_players == 2 and self.game_mode == 'elimination':
-                        dist1 = math.sqrt((self.ball.x - self.goal_pos[0])**2 + (self.ball.y - self.goal_pos[1])**2)
-                        dist2 = math.sqrt((self.ball2.x - self.goal_pos[0])**2 + (self.ball2.y - self.goal_pos[1])**2)
-                        
-                        # Add progress scores if not already finished
-                        if not self.player1_finished and hasattr(self, 'p1_start_dist') and self.p1_start_dist > 0:
-                            if dist1 < self.p1_start_dist:
-                                p1_partial = int(1000 * (self.p1_start_dist - dist1) / self.p1_start_dist)
-                                self.player1_score += p1_partial
-                        
-                        if not self.player2_finished and hasattr(self, 'p2_start_dist') and self.p2_start_dist > 0:
-                            if dist2 < self.p2_start_dist:
-                                p2_partial = int(1000 * (self.p2_start_dist - dist2) / self.p2_start_dist)
-                                self.player2_score += p2_partial
-                    
-                    # Determine score to save
-                    if self.num_players == 2:
-                        if self.winner == "Player 1":
-                            score_to_save = self.player1_score
-                        elif self.winner == "Player 2":
-                            score_to_save = self.player2_score
+                    elif event.key == pygame.K_F3:
+                        # Overlay do profiler de frames
+                        self.profiler.enabled = not self.profiler.enabled
+                        self.config.set('show_profiler', self.profiler.enabled)
+                    elif event.key == pygame.K_F4:
+                        # Gravar / guardar trace (formato Chrome trace-event)
+                        if self.profiler.tracing:
+                            trace_path = self.profiler.stop_trace()
+                            if trace_path:
+                                print(f"Trace guardado em {trace_path}")
                         else:
-                            score_to_save = max(self.player1_score, self.player2_score)
-                    else:
-                        score_to_save = self.total_score if self.levels_completed > 0 else self.precision_score
-                        
-                    self.pending_score_data = {
-                        'level': self.level,
-                        'time': self.total_time,
-                        'score': score_to_save,
-                        'game_mode': self.game_mode,
-                        'is_game_over': True
-                    }
-                    self.state = "GAME_OVER"
+                            self.profiler.enabled = True
+                            self.profiler.start_trace()
 
-                # Timer Update
-                mode_config = GAME_MODES.get(self.game_mode, {})
-                if mode_config.get('timer_direction') == 'down':
-                    self.timer -= dt
-                    if self.timer <= 0:
-                        self.timer = 0
-                        if self.sound_game_over:
-                            self.sound_game_over.play()
-                        
-                        # Elimination Mode Logic: Time Out
-                        if self.game_mode == 'elimination' and self.num_players == 2:
-                            # If time runs out, whoever didn't finish loses.
-                            # If both didn't finish, the one furthest from goal loses (closest wins).
-                            
-                            # Calculate current distances
-                            dist1 = math.sqrt((self.ball.x - self.goal_pos[0])**2 + (self.ball.y - self.goal_pos[1])**2)
-                            dist2 = math.sqrt((self.ball2.x - self.goal_pos[0])**2 + (self.ball2.y - self.goal_pos[1])**2)
-                            
-                            # Calculate partial scores based on progress from start
-                            if not self.player1_finished:
-                                if hasattr(self, 'p1_start_dist') and self.p1_start_dist > 0 and dist1 < self.p1_start_dist:
-                                    # Score based on % distance covered
-                                    p1_partial = int(1000 * (self.p1_start_dist - dist1) / self.p1_start_dist)
-                                    self.player1_score += p1_partial
-                                
-                            if not self.player2_finished:
-                                if hasattr(self, 'p2_start_dist') and self.p2_start_dist > 0 and dist2 < self.p2_start_dist:
-                                    p2_partial = int(1000 * (self.p2_start_dist - dist2) / self.p2_start_dist)
-                                    self.player2_score += p2_partial
-                            
-                            # Determine Winner based on scores (not just distance)
-                            if self.player1_finished and not self.player2_finished:
-                                self.winner = "Player 1"
-                            elif self.player2_finished and not self.player1_finished:
-                                self.winner = "Player 2"
-                            else:
-                                # Both failed to finish - winner is who has more points
-                                if self.player1_score > self.player2_score:
-                                    self.winner = "Player 1"
-                                elif self.player2_score > self.player1_score:
-                                    self.winner = "Player 2"
-                                else:
-                                    self.winner = "Draw"
-                            
-                            self.state = "MP_WIN"
-                        else:
-                            # Standard Game Over
-                            score_to_save = self.total_score if self.levels_completed > 0 else self.precision_score
-                            self.pending_score_data = {
-                                'level': self.level,
-                                'time': self.total_time,
-                                'score': score_to_save,
-                                'game_mode': self.game_mode,
-                                'is_game_over': True
-                            }
-                            self.state = "GAME_OVER"
-                else:
-                    self.timer = time.time() - self.level_start_time
-
-                # Atualizar animações
-                if self.mine_hit_animation_time > 0:
-                    if time.time() - self.mine_hit_animation_time > 0.5:
-                        self.mine_hit_animation_time = 0
-
-                # Verificar vitória
-                self.check_win()
-
-            # Desenho
-            if self.state == "MENU":
-                self.draw_menu()
-            elif self.state == "PLAYER_SELECT":
-                self.draw_player_select()
-            elif self.state == "STM32_SETUP":
-                self.draw_stm32_setup()
-            elif self.state == "MODE_SELECT":
-                self.draw_mode_select()
-            elif self.state == "SETTINGS":
-                self.draw_settings()
-            elif self.state == "CONTROLS":
-                self.draw_controls()
-            elif self.state == "LEADERBOARD":
-                self.draw_leaderboard()
-            elif self.state == "PLAYER_PROFILE":
-                self.draw_player_profile()
-            elif self.state == "PLAYING":
-                self.draw_playing()
-            elif self.state == "PAUSED":
-                self.draw_pause()
-            elif self.state == "WIN":
-                self.draw_win()
-            elif self.state == "MP_WIN":
-                self.draw_mp_win()
-            elif self.state == "NAME_INPUT":
-                self.draw_name_input()
-            elif self.state == "GAME_OVER":
-                self.draw_gameover()
-            elif self.state == "DIFFICULTY_SELECT":
-                self.draw_difficulty_select()
+                elif event.type == pygame.MOUSEMOTION:
+                    self.mouse_world_pos = event.pos
+                    mouse_moved = True
+
+                # Eventos específicos do estado
+                self.active_scene().on_event(event)
+
+            # Hit-test só quando o rato se mexeu (ou a cena mudou: ver active_scene)
+            if mouse_moved and self.update_hover():
+                self.needs_redraw = True
+            if prof:
+                prof.end()
+
+            # Atualização do jogo (input e física no PLAYING, replay / bot nos ecrãs de resultado)
+            self.active_scene().update(dt)
+
+            # Música só durante o jogo (um bloco novo quando a fila do canal esvazia)
+            self.music.update(self.state == "PLAYING", self.music_tempo())
+
+            # Desenho (inclui display.flip; 'render' e 'overlay' são medidos à parte)
+            if prof:
+                prof.begin('draw')
+            scene = self.active_scene()
+            if scene.is_animated() or self.needs_redraw or self.refresh_due(scene):
+                scene.draw()
+                self.needs_redraw = False
+                self.last_redraw = time.perf_counter()
+                if scene.hover is not None:
+                    # O desenho (re)posiciona os elementos: refazer a grelha e o elemento debaixo do rato
+                    scene.invalidate_layout()
+                    if self.update_hover():
+                        self.needs_redraw = True
+            if not self.first_frame_done or self.startup_tasks:
+                self.run_startup_task()
+            if prof:
+                prof.end()
+                prof.end_frame()
 
         # Fechar
+        if self.profiler.tracing:
+            self.profiler.stop_trace()
         if self.serial_port:
             self.serial_port.close()
-        self.db.close()
+        if self.sync_client:
+            self.sync_client.stop()
+        self.save_replay()
+        self.level_preloader.shutdown()
+        if self.maze_cache.executor:
+            self.maze_cache.executor.shutdown(wait=False, cancel_futures=True)
+        if self.database:
+            self.database.close()
         pygame.quit()
 
+def run_export_command(args):
+    """Subcomando: exportar leaderboard / player_stats"""
+    db = Database(args.db)
+    try:
+        start = time.perf_counter()
+        count = export_table(db, args.table, args.path, args.format, args.chunk_size)
+        print(f"{count} linhas de '{args.table}' exportadas para {args.path} "
+              f"em {time.perf_counter() - start:.2f}s")
+    finally:
+        db.close()
+
+
+def run_import_command(args):
+    """Subcomando: importar leaderboard / player_stats"""
+    db = Database(args.db)
+    try:
+        start = time.perf_counter()
+        read, inserted = import_table(db, args.table, args.path, args.format, args.chunk_size, args.stats_merge)
+        print(f"{read} linhas lidas, {inserted} novas em '{args.table}' "
+              f"({time.perf_counter() - start:.2f}s)")
+    finally:
+        db.close()
+
+
+def run_sync_server_command(args):
+    """Subcomando: servidor local que agrega as leaderboards dos quiosques"""
+    server = LeaderboardSyncServer(args.db, args.host, args.port)
+    print(f"Servidor de sincronização em http://{args.host}:{args.port} (base de dados: {args.db})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def run_simulate_command(args):
+    """Subcomando: correr o jogo sem janela com input sintético"""
+    sim = Simulation(args.mode, args.difficulty, args.players, seed=args.seed)
+    sim.record_replays = bool(args.record)
+    sim.difficulty_band = tuple(args.band) if args.band else None
+    controller = MazeBot() if args.bot else random_tilt_controller(args.seed)
+    start = time.perf_counter()
+    frames = sim.run_headless(controller, max_frames=args.frames, max_levels=args.levels)
+    elapsed = time.perf_counter() - start
+    print(f"Estado final: {sim.state} | nível {sim.level} | níveis completos {sim.levels_completed} | "
+          f"vidas {sim.lives} | pontuação {sim.total_score}")
+    print(f"{frames} frames ({sim.sim_time:.1f}s de jogo) em {elapsed:.2f}s "
+          f"({frames / max(elapsed, 1e-9):.0f} frames/s)")
+    if args.record:
+        path = sim.save_replay(args.record)
+        if path:
+            print(f"Replay guardado em {path} ({os.path.getsize(path)} bytes)")
+
+
+def run_replay_command(args):
+    """Subcomando: re-simular um replay sem janela (e verificar o resultado) ou vê-lo no ecrã"""
+    replay = Replay.open(args.path)
+    try:
+        if args.watch:
+            game = Game()
+            game.watch_replay(replay, args.speed)
+            game.run()
+            return
+
+        header = replay.header
+        sim = Simulation(world_width=header['world'][0], world_height=header['world'][1])
+        player = ReplayPlayer(replay, sim)
+        start = time.perf_counter()
+        player.start()
+        ticks = player.advance()
+        elapsed = time.perf_counter() - start
+        game_time = ticks * PHYSICS_DT
+        print(f"Replay {header['game_mode']}/{header['difficulty']} ({header['num_players']}P), "
+              f"seed {header['seed']}, gravado em {header['date']}")
+        print(f"Nível {sim.level} | níveis completos {sim.levels_completed} | pontuação {sim.total_score} | "
+              f"estado final {sim.state}")
+        print(f"{ticks} passos ({game_time:.1f}s de jogo) em {elapsed:.2f}s "
+              f"({game_time / max(elapsed, 1e-9):.0f}x tempo real)")
+        if player.mismatches:
+            for mismatch in player.mismatches:
+                print(f"  Diferença: {mismatch}")
+            sys.exit(1)
+        print("Resultado igual ao gravado")
+    finally:
+        replay.close()
+
+
+def run_verify_command(args):
+    """Subcomando: re-simular os replays das pontuações de uma base de dados"""
+    # O pool é criado antes de abrir a base de dados (e de qualquer thread)
+    executor = None
+    if args.workers != 1:
+        from concurrent.futures import ProcessPoolExecutor
+        executor = ProcessPoolExecutor(max_workers=args.workers)
+    db = Database(args.db)
+    try:
+        entries = db.get_scores_to_verify(include_verified=args.all)
+        without_replay = db.count_scores_without_replay()
+        replay_root = os.path.dirname(os.path.abspath(args.db))
+        start = time.perf_counter()
+        results = verify_scores(entries, replay_root, args.workers, executor=executor)
+        elapsed = time.perf_counter() - start
+        db.set_verified([(score_id, ok) for score_id, ok, _ in results])
+    finally:
+        db.close()
+        if executor:
+            executor.shutdown()
+
+    names = {entry[0]: entry[1] for entry in entries}
+    failed = [(score_id, reason) for score_id, ok, reason in results if ok is False]
+    unverifiable = [(score_id, reason) for score_id, ok, reason in results if ok is None]
+    for score_id, reason in failed:
+        print(f"  #{score_id} ({names[score_id]}): {reason}")
+    if unverifiable:
+        print("Por verificar (o replay não pôde ser usado):")
+        for score_id, reason in unverifiable:
+            print(f"  #{score_id} ({names[score_id]}): {reason}")
+    ok_count = len(entries) - len(failed) - len(unverifiable)
+    print(f"{len(entries)} pontuações verificadas em {elapsed:.2f}s: {ok_count} ok, "
+          f"{len(failed)} com diferenças, {len(unverifiable)} por verificar ({without_replay} sem replay)")
+    if failed:
+        sys.exit(1)
+
+
+def run_soak_command(args):
+    """Subcomando: o bot joga sem janela durante muito tempo (fugas de memória, bloqueios, carga)"""
+    sim = Simulation(args.mode, args.difficulty, args.players)
+    bot = MazeBot()
+    rng = random.Random(args.seed)
+    db = Database(args.db) if args.db else None
+    levels = games = frames = 0
+    start = last_report = time.perf_counter()
+    try:
+        sim.start_game(rng.getrandbits(32))
+        while levels < args.levels and time.perf_counter() - start < args.minutes * 60:
+            # Até ao próximo nível completo (ou fim do jogo); no multijogador minefield/elimination
+            # o nível avança sem passar pelo ecrã de vitória
+            level, completed = sim.level, sim.levels_completed
+            frames += sim.run_headless(bot, max_frames=FPS * 10, max_levels=completed + 1)
+            levels += max(sim.level - level, sim.levels_completed - completed)
+            if db and sim.pending_score_data:
+                data = sim.pending_score_data
+                db.add_score('BOT', data['level'], data['time'], data['score'], data['game_mode'])
+                sim.pending_score_data = None
+            if sim.state not in ("PLAYING", "WIN"):
+                # Game over / fim do multijogador: novo jogo com outros labirintos
+                games += 1
+                sim.start_game(rng.getrandbits(32))
+
+            now = time.perf_counter()
+            if now - last_report >= args.report_interval:
+                last_report = now
+                elapsed = now - start
+                print(f"{elapsed:7.0f}s | {levels} níveis ({levels / elapsed * 60:.0f}/min) | {games} jogos | "
+                      f"{frames / elapsed:.0f} frames/s | cache {sim.maze_cache.hits}/{sim.maze_cache.misses} | "
+                      f"memória {peak_memory_mb():.0f} MB", flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if db:
+            db.close()
+    elapsed = time.perf_counter() - start
+    print(f"Total: {levels} níveis e {games} jogos em {elapsed:.1f}s ({levels / max(elapsed, 1e-9) * 60:.0f} níveis/min), "
+          f"memória máxima {peak_memory_mb():.0f} MB")
+
+
+def peak_memory_mb():
+    """Pico de memória do processo (0 onde o módulo resource não existe, ex: Windows)"""
+    try:
+        import resource
+    except ImportError:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 / (1024 if sys.platform == 'darwin' else 1)
+
+
+def build_arg_parser():
+    """Argumentos da linha de comandos (sem subcomando = abrir o jogo)"""
+    parser = argparse.ArgumentParser(description="GravityMaze")
+    parser.add_argument('--bot', action='store_true', help='O bot joga no lugar do acelerómetro/teclado')
+    subparsers = parser.add_subparsers(dest='command')
+
+    for name, help_text in (('export', 'Exportar uma tabela da base de dados'),
+                            ('import', 'Importar uma tabela para a base de dados')):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument('table', choices=sorted(EXPORT_COLUMNS))
+        sub.add_argument('path')
+        sub.add_argument('--format', choices=EXPORT_FORMATS, default=None,
+                         help='csv, jsonl ou columnar (por omissão, deduzido da extensão)')
+        sub.add_argument('--db', default=DB_FILE)
+        sub.add_argument('--chunk-size', type=int, default=50000)
+        if name == 'import':
+            sub.add_argument('--stats-merge', choices=('max', 'sum'), default='max',
+                             help='Como juntar player_stats já existentes')
+    sync_parser = subparsers.add_parser('sync-server', help='Servidor que agrega as leaderboards dos quiosques')
+    sync_parser.add_argument('--db', default='gravitymaze_global.db')
+    sync_parser.add_argument('--host', default='0.0.0.0')
+    sync_parser.add_argument('--port', type=int, default=SYNC_PORT)
+    sim_parser = subparsers.add_parser('simulate', help='Correr o jogo sem janela nem som (input sintético)')
+    sim_parser.add_argument('--mode', choices=sorted(GAME_MODES), default='normal')
+    sim_parser.add_argument('--difficulty', choices=('easy', 'normal', 'hard'), default='normal')
+    sim_parser.add_argument('--players', type=int, choices=(1, 2), default=1)
+    sim_parser.add_argument('--levels', type=int, default=None, help='Parar após N níveis completos')
+    sim_parser.add_argument('--frames', type=int, default=FPS * 600)
+    sim_parser.add_argument('--seed', type=int, default=None)
+    sim_parser.add_argument('--record', default=None, metavar='FICHEIRO', help='Gravar o jogo num replay')
+    sim_parser.add_argument('--band', type=float, nargs=2, default=None, metavar=('MIN', 'MAX'),
+                            help='Só labirintos com esta dificuldade (metrics["difficulty"])')
+    sim_parser.add_argument('--bot', action='store_true', help='Input do MazeBot em vez de inclinações aleatórias')
+    soak_parser = subparsers.add_parser('soak', help='O bot joga sem janela durante muito tempo (teste de carga)')
+    soak_parser.add_argument('--mode', choices=sorted(GAME_MODES), default='normal')
+    soak_parser.add_argument('--difficulty', choices=('easy', 'normal', 'hard'), default='normal')
+    soak_parser.add_argument('--players', type=int, choices=(1, 2), default=1)
+    soak_parser.add_argument('--minutes', type=float, default=60)
+    soak_parser.add_argument('--levels', type=int, default=10 ** 9)
+    soak_parser.add_argument('--seed', type=int, default=None)
+    soak_parser.add_argument('--db', default=None, help='Guardar cada nível completo nesta base de dados')
+    soak_parser.add_argument('--report-interval', type=float, default=10, help='Segundos entre relatórios')
+    replay_parser = subparsers.add_parser('replay', help='Re-simular (verificar) ou ver um replay gravado')
+    replay_parser.add_argument('path')
+    replay_parser.add_argument('--watch', action='store_true', help='Ver o replay na janela do jogo')
+    replay_parser.add_argument('--speed', type=float, default=1.0)
+    verify_parser = subparsers.add_parser('verify', help='Verificar as pontuações re-simulando os replays')
+    verify_parser.add_argument('--db', default=DB_FILE)
+    verify_parser.add_argument('--workers', type=int, default=None, help='Processos (por omissão, um por núcleo)')
+    verify_parser.add_argument('--all', action='store_true', help='Verificar também as já verificadas')
+    return parser
+
+
 def main():
+    args = build_arg_parser().parse_args()
+    if args.command == 'export':
+        run_export_command(args)
+        return
+    if args.command == 'import':
+        run_import_command(args)
+        return
+    if args.command == 'sync-server':
+        run_sync_server_command(args)
+        return
+    if args.command == 'simulate':
+        run_simulate_command(args)
+        return
+    if args.command == 'replay':
+        run_replay_command(args)
+        return
+    if args.command == 'verify':
+        run_verify_command(args)
+        return
+    if args.command == 'soak':
+        run_soak_command(args)
+        return
+
     print("=" * 60)
     print("  GravityMaze - Jogo de Labirinto com Acelerómetro")
     print("=" * 60)
@@ -3971,7 +6997,10 @@ def main():
     print("=" * 60)
 
     game = Game()
+    if args.bot:
+        game.bot = MazeBot()
     game.run()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # Executável (PyInstaller): processos do pool de labirintos e do verify
     main()
\ No newline at end of file
@@ -0,0 +1,63 @@
+"""
+Exportação/importação da leaderboard: os três formatos, deduplicação (jogador, data, modo)
+e a reconstrução dos índices de ranking e contadores nas importações grandes.
+"""
+
+import os
+import sys
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import game
+from test_leaderboard import expected_order, seed_rows
+
+
+def leaderboard_rows(db):
+    return sorted(db.conn.execute("SELECT player_name, level, time, score, date, game_mode FROM leaderboard"))
+
+
+def rank_structures(db):
+    return sorted(db.conn.execute(
+        "SELECT type, name FROM sqlite_master WHERE name LIKE 'idx_leaderboard_%' OR name LIKE 'trg_leaderboard_%'"))
+
+
+def assert_counts_match(db):
+    counts = dict(((mode, level), n) for mode, level, n in
+                  db.conn.execute("SELECT game_mode, level, n FROM leaderboard_level_counts WHERE n > 0"))
+    expected = dict(((mode, level), n) for mode, level, n in db.conn.execute(
+        "SELECT game_mode, level, COUNT(*) FROM leaderboard GROUP BY game_mode, level"))
+    assert counts == expected
+
+
+@pytest.mark.parametrize('extension', ['csv', 'jsonl', 'gmcol'])
+@pytest.mark.parametrize('rebuild', [False, True])
+def test_import_twice_adds_no_duplicates(tmp_path, monkeypatch, extension, rebuild):
+    if rebuild:
+        # Importação "grande": índices e triggers removidos e reconstruídos no fim
+        monkeypatch.setattr(game, 'BULK_IMPORT_REBUILD_ROWS', 10)
+    source = game.Database(str(tmp_path / 'source.db'))
+    rows = seed_rows()
+    source.import_leaderboard_rows([rows + rows[:20]])  # Duplicados dentro do próprio ficheiro
+    path = str(tmp_path / f'leaderboard.{extension}')
+    assert game.export_table(source, 'leaderboard', path, chunk_size=64) == len(rows)
+
+    target = game.Database(str(tmp_path / 'target.db'))
+    structures = rank_structures(target)
+    assert game.import_table(target, 'leaderboard', path, chunk_size=64) == (len(rows), len(rows))
+    assert game.import_table(target, 'leaderboard', path, chunk_size=64) == (len(rows), 0)
+
+    assert leaderboard_rows(target) == leaderboard_rows(source)
+    assert rank_structures(target) == structures
+    assert_counts_match(target)
+
+    # Os triggers voltaram a funcionar depois da reconstrução
+    target.add_score('Novo', 1, 99.0, 0, 'normal')
+    assert_counts_match(target)
+    order = expected_order(target)
+    assert [target.get_rank(game.Database.score_key(row)) for row in order] == list(range(1, len(order) + 1))
+    source.close()
+    target.close()
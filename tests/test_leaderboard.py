@@ -0,0 +1,111 @@
+"""
+Leaderboard: paginação por keyset, posição (get_rank) com os contadores por nível
+mantidos por triggers e a janela "Ir para mim" do ecrã da leaderboard.
+"""
+
+import os
+import random
+import sys
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import game
+
+MODES = ['normal', 'minefield']
+
+
+def seed_rows(count=300, seed=5):
+    """Linhas de exportação com muitos empates (nível, pontuação, tempo) para testar o desempate por id"""
+    rng = random.Random(seed)
+    return [(f"P{rng.randrange(40)}", rng.randint(1, 5), rng.choice([10.0, 12.5, 20.0]),
+             rng.choice([100, 200, 300]), f"2025-01-01 00:{i // 60:02d}:{i % 60:02d}.{i}", rng.choice(MODES))
+            for i in range(count)]
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = game.Database(str(tmp_path / 'leaderboard.db'))
+    db.import_leaderboard_rows([seed_rows()])
+    yield db
+    db.close()
+
+
+def expected_order(db, game_mode=None):
+    rows = db.conn.execute("SELECT player_name, level, time, score, date, game_mode, id FROM leaderboard").fetchall()
+    rows = [row for row in rows if game_mode is None or row[5] == game_mode]
+    return sorted(rows, key=lambda row: (-row[1], -row[3], row[2], row[6]))
+
+
+@pytest.mark.parametrize('game_mode', [None] + MODES)
+def test_pages_follow_the_rank_order(db, game_mode):
+    pages = []
+    after = None
+    while True:
+        page = db.get_scores_page(7, game_mode, after=after)
+        if not page:
+            break
+        pages.append(page)
+        after = game.Database.score_key(page[-1])
+    rows = [row for page in pages for row in page]
+    assert rows == expected_order(db, game_mode)
+
+    for rank, row in enumerate(rows, 1):
+        assert db.get_rank(game.Database.score_key(row), game_mode) == rank
+
+    # Para trás (before) a partir do fim volta às mesmas páginas
+    before = game.Database.score_key(rows[-1])
+    previous = db.get_scores_page(7, game_mode, before=before)
+    assert previous == rows[-8:-1]
+
+
+def test_level_counts_follow_inserts_and_deletes(db):
+    db.add_score('Novo', 9, 1.0, 999, 'normal')
+    db.conn.execute("DELETE FROM leaderboard WHERE level = 2 AND game_mode = 'minefield'")
+    db.conn.commit()
+    counts = dict(((mode, level), n) for mode, level, n in
+                  db.conn.execute("SELECT game_mode, level, n FROM leaderboard_level_counts WHERE n > 0"))
+    expected = dict(((mode, level), n) for mode, level, n in db.conn.execute(
+        "SELECT game_mode, level, COUNT(*) FROM leaderboard GROUP BY game_mode, level"))
+    assert counts == expected
+
+    best = db.get_player_best('Novo')
+    assert db.get_rank(game.Database.score_key(best)) == 1
+
+
+def test_scores_around_player(db):
+    name = 'P7'
+    rows, first_rank = db.get_scores_around(name, 'normal', rows_before=4, rows_after=5)
+    order = expected_order(db, 'normal')
+    best_rank = next(i for i, row in enumerate(order, 1) if row[0] == name)
+    start = max(0, best_rank - 1 - 4)
+    assert first_rank == start + 1
+    assert rows == order[start:best_rank + 5]
+
+
+def test_jump_to_player_entry(tmp_path, monkeypatch, db):
+    monkeypatch.chdir(tmp_path)
+    screen = game.Game()
+    try:
+        screen.database = db
+        screen.player_name = 'P7'
+        screen.leaderboard_filter = 'normal'
+        screen.jump_to_player_entry()
+
+        order = expected_order(db, 'normal')
+        best_rank = next(i for i, row in enumerate(order, 1) if row[0] == 'P7')
+        rows = screen.leaderboard_rows
+        index = next(i for i, row in enumerate(rows) if row[6] == screen.leaderboard_highlight_id)
+        assert rows[index] == order[best_rank - 1]
+        assert screen.leaderboard_first_rank + index == best_rank
+        visible = rows[screen.leaderboard_scroll:screen.leaderboard_scroll + game.LEADERBOARD_VISIBLE_ROWS]
+        assert rows[index] in visible
+        # Todas as linhas carregadas estão na posição certa
+        first = screen.leaderboard_first_rank
+        assert rows == order[first - 1:first - 1 + len(rows)]
+    finally:
+        screen.running = False
+        screen.database = None
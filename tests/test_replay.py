@@ -0,0 +1,107 @@
+"""
+Replays: gravar um jogo, ler o ficheiro e re-simular sem diferenças; limite de ficheiros em replays/.
+"""
+
+import os
+import sys
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import game
+
+
+def record_game(path):
+    sim = game.Simulation(seed=99)
+    sim.record_replays = True
+    sim.start_game()
+    controller = game.random_tilt_controller(seed=3)
+    sim.run_headless(controller, max_frames=game.FPS * 20)
+    return sim.save_replay(str(path))
+
+
+def test_replay_round_trip(tmp_path):
+    path = record_game(tmp_path / 'game.gmr')
+    replay = game.Replay.open(path)
+    try:
+        sim = game.Simulation()
+        player = game.ReplayPlayer(replay, sim)
+        player.start()
+        player.advance()
+    finally:
+        replay.close()
+    assert player.finished
+    assert player.mismatches == []
+
+
+def test_prune_replays_keeps_newest(tmp_path):
+    for i in range(5):
+        path = tmp_path / f'{i}.gmr'
+        path.write_bytes(b'')
+        os.utime(path, (i, i))
+    (tmp_path / 'notes.txt').write_text('x')
+
+    game.prune_replays(str(tmp_path), 2)
+    assert sorted(os.listdir(tmp_path)) == ['3.gmr', '4.gmr', 'notes.txt']
+
+
+def test_tampered_run_length_is_rejected(tmp_path):
+    sim = game.Simulation(seed=99)
+    sim.record_replays = True
+    sim.start_game()
+    recorder = sim.recorder
+    recorder.input((0, 0), (0, 0))
+    recorder.run_length = 10 ** 12  # Contador de passos adulterado
+    path = tmp_path / 'tampered.gmr'
+    path.write_bytes(recorder.finish(sim.replay_summary()))
+
+    entry = (1, 'AAA', 1, 10.0, 100, 'normal', str(path))
+    score_id, ok, reason = game.verify_replay_score(entry)
+    assert (score_id, ok) == (1, False)
+    assert 'passos' in reason
+
+
+def test_unreadable_replay_is_not_a_failure(tmp_path):
+    path = tmp_path / 'corrupted.gmr'
+    path.write_bytes(game.REPLAY_MAGIC + bytes([game.REPLAY_VERSION, 2]) + b'{}' + b'garbage' + (0).to_bytes(4, 'little'))
+
+    # Ficheiro ilegível ou em falta: por verificar (None), não adulterado (False)
+    assert game.verify_replay_score((7, 'AAA', 1, 10.0, 100, 'normal', str(path)))[:2] == (7, None)
+    assert game.verify_replay_score((8, 'AAA', 1, 10.0, 100, 'normal', str(tmp_path / 'x.gmr')))[:2] == (8, None)
+
+    db = game.Database(str(tmp_path / 'leaderboard.db'))
+    for name in ('Ana', 'Rui', 'Eva'):
+        db.add_score(name, 1, 10.0, 100, 'normal', 'replay.gmr')
+    db.set_verified([(1, True), (2, False), (3, None)])
+    assert db.conn.execute("SELECT verified FROM leaderboard ORDER BY id").fetchall() == [(1,), (0,), (None,)]
+    assert [row[0] for row in db.get_scores_to_verify()] == [3]
+    db.close()
+
+
+def test_prune_replays_keeps_referenced(tmp_path):
+    for i in range(5):
+        path = tmp_path / f'{i}.gmr'
+        path.write_bytes(b'')
+        os.utime(path, (i, i))
+
+    # 0.gmr é o replay de uma pontuação: não é apagado nem conta para o limite
+    db = game.Database(str(tmp_path / 'leaderboard.db'))
+    db.add_score('Ana', 3, 20.0, 500, 'normal', str(tmp_path / '0.gmr'))
+    game.prune_replays(str(tmp_path), 2, db.get_replay_paths())
+    db.close()
+    assert sorted(name for name in os.listdir(tmp_path) if name.endswith('.gmr')) == ['0.gmr', '3.gmr', '4.gmr']
+
+
+def test_compressed_stream_is_read_in_chunks(tmp_path, monkeypatch):
+    # Blocos pequenos: os registos atravessam vários blocos descomprimidos
+    monkeypatch.setattr(game, 'REPLAY_READ_CHUNK', 7)
+    path = record_game(tmp_path / 'game.gmr')
+    replay = game.Replay.open(path)
+    try:
+        commands = list(replay.commands())
+        monkeypatch.setattr(game, 'REPLAY_READ_CHUNK', 1 << 20)
+        assert list(replay.commands()) == commands
+        assert commands[0][0] == 'input'
+    finally:
+        replay.close()
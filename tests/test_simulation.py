@@ -0,0 +1,55 @@
+"""
+Simulation sem janela: determinismo (mesma seed + mesmos inputs = mesmo estado final)
+e os hooks de eventos chamados pela lógica do jogo.
+"""
+
+import os
+import sys
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import game
+
+
+def final_state(game_mode, num_players, controller):
+    sim = game.Simulation(game_mode=game_mode, num_players=num_players, seed=1234)
+    sim.start_game()
+    sim.run_headless(controller, max_frames=game.FPS * 20, max_levels=3)
+    balls = [sim.ball] + ([sim.ball2] if sim.ball2 else [])
+    return (sim.state, sim.level, sim.tick_count, sim.sim_time, sim.timer, sim.lives, sim.total_score,
+            sim.player1_score, sim.player2_score, [(b.x, b.y, b.vx, b.vy) for b in balls])
+
+
+@pytest.mark.parametrize('game_mode', ['normal', 'minefield', 'timeattack', 'elimination'])
+@pytest.mark.parametrize('num_players', [1, 2])
+def test_same_seed_and_inputs_give_same_state(game_mode, num_players):
+    # Inputs aleatórios (colisões, minas) e o bot (níveis completos, labirintos seguintes)
+    assert (final_state(game_mode, num_players, game.random_tilt_controller(seed=7)) ==
+            final_state(game_mode, num_players, game.random_tilt_controller(seed=7)))
+    assert (final_state(game_mode, num_players, game.MazeBot()) ==
+            final_state(game_mode, num_players, game.MazeBot()))
+
+
+class RecordingSimulation(game.Simulation):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.completed = []
+
+    def on_level_complete(self, player):
+        self.completed.append(player)
+
+
+def test_multiplayer_normal_signals_each_finishing_player():
+    sim = RecordingSimulation(game_mode='normal', num_players=2, seed=1234)
+    sim.start_game()
+    sim.ball.x, sim.ball.y = sim.goal_pos
+    sim.tick((0, 0), (0, 0))
+    assert sim.completed == [1]
+    sim.ball2.x, sim.ball2.y = sim.goal_pos
+    sim.tick((0, 0), (0, 0))
+    assert sim.completed == [1, 2]
+    assert sim.state == "MP_WIN"
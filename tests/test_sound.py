@@ -0,0 +1,45 @@
+"""
+SoundBank: PCM em cache no disco, reutilizado nas execuções seguintes e gerado de novo se estiver corrompido.
+"""
+
+import os
+import sys
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pygame
+import pytest
+
+import game
+
+
+@pytest.fixture
+def mixer():
+    pygame.mixer.init(frequency=22050, size=-16, channels=2)
+    if not pygame.mixer.get_init():
+        pytest.skip("mixer indisponível")
+    yield pygame.mixer.get_init()
+    pygame.mixer.quit()
+
+
+def test_cached_pcm_is_reused(tmp_path, mixer):
+    sound = game.SoundBank(str(tmp_path)).get('mine_hit')
+    path = game.SoundBank(str(tmp_path)).cache_path('mine_hit', 1.0, mixer)
+    assert open(path, 'rb').read(4) == game.SOUND_CACHE_MAGIC
+
+    cached = game.SoundBank(str(tmp_path)).get('mine_hit')
+    assert cached.get_raw() == sound.get_raw()
+
+
+def test_corrupted_pcm_is_regenerated(tmp_path, mixer):
+    expected = game.SoundBank(str(tmp_path)).get('mine_hit').get_raw()
+    path = game.SoundBank(str(tmp_path)).cache_path('mine_hit', 1.0, mixer)
+    size = os.path.getsize(path)
+    with open(path, 'wb') as f:
+        f.write(b'\x01\x02\x03')
+
+    sound = game.SoundBank(str(tmp_path)).get('mine_hit')
+    assert sound.get_raw() == expected
+    assert os.path.getsize(path) == size
@@ -0,0 +1,51 @@
+"""
+Sincronização da leaderboard: LeaderboardSyncServer numa porta efémera e um
+LeaderboardSyncClient com a sua própria base de dados (sem display nem som).
+"""
+
+import os
+import sys
+import threading
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+import game
+
+
+@pytest.fixture
+def server(tmp_path):
+    server = game.LeaderboardSyncServer(str(tmp_path / 'server.db'), host='127.0.0.1', port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_push_pull_round_trip(server, tmp_path):
+    kiosk_db = game.Database(str(tmp_path / 'kiosk.db'))
+    kiosk_db.add_score('Ana', 5, 42.5, 1200, 'normal')
+    kiosk_db.add_score('Rui', 3, 30.0, 800, 'minefield')
+
+    host, port = server.server_address
+    client = game.LeaderboardSyncClient(f"http://{host}:{port}", kiosk_id='quiosque-1',
+                                        db_path=str(tmp_path / 'kiosk.db'),
+                                        cache_file=str(tmp_path / 'cache.json'))
+    client.running = True
+    client_db = client.open_db()
+    client.sync_once(client_db)
+    # Reenvio de tudo (como depois de uma falha antes da confirmação): sem duplicados
+    client_db.conn.execute("DELETE FROM sync_state")
+    client.sync_once(client_db)
+    client_db.close()
+
+    names = [row[0] for row in client.get_global_top()]
+    assert names == ['Ana', 'Rui']
+    assert [row[0] for row in client.get_global_top('minefield')] == ['Rui']
+    count = server.db.conn.execute('SELECT COUNT(*) FROM leaderboard').fetchone()[0]
+    assert count == 2
+    kiosk_db.close()